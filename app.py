@@ -1,8 +1,10 @@
 from utils.data_processor import DataProcessor
-from utils.analyzer import ResultAnalyzer
+from utils.analytics_cache import AnalyticsCache, dataframe_fingerprint, filters_key
 from utils.display import (
     display_search_result,
     display_search_results_grid,
+    group_by_address,
+    paginate,
     display_statistics_cards,
     create_filter_sidebar,
     apply_filters,
@@ -13,9 +15,21 @@ import pandas as pd
 import json
 import time
 import logging
+import importlib.util
 import os
+import subprocess
 import sys
-import requests
+import config
+from typing import Tuple
+from utils.llm_client import LLMClient, LLMClientError
+from utils.verdict import build_verdict_text, get_cached_verdict, run_verdicts, stream_verdict
+from utils.verdict_cache import VerdictCache
+from utils.job_queue import JobQueue
+from utils.result_store import ResultStore
+from utils.text_index import DOCUMENT_KINDS, TextIndex
+from utils.thumbnails import get_thumbnail
+from utils.timing import summarize_timings
+from utils.prompt_builder import estimate_tokens
 sys.path.append("llm")
 
 
@@ -24,13 +38,13 @@ logging.basicConfig(level=logging.INFO)
 
 # Импорт модулей
 
-# Импорт локального браузерного агента
-try:
-    from utils.browser_agent import run_local_browser_search
-    BROWSER_AVAILABLE = True
-except ImportError as e:
-    BROWSER_AVAILABLE = False
-    st.error(f"❌ Локальный браузерный агент недоступен: {str(e)}")
+# Импорт локального браузерного агента (тяжелые зависимости грузятся при запуске поиска)
+from utils.browser_agent import missing_browser_dependencies
+MISSING_BROWSER_DEPENDENCIES = missing_browser_dependencies()
+BROWSER_AVAILABLE = not MISSING_BROWSER_DEPENDENCIES
+if not BROWSER_AVAILABLE:
+    st.error(
+        f"❌ Локальный браузерный агент недоступен: не установлены {', '.join(MISSING_BROWSER_DEPENDENCIES)}")
 
 # Настройка страницы
 st.set_page_config(
@@ -82,6 +96,174 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+
+
+@st.cache_resource
+def get_llm_client(api_url: str, concurrency: int) -> LLMClient:
+    """Клиент LLM API, общий для всех перезапусков скрипта"""
+    return LLMClient(api_url=api_url, concurrency=concurrency)
+
+
+@st.cache_resource
+def get_verdict_cache() -> VerdictCache:
+    """Постоянный кэш вердиктов LLM"""
+    return VerdictCache()
+
+
+def get_analytics_cache() -> AnalyticsCache:
+    """Кэш аналитики текущей сессии, переживает перезапуски скрипта"""
+    if 'analytics_cache' not in st.session_state:
+        st.session_state.analytics_cache = AnalyticsCache()
+    return st.session_state.analytics_cache
+
+
+def set_results_df(df: pd.DataFrame):
+    """Новая таблица результатов и ее отпечаток для кэша аналитики"""
+    st.session_state.results_df = df
+    st.session_state.results_fingerprint = dataframe_fingerprint(df)
+
+
+@st.cache_resource
+def get_result_store() -> ResultStore:
+    """Колоночное хранилище результатов прошлых запусков"""
+    return ResultStore()
+
+
+def select_history_results(store: ResultStore) -> Tuple[pd.DataFrame, str]:
+    """Выбор запусков из хранилища; читаются только подходящие разделы и колонки.
+
+    Возвращает таблицу и ее ключ для кэша аналитики.
+    """
+    if importlib.util.find_spec('pyarrow') is None:
+        st.warning("⚠️ Для истории запусков установите pyarrow: pip install pyarrow")
+        return pd.DataFrame(), 'empty'
+
+    runs = store.list_runs()
+    if runs.empty:
+        st.info("🗄️ Хранилище пусто: запуски сохраняются фоновыми заданиями и `cli.py run --store`")
+        return pd.DataFrame(), 'empty'
+
+    with st.expander(f"🗄️ Запусков в хранилище: {len(runs)}"):
+        st.dataframe(runs, use_container_width=True, hide_index=True)
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        run_ids = st.multiselect("Запуски", runs['run_id'].tolist(),
+                                 help="Пусто — все запуски за выбранный период")
+    with col2:
+        date_from = st.date_input("С даты", value=None)
+    with col3:
+        date_to = st.date_input("По дату", value=None)
+    result_types = st.multiselect(
+        "Типы результатов",
+        ['maps', 'maps_2gis', 'realestate', 'government', 'encyclopedia', 'website'],
+        help="Пусто — все типы")
+
+    # Ключ учитывает состав хранилища: новые запуски сбрасывают кэш выборки
+    history_key = repr(('history', tuple(run_ids), date_from, date_to, tuple(result_types),
+                        tuple(runs['run_id']), int(runs['results'].sum())))
+    history_df = get_analytics_cache().get(history_key, lambda: store.read_results(
+        run_ids=run_ids or None,
+        date_from=date_from.isoformat() if date_from else None,
+        date_to=date_to.isoformat() if date_to else None,
+        result_types=result_types or None
+    ))
+    if history_df.empty:
+        st.info("🔍 Нет результатов по выбранным фильтрам")
+    return history_df, history_key
+
+
+@st.cache_resource
+def get_text_index() -> TextIndex:
+    """Полнотекстовый индекс по выдаче, OCR и анализу страниц всех запусков"""
+    return TextIndex()
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """Очередь фоновых заданий поиска"""
+    return JobQueue()
+
+
+def start_job_worker(processes: int = 2):
+    """Запуск фонового воркера отдельным процессом, независимым от Streamlit"""
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    log_path = os.path.join(os.path.dirname(config.JOBS_DB_PATH) or '.', 'worker.log')
+    with open(log_path, 'a', encoding='utf-8') as log_file:
+        subprocess.Popen(
+            [sys.executable, os.path.join(app_dir, 'cli.py'), 'worker', '--processes', str(processes)],
+            cwd=app_dir, stdout=log_file, stderr=subprocess.STDOUT, start_new_session=True)
+
+
+def load_job_results(job_queue: JobQueue, job_id: int):
+    """Загрузка результатов задания в состояние сессии"""
+    browser_results = job_queue.load_results(job_id)
+    all_results = DataProcessor.flatten_browser_results(browser_results)
+    st.session_state.search_results = all_results
+    st.session_state.browser_results = browser_results
+    set_results_df(DataProcessor.results_to_dataframe(all_results))
+    st.session_state.loaded_job_id = job_id
+
+
+JOB_STATUS_LABELS = {
+    'queued': '⏳ В очереди',
+    'running': '🔄 Выполняется',
+    'completed': '✅ Завершено',
+    'failed': '❌ Ошибка',
+    'cancelled': '⛔ Отменено'
+}
+
+
+@st.fragment(run_every=config.JOBS_POLL_INTERVAL)
+def render_jobs_panel(job_queue: JobQueue):
+    """Список заданий с прогрессом, обновляется без перезапуска всей страницы"""
+    st.subheader("📋 Задания поиска")
+
+    jobs = job_queue.list_jobs()
+    workers = job_queue.active_workers()
+    if workers:
+        st.caption(f"👷 Активных воркеров: {len(workers)}")
+    else:
+        st.warning("⚠️ Воркер не запущен — задания ждут в очереди")
+        if st.button("▶️ Запустить воркер"):
+            start_job_worker()
+            st.info("⏳ Воркер запускается...")
+
+    if not jobs:
+        st.caption("Заданий пока нет")
+        return
+
+    for job in jobs:
+        label = JOB_STATUS_LABELS.get(job['status'], job['status'])
+        with st.container(border=True):
+            col1, col2, col3 = st.columns([3, 1, 1])
+            with col1:
+                st.markdown(f"**#{job['id']}** · {label} · {job['done']}/{job['total']} адресов, "
+                            f"успешных: {job['successful']}")
+                if job['status'] in ('queued', 'running'):
+                    st.progress(job['done'] / job['total'] if job['total'] else 0.0)
+                if job['error']:
+                    st.error(job['error'])
+            with col2:
+                if job['done'] and job['status'] in ('running', 'completed', 'cancelled', 'failed'):
+                    if st.button("📂 Загрузить", key=f"load_job_{job['id']}"):
+                        load_job_results(job_queue, job['id'])
+                        st.rerun()
+            with col3:
+                if job['status'] in ('queued', 'running'):
+                    if st.button("✖️ Отменить", key=f"cancel_job_{job['id']}"):
+                        job_queue.cancel(job['id'])
+
+    loaded_job_id = st.session_state.get('loaded_job_id')
+    if loaded_job_id and st.session_state.get('browser_results'):
+        browser_results = st.session_state.browser_results
+        successful_searches = sum(
+            1 for r in browser_results if r.get('success', False))
+        st.success(f"📂 Загружены результаты задания #{loaded_job_id}: "
+                   f"{successful_searches}/{len(browser_results)} успешных поисков, "
+                   f"{len(st.session_state.search_results)} результатов")
+
+
 # Заголовок
 st.markdown("""
 <div class="main-header">
@@ -94,7 +276,7 @@ st.markdown("""
 if 'search_results' not in st.session_state:
     st.session_state.search_results = []
 if 'results_df' not in st.session_state:
-    st.session_state.results_df = pd.DataFrame()
+    set_results_df(pd.DataFrame())
 
 if not BROWSER_AVAILABLE:
     st.error("""
@@ -115,8 +297,9 @@ if not BROWSER_AVAILABLE:
     st.stop()
 
 # Вкладки
-tab1, tab2, tab3, tab4, tab_verdict, tab5 = st.tabs(
-    ["🚀 Поиск", "📊 Результаты", "🤖 ИИ Анализ", "📈 Аналитика", "🧑‍⚖️ Вердикт", "⚙️ Настройки"])
+tab1, tab2, tab3, tab_text, tab4, tab_verdict, tab5 = st.tabs(
+    ["🚀 Поиск", "📊 Результаты", "🤖 ИИ Анализ", "🔎 Поиск по тексту", "📈 Аналитика",
+     "🧑‍⚖️ Вердикт", "⚙️ Настройки"])
 
 with tab1:
     st.header("🚀 Локальный поиск адресов")
@@ -143,15 +326,15 @@ with tab1:
 
     if input_method == "📁 Загрузить файл":
         uploaded_file = st.file_uploader(
-            "Выберите JSON файл с адресами",
-            type=['json'],
-            help="Файл должен содержать массив объектов с полем 'address'"
+            "Выберите файл с адресами",
+            type=['json', 'ndjson', 'jsonl', 'csv', 'txt'],
+            help="JSON массив объектов с полем 'address', NDJSON, CSV с колонкой 'address' или TXT (адрес в строке)"
         )
 
         if uploaded_file is not None:
             try:
-                data = DataProcessor.load_json_file(uploaded_file)
-                addresses = DataProcessor.extract_addresses(data)
+                # Файл разбирается потоково, в памяти остаются только строки адресов
+                addresses = list(DataProcessor.iter_addresses(uploaded_file))
                 st.success(f"✅ Загружено {len(addresses)} адресов")
 
                 # Показываем превью
@@ -201,110 +384,62 @@ with tab1:
         max_addresses = st.number_input(
             "📊 Максимум адресов",
             min_value=1,
-            max_value=50,
-            value=min(10, len(addresses)) if addresses else 5,
-            help="Ограничение для предотвращения долгого ожидания"
+            max_value=max(50, len(addresses)),
+            value=len(addresses) if addresses else 5,
+            help="Сколько адресов из списка поставить в задание"
         )
 
+    browser_workers = st.number_input(
+        "🧵 Параллельных браузеров в задании",
+        min_value=1,
+        max_value=4,
+        value=1,
+        help="Каждый браузер занимает отдельный процесс Chrome"
+    )
+
     # Предупреждение о времени
     if addresses:
         # ~15 сек на адрес
-        estimated_time = len(addresses[:max_addresses]) * 15
+        estimated_time = len(addresses[:max_addresses]) * 15 // browser_workers
         st.info(
             f"⏱️ Примерное время выполнения: {estimated_time // 60} мин {estimated_time % 60} сек")
 
-    # Кнопка запуска
+    job_queue = get_job_queue()
+
+    # Поиск выполняется фоновым воркером, перезапуски скрипта его не прерывают
     if st.button("🚀 Запустить локальный поиск", type="primary", disabled=len(addresses) == 0):
         if len(addresses) > max_addresses:
             addresses = addresses[:max_addresses]
             st.warning(f"⚠️ Ограничено до {max_addresses} адресов")
 
-        st.session_state.search_results = []
-
-        # Прогресс бар
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
-        # Контейнер для результатов в реальном времени
-        results_container = st.container()
+        job_id = job_queue.submit(addresses, {
+            'headless': headless_mode,
+            'workers': int(browser_workers)
+        })
+        st.success(f"📥 Задание #{job_id} поставлено в очередь: {len(addresses)} адресов")
 
-        def progress_callback(current, total, address):
-            progress = current / total
-            progress_bar.progress(progress)
-            status_text.text(
-                f"🔍 Поиск {current + 1}/{total}: {address[:50]}...")
-
-        with st.spinner("🤖 Запускаем локальный браузерный агент..."):
-            try:
-                # Запускаем локальный браузерный поиск
-                browser_results = run_local_browser_search(
-                    addresses,
-                    headless=headless_mode,
-                    progress_callback=progress_callback
-                )
-
-                # Преобразуем результаты для совместимости
-                all_results = []
-                for browser_result in browser_results:
-                    if browser_result.get('results'):
-                        for result in browser_result['results']:
-                            result['address'] = browser_result['address']
-                            all_results.append(result)
-
-                # Сохраняем результаты
-                st.session_state.search_results = all_results
-                st.session_state.browser_results = browser_results
-                st.session_state.results_df = DataProcessor.results_to_dataframe(
-                    all_results)
-
-                progress_bar.progress(1.0)
-                status_text.text("✅ Локальный поиск завершен!")
-
-                # Показываем итоговую статистику
-                successful_searches = sum(
-                    1 for r in browser_results if r.get('success', False))
-                screenshots_count = sum(
-                    1 for r in browser_results if r.get('screenshot_path'))
-                text_files_count = sum(
-                    1 for r in browser_results if r.get('text_file_path'))
-                st.success(f"""
-                🎉 **Поиск завершен!**
-                - Обработано адресов: {len(browser_results)}
-                - Успешных поисков: {successful_searches}
-                - Найдено результатов: {len(all_results)}
-                - Скриншотов создано: {screenshots_count}
-                - Файлов текста: {text_files_count}
-                """)
-
-                # Показываем краткие результаты по каждому адресу
-                with results_container:
-                    st.subheader("🔍 Краткие результаты:")
-                    for result in browser_results:
-                        if result.get('success'):
-                            st.success(
-                                f"✅ {result['address']}: {len(result.get('results', []))} результатов")
-                        else:
-                            st.error(
-                                f"❌ {result['address']}: {result.get('error', 'Неизвестная ошибка')}")
-
-            except Exception as e:
-                st.error(f"❌ Ошибка локального поиска: {str(e)}")
-                import traceback
-                st.code(traceback.format_exc())
+    render_jobs_panel(job_queue)
 
 with tab2:
     st.header("📊 Результаты поиска")
 
     if not st.session_state.results_df.empty:
+        results_df = st.session_state.results_df
+        fingerprint = st.session_state.results_fingerprint
+        analytics_cache = get_analytics_cache()
+
         # Фильтры в сайдбаре
-        filters = create_filter_sidebar(st.session_state.results_df)
+        filters = create_filter_sidebar(results_df)
 
-        # Применяем фильтры
-        filtered_df = apply_filters(st.session_state.results_df, filters)
+        # Применяем фильтры по индексу, построенному один раз на таблицу
+        # (повторно — из кэша, пока не изменились данные или фильтры)
+        filter_index = analytics_cache.filter_index(fingerprint, results_df)
+        filtered_df = analytics_cache.filtered(
+            fingerprint, filters, lambda: apply_filters(results_df, filters, filter_index))
 
         # Статистика по отфильтрованным данным
         if not filtered_df.empty:
-            analyzer = ResultAnalyzer(filtered_df)
+            analyzer = analytics_cache.analyzer(fingerprint, filters, filtered_df)
             stats = analyzer.calculate_relevance_stats()
             display_statistics_cards(stats)
 
@@ -318,29 +453,31 @@ with tab2:
             )
 
             if view_mode == "🔍 Поисковая выдача":
-                # Группировка по адресам
+                # Сортировка и границы адресов считаются один раз на данные и фильтры
+                ordered_df, addresses, bounds = analytics_cache.get(
+                    ('serp_groups', fingerprint, filters_key(filters)),
+                    lambda: group_by_address(filtered_df))
+
                 address_filter = st.selectbox(
                     "Выберите адрес:",
-                    ["Все адреса"] +
-                    sorted(filtered_df['address'].unique().tolist())
+                    ["Все адреса"] + addresses
                 )
 
                 if address_filter != "Все адреса":
-                    display_df = filtered_df[filtered_df['address']
-                                             == address_filter]
+                    position = addresses.index(address_filter)
+                    page_start, page_end = position, position + 1
+                    records_count = int(bounds[page_end] - bounds[page_start])
                 else:
-                    display_df = filtered_df
+                    records_count = len(ordered_df)
 
-                # Отображение результатов
-                st.subheader(f"Результаты поиска ({len(display_df)} записей)")
+                st.subheader(f"Результаты поиска ({records_count} записей)")
+                if address_filter == "Все адреса":
+                    # Рисуется только страница адресов, а не вся выдача
+                    page_start, page_end = paginate(len(addresses), key="serp")
 
-                # Сортировка
-                display_df = display_df.sort_values(['address', 'rank'])
-
-                # Группируем по адресам для красивого отображения
-                for address in display_df['address'].unique():
-                    st.markdown(f"### 📍 {address}")
-                    address_results = display_df[display_df['address'] == address].to_dict(
+                for position in range(page_start, page_end):
+                    st.markdown(f"### 📍 {addresses[position]}")
+                    address_results = ordered_df.iloc[bounds[position]:bounds[position + 1]].to_dict(
                         'records')
                     display_search_results_grid(address_results, columns=1)
 
@@ -359,9 +496,22 @@ with tab2:
                     }
                 )
 
+            # Память таблицы результатов
+            with st.expander("💾 Память таблицы результатов"):
+                compare_object = st.checkbox(
+                    "Сравнить с object колонками",
+                    help="Пересчет в object занимает время на больших таблицах")
+                st.dataframe(
+                    analytics_cache.get(
+                        ('memory', fingerprint, compare_object),
+                        lambda: DataProcessor.memory_report(results_df, compare_object)),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
             # Экспорт
             st.markdown("---")
-            create_export_section(filtered_df)
+            create_export_section(filtered_df, data_key=repr((fingerprint, filters_key(filters))))
 
         else:
             st.warning("Нет результатов, соответствующих выбранным фильтрам")
@@ -395,8 +545,10 @@ with tab3:
 
         st.markdown("---")
 
-        # Отображение результатов анализа
-        for idx, result in enumerate(st.session_state.browser_results):
+        # Отображение результатов анализа: только текущая страница адресов
+        page_start, page_end = paginate(len(st.session_state.browser_results), key="ai_analysis")
+        for idx in range(page_start, page_end):
+            result = st.session_state.browser_results[idx]
             with st.expander(f"🤖 {result['address']}", expanded=False):
 
                 col1, col2 = st.columns([3, 2])
@@ -410,9 +562,10 @@ with tab3:
                         st.text(result['ai_text_analysis'])
                         st.markdown('</div>', unsafe_allow_html=True)
 
-                    # Показываем файл с извлеченным текстом
-                    if result.get('text_file_path') and os.path.exists(result['text_file_path']):
-                        st.markdown("**📄 Извлеченный текст из файла:**")
+                    # Файл с извлеченным текстом читается только по запросу:
+                    # содержимое свернутого expander все равно отправляется в браузер
+                    if result.get('text_file_path') and os.path.exists(result['text_file_path']) and \
+                            st.toggle("📄 Извлеченный текст из файла", key=f"ai_text_{idx}"):
                         try:
                             with open(result['text_file_path'], 'r', encoding='utf-8') as f:
                                 extracted_text = f.read()
@@ -439,28 +592,34 @@ with tab3:
                         st.info(result['text_analysis'])
 
                 with col2:
-                    # Показываем скриншот
                     if result.get('screenshot_path') and os.path.exists(result['screenshot_path']):
-                        st.markdown("**📸 Скриншот поиска:**")
-                        try:
-                            st.image(
-                                result['screenshot_path'],
-                                caption=f"Скриншот: {result['address'][:30]}...",
-                                use_column_width=True
-                            )
-
-                            # Кнопка скачивания скриншота
-                            with open(result['screenshot_path'], "rb") as file:
-                                st.download_button(
-                                    label="📸 Скачать скриншот",
-                                    data=file.read(),
-                                    file_name=f"screenshot_{idx+1}.png",
-                                    mime="image/png"
+                        # По умолчанию — WebP превью (десятки КБ), для старых
+                        # результатов оно создается при первом показе
+                        thumbnail = get_thumbnail(result['screenshot_path'])
+                        if thumbnail:
+                            st.image(thumbnail, caption="📸 Скриншот поиска (превью)",
+                                     use_column_width=True)
+                        # Полный скриншот (несколько МБ) загружается только по запросу
+                        if st.toggle("🔍 Полный размер", key=f"ai_screenshot_{idx}"):
+                            try:
+                                st.image(
+                                    result['screenshot_path'],
+                                    caption=f"Скриншот: {result['address'][:30]}...",
+                                    use_column_width=True
                                 )
 
-                        except Exception as e:
-                            st.error(
-                                f"❌ Ошибка отображения скриншота: {str(e)}")
+                                # Кнопка скачивания скриншота
+                                with open(result['screenshot_path'], "rb") as file:
+                                    st.download_button(
+                                        label="📸 Скачать скриншот",
+                                        data=file.read(),
+                                        file_name=f"screenshot_{idx+1}.png",
+                                        mime="image/png"
+                                    )
+
+                            except Exception as e:
+                                st.error(
+                                    f"❌ Ошибка отображения скриншота: {str(e)}")
                     else:
                         st.info("📷 Скриншот не найден")
 
@@ -491,19 +650,104 @@ with tab3:
                     del st.session_state.browser_results
                 if 'search_results' in st.session_state:
                     st.session_state.search_results = []
-                if 'results_df' in st.session_state:
-                    st.session_state.results_df = pd.DataFrame()
+                set_results_df(pd.DataFrame())
+                get_analytics_cache().clear()
                 st.success("✅ Все результаты очищены")
                 st.rerun()
 
     else:
         st.info("👆 Сначала запустите поиск на вкладке 'Поиск'")
 
+with tab_text:
+    st.header("🔎 Поиск по тексту всех запусков")
+    text_index = get_text_index()
+    index_stats = text_index.stats()
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.caption(
+            f"📚 В индексе документов: {index_stats['documents']} — "
+            + ", ".join(f"{label}: {index_stats.get(kind, 0)}" for kind, label in DOCUMENT_KINDS.items()))
+    with col2:
+        if st.button("🗂️ Дозагрузить прошлые", help="Добавить результаты заданий и файлы extracted_text"):
+            jobs_dir = os.path.dirname(config.JOBS_DB_PATH) or '.'
+            result_files = sorted(
+                os.path.join(jobs_dir, name) for name in os.listdir(jobs_dir)
+                if name.startswith('job_') and name.endswith('.ndjson')) if os.path.isdir(jobs_dir) else []
+            with st.spinner("Индексация..."):
+                counts = text_index.backfill('extracted_text', result_files)
+            st.success(f"✅ Добавлено документов: {counts['documents']}")
+            st.rerun()
+
+    text_query = st.text_input(
+        "Запрос",
+        placeholder='аренда OR ООО',
+        help='Слова ищутся по началу; "фраза в кавычках", OR/ИЛИ, NOT/НЕ')
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        text_mode = st.radio("Показать", ["Адреса", "Документы"], horizontal=True)
+    with col2:
+        exact_words = st.checkbox("Слова целиком")
+    with col3:
+        text_limit = st.number_input("Не больше", min_value=10, max_value=1000, value=100, step=10)
+
+    if text_query:
+        started = time.perf_counter()
+        try:
+            if text_mode == "Адреса":
+                rows = text_index.search_addresses(text_query, limit=text_limit, prefix=not exact_words)
+            else:
+                rows = text_index.search(text_query, limit=text_limit, prefix=not exact_words)
+        except ValueError as e:
+            # Запрос, который FTS5 не выражает (например, только NOT)
+            rows = None
+            st.warning(f"⚠️ {e}")
+        if rows is not None:
+            if text_mode == "Адреса":
+                text_df = pd.DataFrame(rows, columns=['address', 'documents', 'kinds', 'fragment', 'score'])
+                text_df['kinds'] = text_df['kinds'].map(
+                    lambda kinds: ', '.join(DOCUMENT_KINDS.get(kind, kind) for kind in kinds))
+            else:
+                text_df = pd.DataFrame(rows, columns=['address', 'kind', 'title', 'fragment', 'url', 'run_id', 'score'])
+                text_df['kind'] = text_df['kind'].map(lambda kind: DOCUMENT_KINDS.get(kind, kind))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            st.caption(f"Найдено: {len(text_df)} за {elapsed_ms:.1f} мс")
+            if not text_df.empty:
+                st.dataframe(
+                    text_df.drop(columns=['score']),
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "address": "Адрес",
+                        "documents": st.column_config.NumberColumn("Совпадений", format="%d"),
+                        "kinds": "Где найдено",
+                        "kind": "Где найдено",
+                        "title": "Заголовок",
+                        "fragment": "Фрагмент",
+                        "url": st.column_config.TextColumn("Источник"),
+                        "run_id": "Запуск",
+                    }
+                )
+
 with tab4:
     st.header("📈 Аналитика")
 
-    if not st.session_state.results_df.empty:
-        analyzer = ResultAnalyzer(st.session_state.results_df)
+    analytics_source = st.radio(
+        "Источник данных",
+        ["🔍 Текущие результаты", "🗄️ История запусков"],
+        horizontal=True
+    )
+    history_mode = analytics_source == "🗄️ История запусков"
+    if history_mode:
+        analytics_df, analytics_key = select_history_results(get_result_store())
+    else:
+        analytics_df = st.session_state.results_df
+        analytics_key = st.session_state.results_fingerprint
+
+    if not analytics_df.empty:
+        # Анализатор и его графики берутся из кэша при смене вкладок и виджетов
+        analyzer = get_analytics_cache().analyzer(analytics_key, None, analytics_df)
 
         # Основная статистика
         stats = analyzer.calculate_relevance_stats()
@@ -545,7 +789,7 @@ with tab4:
         )
 
         # Успешность поиска
-        if 'browser_results' in st.session_state:
+        if not history_mode and 'browser_results' in st.session_state:
             st.subheader("🎯 Статистика поиска")
 
             total_searches = len(st.session_state.browser_results)
@@ -562,56 +806,130 @@ with tab4:
                                 100) if total_searches > 0 else 0
                 st.metric("Успешность", f"{success_rate:.1f}%")
 
-    else:
+            # Время этапов поиска (ключ 'timings' в результатах)
+            timing_rows = summarize_timings(st.session_state.browser_results)
+            if timing_rows:
+                st.subheader("⏱️ Время этапов поиска")
+                timing_df = pd.DataFrame(timing_rows)
+                total_row = timing_df['stage'] == 'total'
+                total_seconds = timing_df.loc[total_row, 'total'].sum()
+                timing_df['share'] = (timing_df['total'] / total_seconds * 100).where(~total_row) \
+                    if total_seconds else None
+                st.dataframe(
+                    timing_df.drop(columns=['stage', 'total']),
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "name": "Этап",
+                        "count": st.column_config.NumberColumn("Адресов", format="%d"),
+                        "p50": st.column_config.NumberColumn("p50, с", format="%.2f"),
+                        "p95": st.column_config.NumberColumn("p95, с", format="%.2f"),
+                        "max": st.column_config.NumberColumn("Макс, с", format="%.2f"),
+                        "share": st.column_config.NumberColumn("Доля времени, %", format="%.0f"),
+                    }
+                )
+
+    elif not history_mode:
         st.info("👆 Сначала запустите поиск на вкладке 'Поиск'")
 
 with tab_verdict:
     st.header("🧑‍⚖️ Вердикт: Коммерческая деятельность по адресу")
     st.info("Для каждого адреса анализируется текст выдачи и даётся краткий вывод LLM: ведётся ли коммерческая деятельность по адресу и почему.")
 
+    if 'verdicts' not in st.session_state:
+        st.session_state.verdicts = {}
+
     if 'browser_results' in st.session_state and st.session_state.browser_results:
-        for idx, result in enumerate(st.session_state.browser_results):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            llm_api_url = st.text_input(
+                "🌐 LLM API", value=config.LLM_API_URL)
+        with col2:
+            llm_concurrency = st.number_input(
+                "⚡ Параллельных запросов",
+                min_value=1,
+                max_value=32,
+                value=config.LLM_CONCURRENCY
+            )
+
+        llm_client = get_llm_client(llm_api_url, int(llm_concurrency))
+        verdict_cache = get_verdict_cache()
+        cache_stats = verdict_cache.stats()
+        st.caption(
+            f"💾 Кэш вердиктов: {cache_stats['entries']} записей, {cache_stats['size_bytes'] / 1024:.1f} КБ")
+
+        if st.button("🧑‍⚖️ Получить вердикт по всем адресам", type="primary"):
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+
+            def verdict_progress_callback(done, total, address):
+                progress_bar.progress(done / total)
+                status_text.text(
+                    f"🧑‍⚖️ Готово {done}/{total}: {address[:50]}...")
+
+            verdicts = run_verdicts(
+                llm_client,
+                st.session_state.browser_results,
+                progress_callback=verdict_progress_callback,
+                cache=verdict_cache
+            )
+            st.session_state.verdicts.update(verdicts)
+
+            errors_count = sum(1 for v in verdicts.values() if v['error'])
+            cached_count = sum(1 for v in verdicts.values() if v['cached'])
+            status_text.text(
+                f"✅ Вердикты получены: {len(verdicts) - errors_count} (из кэша: {cached_count}), ошибок: {errors_count}")
+
+        page_start, page_end = paginate(len(st.session_state.browser_results), key="verdict")
+        for idx in range(page_start, page_end):
+            result = st.session_state.browser_results[idx]
             with st.expander(f"{result['address']}", expanded=False):
-                # Извлечённый текст
-                extracted_text = ""
-                if result.get('text_file_path') and os.path.exists(result['text_file_path']):
-                    try:
-                        with open(result['text_file_path'], 'r', encoding='utf-8') as f:
-                            extracted_text = f.read()
-                    except Exception as e:
-                        extracted_text = result.get('ai_text_analysis', '')
-                else:
-                    extracted_text = result.get('ai_text_analysis', '')
+                # Извлечённый текст, сжатый под бюджет токенов
+                extracted_text = build_verdict_text(result)
 
-                st.markdown("**📄 Извлечённый текст для анализа:**")
+                st.markdown(
+                    f"**📄 Извлечённый текст для анализа** (~{estimate_tokens(extracted_text)} токенов):")
                 st.text_area("Текст для LLM", value=extracted_text,
                              height=200, key=f"text_{idx}")
 
                 if st.button(f"Получить вердикт по адресу {idx+1}", key=f"verdict_btn_{idx}"):
-                    with st.spinner("LLM анализирует текст через API..."):
-                        prompt = f"Вот фрагмент поисковой выдачи и анализа по адресу. Определи, ведётся ли по этому адресу коммерческая деятельность (магазин, офис, услуги, аренда, производство и т.п.)? Ответь только 'Да' или 'Нет' и кратко объясни почему, ссылаясь на факты из текста.\n\nТекст:\n{extracted_text}\n\nВердикт:"
-                        system_prompt = "Ты — эксперт по анализу коммерческой деятельности по адресу. Отвечай кратко, тезисно, только по фактам из текста."
-                        try:
-                            response = requests.post(
-                                "http://10.2.0.244:8000/chat",
-                                json={
-                                    "prompt": prompt,
-                                    "system_prompt": system_prompt,
-                                    "max_tokens": 128,
-                                    "temperature": 0.1
-                                },
-                                timeout=60
-                            )
-                            if response.status_code == 200:
-                                data = response.json()
-                                verdict = data.get(
-                                    "response", "[Нет ответа от LLM]")
-                                st.success(f"**Вердикт:** {verdict}")
-                            else:
-                                st.error(
-                                    f"Ошибка API: {response.status_code} {response.text}")
-                        except Exception as e:
-                            st.error(f"Ошибка запроса к LLM API: {str(e)}")
+                    stream_stats = {}
+                    try:
+                        # Ответ выводится по мере генерации токенов
+                        verdict = st.write_stream(stream_verdict(
+                            llm_client, extracted_text, cache=verdict_cache, stats=stream_stats))
+                        st.session_state.verdicts[result['address']] = {
+                            'verdict': verdict,
+                            'error': None,
+                            'latency': stream_stats.get('latency'),
+                            'ttft': stream_stats.get('ttft'),
+                            'cached': stream_stats.get('cached', False)
+                        }
+                    except LLMClientError as e:
+                        st.session_state.verdicts[result['address']] = {
+                            'verdict': None,
+                            'error': str(e),
+                            'latency': None,
+                            'cached': False
+                        }
+
+                verdict = st.session_state.verdicts.get(result['address'])
+                if verdict is None:
+                    # Ранее полученный вердикт показываем сразу из кэша
+                    cached = get_cached_verdict(verdict_cache, extracted_text)
+                    if cached is not None:
+                        verdict = {'verdict': cached, 'error': None,
+                                   'latency': 0.0, 'cached': True}
+                if verdict:
+                    if verdict['error']:
+                        st.error(verdict['error'])
+                    else:
+                        st.success(f"**Вердикт:** {verdict['verdict']}")
+                        if verdict.get('cached'):
+                            st.caption("💾 Из кэша")
+                        elif verdict.get('ttft') is not None:
+                            st.caption(
+                                f"⏱️ Первый токен: {verdict['ttft']:.2f} с, всего: {verdict['latency']:.2f} с")
     else:
         st.info("Сначала запусти поиск и анализ на предыдущих вкладках.")
 
@@ -647,12 +965,17 @@ with tab5:
         st.markdown("**📸 Скриншоты:**")
         screenshots_dir = "screenshots"
         if os.path.exists(screenshots_dir):
-            files = os.listdir(screenshots_dir)
+            files = [f for f in os.listdir(screenshots_dir)
+                     if os.path.isfile(os.path.join(screenshots_dir, f))]
             st.info(f"📁 {screenshots_dir}/ ({len(files)} файлов)")
             if files:
-                total_size = sum(os.path.getsize(os.path.join(screenshots_dir, f))
-                                 for f in files if os.path.isfile(os.path.join(screenshots_dir, f)))
+                total_size = sum(os.path.getsize(os.path.join(screenshots_dir, f)) for f in files)
                 st.text(f"Общий размер: {total_size / 1024 / 1024:.1f} МБ")
+            thumbs_dir = os.path.join(screenshots_dir, "thumbs")
+            if os.path.isdir(thumbs_dir):
+                thumbs = os.listdir(thumbs_dir)
+                thumbs_size = sum(os.path.getsize(os.path.join(thumbs_dir, f)) for f in thumbs)
+                st.text(f"Превью: {len(thumbs)} файлов, {thumbs_size / 1024 / 1024:.1f} МБ")
         else:
             st.info("📁 screenshots/ (папка будет создана)")
 
@@ -726,8 +1049,10 @@ playwright install chromium
         if errors:
             st.write(f"⚠️ Ошибок: {len(errors)}")
             with st.expander("Показать ошибки"):
-                for error in errors:
+                for error in errors[:100]:
                     st.text(f"• {error}")
+                if len(errors) > 100:
+                    st.caption(f"… и еще {len(errors) - 100}")
 
     if not st.session_state.get('search_results') and not st.session_state.get('browser_results'):
         st.info("Логи появятся после запуска поиска")
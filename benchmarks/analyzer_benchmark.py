@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк ResultAnalyzer на синтетической таблице результатов.
+
+Сравнивает прежнюю схему (отдельный проход по строкам на каждую
+статистику и график) с единым кэшированным проходом groupby и
+проверяет, что результаты совпадают.
+
+Примеры:
+    python benchmarks/analyzer_benchmark.py
+    python benchmarks/analyzer_benchmark.py --rows 2000000 --repeat 5 --output analyzer.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.analyzer import MAPS_TYPES, ResultAnalyzer  # noqa: E402
+from utils.data_processor import DataProcessor  # noqa: E402
+
+RESULT_TYPES = ['maps', 'maps_2gis', 'realestate', 'government', 'encyclopedia', 'website']
+
+
+def make_frame(rows: int, addresses: int, domains: int, seed: int = 42) -> pd.DataFrame:
+    """Таблица в схеме results_to_dataframe: ~10 результатов на адрес"""
+    rng = np.random.default_rng(seed)
+    address_values = np.array([f"Москва, улица Тестовая, дом {i}" for i in range(addresses)])
+    domain_values = np.array([f"site{i}.ru" for i in range(domains)])
+    df = pd.DataFrame({
+        'address': pd.Categorical.from_codes(rng.integers(0, addresses, rows), address_values),
+        'rank': rng.integers(1, 21, rows).astype('int16'),
+        'title': 'Заголовок',
+        'domain': pd.Categorical.from_codes(rng.zipf(1.5, rows).clip(1, domains) - 1, domain_values),
+        'result_type': pd.Categorical.from_codes(
+            rng.choice(len(RESULT_TYPES), rows, p=[0.15, 0.1, 0.1, 0.05, 0.05, 0.55]), RESULT_TYPES),
+        'snippet': 'Сниппет',
+        'additional_info': '',
+        'url': 'https://example.ru/'
+    })
+    return DataProcessor.apply_result_schema(df)
+
+
+def legacy_analysis(df: pd.DataFrame) -> dict:
+    """Прежняя схема: value_counts, маски и цикл по типам на каждый вызов"""
+    unique_addresses = df['address'].nunique()
+    maps_mask = df['result_type'].isin(MAPS_TYPES)
+    stats = {
+        'total_results': len(df),
+        'unique_addresses': unique_addresses,
+        'top_positions_maps': len(df[(df['rank'] <= 3) & maps_mask]),
+        'addresses_with_maps': df[maps_mask]['address'].nunique()
+    }
+    domain_counts = df['domain'].value_counts()
+    type_counts = df['result_type'].value_counts()
+    top_domains = df['domain'].value_counts().head(10)
+    positions = []
+    for result_type in df['result_type'].unique():
+        type_df = df[df['result_type'] == result_type]
+        positions.append((result_type, type_df['rank'].mean(), len(type_df)))
+    without_maps = set(df['address']) - set(df[maps_mask]['address'])
+    return {
+        'stats': stats,
+        'domains': domain_counts[domain_counts > 0].to_dict(),
+        'types': type_counts[type_counts > 0].to_dict(),
+        'top_domains': top_domains.index.tolist(),
+        'positions': sorted((str(t), round(float(m), 6), n) for t, m, n in positions),
+        'without_maps': len(without_maps)
+    }
+
+
+def engine_analysis(df: pd.DataFrame) -> dict:
+    """Новая схема: один проход groupby, все выходы сворачиваются из него"""
+    analyzer = ResultAnalyzer(df)
+    stats = analyzer.calculate_relevance_stats()
+    domains = analyzer.get_domain_distribution()
+    position_df = analyzer.get_position_analysis()
+    top_domains = analyzer._domain_counts().head(10)
+    return {
+        'stats': {key: stats[key] for key in
+                  ('total_results', 'unique_addresses', 'top_positions_maps', 'addresses_with_maps')},
+        'domains': dict(zip(domains['domain'], domains['count'])),
+        'types': analyzer._type_stats()['count'].to_dict(),
+        'top_domains': top_domains.index.tolist(),
+        'positions': sorted((str(row.type), round(float(row.avg_position), 6), int(row.count))
+                            for row in position_df.itertuples()),
+        'without_maps': len(analyzer.get_addresses_without_maps())
+    }
+
+
+def timed(function, df: pd.DataFrame, repeat: int):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = function(df)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк ResultAnalyzer")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--addresses", type=int, default=100_000)
+    parser.add_argument("--domains", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Число запусков (берется медиана)")
+    parser.add_argument("--output", help="Сохранить результаты в JSON файл")
+    args = parser.parse_args()
+
+    print(f"⏳ Генерация {args.rows:,} строк...", flush=True)
+    df = make_frame(args.rows, args.addresses, args.domains)
+    memory_mb = df.memory_usage(deep=True).sum() / 1024 / 1024
+    print(f"📦 Таблица: {memory_mb:.1f} МБ")
+
+    legacy_s, legacy = timed(legacy_analysis, df, args.repeat)
+    engine_s, engine = timed(engine_analysis, df, args.repeat)
+
+    # Повторные вызовы того же анализатора берутся из кэша
+    analyzer = ResultAnalyzer(df)
+    analyzer.calculate_relevance_stats()
+    started = time.perf_counter()
+    analyzer.calculate_relevance_stats()
+    analyzer.get_domain_distribution()
+    analyzer.get_result_type_distribution()
+    analyzer.get_position_analysis()
+    cached_s = time.perf_counter() - started
+
+    mismatched = [key for key in legacy if legacy[key] != engine[key]]
+    print(f"🐢 Прежняя схема: {legacy_s:.3f} с")
+    print(f"⚡ Единый проход groupby: {engine_s:.3f} с ({legacy_s / engine_s:.1f}x)")
+    print(f"♻️ Повторные вызовы из кэша: {cached_s * 1000:.2f} мс")
+    if mismatched:
+        print(f"❌ Расхождения с прежней схемой: {', '.join(mismatched)}")
+    else:
+        print("✅ Результаты совпадают с прежней схемой")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "rows": args.rows,
+                "memory_mb": round(memory_mb, 1),
+                "legacy_s": round(legacy_s, 4),
+                "engine_s": round(engine_s, 4),
+                "cached_ms": round(cached_s * 1000, 3),
+                "matches": not mismatched
+            }, f, ensure_ascii=False, indent=2)
+        print(f"💾 Результаты сохранены в {args.output}")
+
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк времени импорта (python -X importtime).
+
+Для каждой цели (верхнеуровневые импорты app.py, CLI, отдельные модули)
+запускается чистый интерпретатор, время импорта берется как медиана
+нескольких запусков и сравнивается с сохраненной базой.
+
+Примеры:
+    python benchmarks/importtime.py
+    python benchmarks/importtime.py --update-baseline
+    python benchmarks/importtime.py --max-regression 0.2   # код 1 при росте > 20%
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "importtime_baseline.json")
+
+# Скрипты, чьи верхнеуровневые импорты выполняются при каждом запуске
+# (отсутствующие пропускаются)
+SCRIPT_TARGETS = ["app.py", "cli.py"]
+MODULE_TARGETS = [
+    "utils.data_processor",
+    "utils.analyzer",
+    "utils.display",
+    "utils.browser_agent",
+    "utils.llm_client",
+    "utils.verdict",
+    "llm.model",
+]
+
+
+def script_imports(path: str) -> Optional[str]:
+    """Код верхнеуровневых импортов скрипта (сам скрипт не выполняется)"""
+    full_path = os.path.join(ROOT, path)
+    if not os.path.exists(full_path):
+        return None
+    with open(full_path, encoding="utf-8") as f:
+        source = f.read()
+    statements = [ast.get_source_segment(source, node)
+                  for node in ast.parse(source).body
+                  if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(statements)
+
+
+def measure(code: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """Время импорта (мс) и самые тяжелые модули по накопленному времени"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=ROOT
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1:] or ["ошибка импорта"]
+        raise RuntimeError(error[0])
+
+    total_us = 0
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        cumulative_us = int(parts[1])
+        name = parts[2].rstrip()
+        # Верхний уровень дерева импортов — без дополнительного отступа
+        if not name.startswith("   "):
+            total_us += cumulative_us
+        modules.append((name.strip(), cumulative_us / 1000))
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return total_us / 1000, modules[:10]
+
+
+def collect_targets() -> Dict[str, str]:
+    targets = {}
+    for script in SCRIPT_TARGETS:
+        code = script_imports(script)
+        if code is not None:
+            targets[script] = code
+    for module in MODULE_TARGETS:
+        targets[module] = f"import {module}"
+    return targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк времени импорта")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Число запусков на цель (берется медиана)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Сохранить результаты как базу для сравнения")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="Допустимый относительный рост времени (например 0.2)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Показать самые тяжелые модули")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    for name, code in collect_targets().items():
+        try:
+            runs = [measure(code) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"❌ {name}: {e}")
+            continue
+        total_ms = statistics.median(run[0] for run in runs)
+        results[name] = round(total_ms, 1)
+
+        line = f"⏱️ {name}: {total_ms:.1f} мс"
+        if name in baseline:
+            change = (total_ms - baseline[name]) / baseline[name] if baseline[name] else 0.0
+            line += f" (база {baseline[name]:.1f} мс, {change:+.0%})"
+            if args.max_regression is not None and change > args.max_regression:
+                regressions.append(name)
+                line += " ⚠️ регрессия"
+        print(line)
+        if args.verbose:
+            for module, module_ms in runs[-1][1]:
+                print(f"    {module_ms:8.1f} мс  {module}")
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"💾 База сохранена: {BASELINE_PATH}")
+
+    if regressions:
+        print(f"❌ Регрессии времени импорта: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Офлайн бенчмарк браузерного поиска на синтетических страницах выдачи.
+
+Локальный HTTP сервер отдает главную и страницы выдачи из
+benchmarks/fixtures, а LocalBrowserAgent проходит полный конвейер
+(браузер, скриншоты, превью, разбор DOM, OCR, анализ текста) так же,
+как на Яндексе, но без сети и капчи. Паузы между загрузками по
+умолчанию отключены (--delay-scale 0), чтобы мерить работу, а не sleep.
+
+Отчет: адресов в секунду, p50/p95 по этапам, процессорное время и пик
+RSS всего дерева процессов (Python, chromedriver, Chrome). С psutil
+дерево опрашивается периодически, без него используется resource
+(только дочерние процессы, которых дождался родитель). Каждый запуск
+сохраняется в benchmarks/results с версией из git, поэтому
+регрессии видны в --history и при сравнении с базой.
+
+Фикстуры в benchmarks/fixtures/serp синтетические: страницы собраны
+вручную по разметке выдачи Яндекса (классы serp-item, organic__*), а не
+записаны с живого поиска, поэтому размер DOM и число картинок меньше
+реальных и абсолютные цифры оптимистичны. Для сравнения версий между
+собой этого достаточно; реальные страницы записываются через --record
+(скрипты из страницы удаляются) и кладутся рядом.
+
+Страница выдачи выбирается по хэшу запроса; {{query}} в фикстуре
+заменяется текстом запроса.
+
+Примеры:
+    python benchmarks/serp_benchmark.py
+    python benchmarks/serp_benchmark.py --addresses 30 --workers 2 --latency 0.2
+    python benchmarks/serp_benchmark.py --update-baseline
+    python benchmarks/serp_benchmark.py --max-regression 0.2   # код 1 при ухудшении > 20%
+    python benchmarks/serp_benchmark.py --history
+    python benchmarks/serp_benchmark.py --record "Москва, улица Тверская, дом 1"
+"""
+
+import argparse
+import glob
+import html
+import itertools
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.browser_agent import (LocalBrowserAgent, iter_local_browser_search,  # noqa: E402
+                                 missing_browser_dependencies)
+from utils.timing import TimingStats  # noqa: E402
+
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+SERP_DIR = os.path.join(FIXTURES_DIR, "serp")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "serp_baseline.json")
+DEFAULT_ADDRESSES_FILE = os.path.join(ROOT, "test_data.json")
+
+# Метрики для сравнения с базой: True — больше значит лучше
+COMPARED_METRICS = {
+    'addresses_per_second': True,
+    'total_p95': False,
+    'cpu_per_address': False,
+    'peak_rss_mb': False,
+}
+
+
+def load_addresses(path: str, count: int) -> List[str]:
+    """Адреса из JSON (поле address, как в test_data.json) или текстового файла, по кругу до count"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            addresses = [item["address"] for item in json.load(f) if item.get("address")]
+        else:
+            addresses = [line.strip() for line in f if line.strip()]
+    if not addresses:
+        raise ValueError(f"В файле {path} нет адресов")
+    return list(itertools.islice(itertools.cycle(addresses), count))
+
+
+def _handler_class(pages: List[str], home: str, latency: float, counter: Dict[str, int]):
+    from http.server import BaseHTTPRequestHandler
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path in ("/", ""):
+                body = home
+            elif parts.path.rstrip("/") == "/search":
+                query = parse_qs(parts.query).get("text", [""])[0]
+                # Один и тот же запрос всегда получает одну и ту же страницу
+                page = pages[zlib.crc32(query.encode("utf-8")) % len(pages)]
+                body = page.replace("{{query}}", html.escape(query))
+                counter["serp"] += 1
+            else:
+                self.send_error(404)
+                return
+            if latency:
+                time.sleep(latency)
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+class FixtureServer:
+    """Локальный сервер фикстур на свободном порту 127.0.0.1"""
+
+    def __init__(self, latency: float = 0.0):
+        from http.server import ThreadingHTTPServer
+
+        pages = []
+        for path in sorted(glob.glob(os.path.join(SERP_DIR, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                pages.append(f.read())
+        if not pages:
+            raise FileNotFoundError(f"Нет страниц выдачи в {SERP_DIR}")
+        with open(os.path.join(FIXTURES_DIR, "home.html"), encoding="utf-8") as f:
+            home = f.read()
+        self.pages = len(pages)
+        self.counter = {"serp": 0}
+        self._server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), _handler_class(pages, home, latency, self.counter))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="serp-fixtures", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FixtureServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class ResourceMonitor:
+    """Процессорное время и пик RSS текущего процесса вместе с браузерами"""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._cpu_by_pid: Dict[int, float] = {}
+        self._peak_rss = 0
+        try:
+            import psutil
+            self._process = psutil.Process()
+            self.source = "psutil"
+        except ImportError:
+            self._process = None
+            self.source = "resource"
+            self._usage_before = self._rusage()
+
+    @staticmethod
+    def _rusage():
+        import resource
+
+        return [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+
+    def _sample(self):
+        import psutil
+
+        try:
+            processes = [self._process] + self._process.children(recursive=True)
+        except psutil.Error:
+            return
+        rss = 0
+        for process in processes:
+            try:
+                with process.oneshot():
+                    cpu = process.cpu_times()
+                    rss += process.memory_info().rss
+            except psutil.Error:
+                continue
+            # Время завершившегося процесса остается последним замеренным
+            self._cpu_by_pid[process.pid] = max(self._cpu_by_pid.get(process.pid, 0.0), cpu.user + cpu.system)
+        self._peak_rss = max(self._peak_rss, rss)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "ResourceMonitor":
+        if self._process is not None:
+            self._sample()
+            # Время процесса до начала замера (импорты, загрузка фикстур) не учитывается
+            self._cpu_before = sum(self._cpu_by_pid.values())
+            self._thread = threading.Thread(target=self._loop, name="resource-monitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> Dict:
+        if self._process is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+            return {"cpu_seconds": sum(self._cpu_by_pid.values()) - self._cpu_before,
+                    "peak_rss_mb": self._peak_rss / 2 ** 20, "resource_source": self.source}
+
+        before, after = self._usage_before, self._rusage()
+        cpu = sum((a.ru_utime + a.ru_stime) - (b.ru_utime + b.ru_stime) for a, b in zip(after, before))
+        # ru_maxrss: килобайты в Linux, байты в macOS; пик отдельного процесса, а не суммы
+        scale = 1 if sys.platform == "darwin" else 1024
+        peak = max(usage.ru_maxrss for usage in after) * scale
+        return {"cpu_seconds": cpu, "peak_rss_mb": peak / 2 ** 20, "resource_source": self.source}
+
+
+def git_version() -> str:
+    try:
+        completed = subprocess.run(["git", "describe", "--always", "--dirty"],
+                                   capture_output=True, text=True, cwd=ROOT, timeout=30)
+        return completed.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def run_benchmark(addresses: List[str], workers: int, headless: bool,
+                  delay_scale: float, latency: float) -> Dict:
+    """Полный конвейер LocalBrowserAgent против локального сервера фикстур"""
+    stats = TimingStats()
+    successful = serp_results = captchas = 0
+    first_result = None
+    worker_errors: List[BaseException] = []
+    workdir = tempfile.mkdtemp(prefix="serp_benchmark_")
+    cwd = os.getcwd()
+    # Скриншоты и тексты агент пишет в относительные папки: уводим их во временную
+    os.chdir(workdir)
+    try:
+        with FixtureServer(latency) as server:
+            monitor = ResourceMonitor().start()
+            started = time.perf_counter()
+            for result in iter_local_browser_search(addresses, headless=headless, workers=workers,
+                                                    base_url=server.url, delay_scale=delay_scale,
+                                                    worker_errors=worker_errors):
+                first_result = first_result or time.perf_counter() - started
+                stats.add(result.get("timings"))
+                successful += bool(result.get("success"))
+                serp_results += len(result.get("results") or [])
+                captchas += bool(result.get("captcha_detected"))
+            wall = time.perf_counter() - started
+            resources = monitor.stop()
+            fixture_pages = server.pages
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    stages = {row["stage"]: {"p50": round(row["p50"], 4), "p95": round(row["p95"], 4),
+                             "max": round(row["max"], 4)} for row in stats.summary()}
+    return {
+        "version": git_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"addresses": len(addresses), "workers": workers, "headless": headless,
+                       "delay_scale": delay_scale, "latency": latency, "fixture_pages": fixture_pages},
+        "successful": successful,
+        "serp_results": serp_results,
+        "captchas": captchas,
+        # Упавший браузер снижает параллельность: такие замеры несравнимы с базой
+        "worker_errors": [str(error) for error in worker_errors],
+        "wall_seconds": round(wall, 3),
+        "first_result_seconds": round(first_result or 0.0, 3),
+        "addresses_per_second": round(len(addresses) / wall, 4) if wall else 0.0,
+        "total_p95": stages.get("total", {}).get("p95", 0.0),
+        "cpu_seconds": round(resources["cpu_seconds"], 3),
+        "cpu_per_address": round(resources["cpu_seconds"] / len(addresses), 4),
+        "peak_rss_mb": round(resources["peak_rss_mb"], 1),
+        "resource_source": resources["resource_source"],
+        "stages": stages,
+    }
+
+
+def print_report(report: Dict):
+    print(f"🚀 Версия {report['version']}: {report['parameters']['addresses']} адресов, "
+          f"{report['parameters']['workers']} потоков, {report['parameters']['fixture_pages']} страниц выдачи")
+    print(f"✅ Успешно: {report['successful']}, результатов выдачи: {report['serp_results']}, "
+          f"капч: {report['captchas']}")
+    if report.get("worker_errors"):
+        print(f"⚠️ Потоков браузера остановлено ошибкой: {len(report['worker_errors'])} "
+              f"(первая: {report['worker_errors'][0]})")
+    print(f"⏱️ {report['wall_seconds']:.1f} с, {report['addresses_per_second']:.3f} адресов/с "
+          f"(первый результат через {report['first_result_seconds']:.1f} с)")
+    print(f"🖥️ CPU {report['cpu_seconds']:.1f} с ({report['cpu_per_address']:.2f} с на адрес), "
+          f"пик RSS {report['peak_rss_mb']:.0f} МБ [{report['resource_source']}]")
+    print(f"{'Этап':<18}{'p50, с':>9}{'p95, с':>9}{'макс, с':>9}")
+    for stage, values in report["stages"].items():
+        print(f"{stage:<18}{values['p50']:>9.3f}{values['p95']:>9.3f}{values['max']:>9.3f}")
+
+
+def compare(report: Dict, baseline: Dict, max_regression: Optional[float]) -> List[str]:
+    """Сравнение с базой; возвращает метрики, ухудшившиеся больше допустимого"""
+    regressions = []
+    print(f"📏 База: версия {baseline.get('version', '?')} от {baseline.get('timestamp', '?')}")
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        current, base = report.get(metric), baseline.get(metric)
+        if not current or not base:
+            continue
+        change = (current - base) / base
+        worse = -change if higher_is_better else change
+        line = f"   {metric}: {current:g} (база {base:g}, {change:+.0%})"
+        if max_regression is not None and worse > max_regression:
+            regressions.append(metric)
+            line += " ⚠️ регрессия"
+        print(line)
+    return regressions
+
+
+def save_report(report: Dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = report["timestamp"].replace(":", "").replace("-", "")
+    version = re.sub(r"[^\w.-]", "_", report["version"])
+    path = os.path.join(RESULTS_DIR, f"serp_{stamp}_{version}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def print_history():
+    """Сохраненные запуски по времени: видно, в какой версии изменились показатели"""
+    reports = []
+    for path in glob.glob(os.path.join(RESULTS_DIR, "serp_*.json")):
+        with open(path, encoding="utf-8") as f:
+            reports.append(json.load(f))
+    if not reports:
+        print(f"📭 Нет сохраненных запусков в {RESULTS_DIR}")
+        return
+    print(f"{'Время':<21}{'Версия':<22}{'Адр.':>6}{'Адр./с':>9}{'p95, с':>9}{'CPU/адр.':>10}{'RSS, МБ':>9}")
+    for report in sorted(reports, key=lambda item: item["timestamp"]):
+        print(f"{report['timestamp']:<21}{report['version'][:21]:<22}{report['parameters']['addresses']:>6}"
+              f"{report['addresses_per_second']:>9.3f}{report['total_p95']:>9.2f}"
+              f"{report['cpu_per_address']:>10.2f}{report['peak_rss_mb']:>9.0f}")
+
+
+def record_fixtures(addresses: List[str], headless: bool):
+    """Записать страницы выдачи с живого Яндекса в benchmarks/fixtures/serp"""
+    from urllib.parse import quote_plus
+
+    os.makedirs(SERP_DIR, exist_ok=True)
+    agent = LocalBrowserAgent(headless=headless)
+    try:
+        agent.open()
+        for address in addresses:
+            agent.driver.get(f"{agent.base_url}/search/?text={quote_plus(address)}")
+            time.sleep(3)
+            # Без скриптов страница статична и не уходит в сеть за выдачей
+            page = re.sub(r"<script\b.*?</script>", "", agent.driver.page_source, flags=re.S | re.I)
+            name = agent._transliterate_russian(re.sub(r"[^\w\s-]", "", address)).replace(" ", "_")[:40]
+            path = os.path.join(SERP_DIR, f"serp_{name}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(page)
+            print(f"💾 {address} → {path}")
+    finally:
+        agent.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн бенчмарк браузерного поиска на фикстурах выдачи")
+    parser.add_argument("--addresses", type=int, default=10, help="Число адресов (по кругу из файла)")
+    parser.add_argument("--addresses-file", default=DEFAULT_ADDRESSES_FILE,
+                        help="JSON с полем address или текстовый файл, адрес на строку")
+    parser.add_argument("--workers", type=int, default=1, help="Потоков с отдельным браузером")
+    parser.add_argument("--show-browser", action="store_true", help="Запускать браузер с окном")
+    parser.add_argument("--delay-scale", type=float, default=0.0,
+                        help="Множитель пауз агента (1 — как при реальном поиске)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Задержка ответа сервера фикстур, секунды")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Сохранить результат как базу для сравнения")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="Допустимое относительное ухудшение (например 0.2)")
+    parser.add_argument("--no-save", action="store_true", help="Не сохранять запуск в benchmarks/results")
+    parser.add_argument("--history", action="store_true", help="Показать сохраненные запуски и выйти")
+    parser.add_argument("--record", nargs="+", metavar="ADDRESS",
+                        help="Записать выдачу живого Яндекса по адресам в фикстуры и выйти")
+    args = parser.parse_args()
+
+    if args.history:
+        print_history()
+        return
+
+    missing = missing_browser_dependencies()
+    if missing:
+        print(f"❌ Не установлены зависимости браузерного агента: {', '.join(missing)}")
+        sys.exit(2)
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    if args.record:
+        record_fixtures(args.record, headless=not args.show_browser)
+        return
+
+    addresses = load_addresses(args.addresses_file, args.addresses)
+    report = run_benchmark(addresses, args.workers, not args.show_browser, args.delay_scale, args.latency)
+    print_report(report)
+
+    if not args.no_save:
+        print(f"💾 Запуск сохранен: {save_report(report)}")
+
+    regressions = []
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 База сохранена: {BASELINE_PATH}")
+
+    if regressions:
+        print(f"❌ Регрессии браузерного поиска: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,648 @@
+#!/usr/bin/env python3
+"""
+🤖 Локальный ИИ Поиск Адресов — пакетный запуск без Streamlit
+
+Примеры:
+    python cli.py run test_data.json -o results.ndjson
+    python cli.py run addresses.txt -o results.ndjson --workers 2 --resume
+    python cli.py run addresses.ndjson -o results.ndjson --verdict --llm-concurrency 8
+    python cli.py worker --processes 2
+    python cli.py coordinate addresses.txt -o results.ndjson --queue-url redis://queue-host:6379/0
+    python cli.py work --queue-url redis://queue-host:6379/0 --workers 2
+    python cli.py --metrics-port 9108 worker --processes 2
+    python cli.py index results.ndjson
+    python cli.py search "аренда OR ООО"
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Set
+
+from utils.timing import TimingStats
+
+
+def iter_addresses_from_file(path: str) -> Iterator[str]:
+    """Адреса из файла потоково: .json (массив), .ndjson/.jsonl, .csv или .txt (по строке)"""
+    from utils.data_processor import DataProcessor
+
+    yield from DataProcessor.iter_addresses(path)
+
+
+def load_done_addresses(output_path: str) -> Set[str]:
+    """Адреса, уже успешно обработанные в прошлых запусках (для --resume)"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Последняя строка могла оборваться при аварийной остановке
+                continue
+            if record.get('success'):
+                done.add(record['address'])
+    return done
+
+
+class RunStats:
+    """Счетчики и пропускная способность пакетного запуска"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.processed = 0
+        self.successful = 0
+        self.errors = 0
+        self.skipped = 0
+        self.results_found = 0
+        self.timings = TimingStats()
+        # Ошибки потоков, остановивших свой браузер (поиск продолжили остальные)
+        self.worker_errors: List[BaseException] = []
+
+    def add(self, result: Dict):
+        self.processed += 1
+        if result.get('success'):
+            self.successful += 1
+        else:
+            self.errors += 1
+        self.results_found += len(result.get('results', []))
+        self.timings.add(result.get('timings'))
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate_per_minute(self) -> float:
+        return self.processed / self.elapsed * 60 if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        per_address = self.elapsed / self.processed if self.processed else 0.0
+        lines = [
+            "=" * 50,
+            f"📊 Обработано адресов: {self.processed} (пропущено как готовые: {self.skipped})",
+            f"✅ Успешных: {self.successful}, ❌ ошибок: {self.errors}",
+            f"🔗 Найдено результатов: {self.results_found}",
+            f"⏱️ Время: {self.elapsed:.1f} с, {per_address:.1f} с на адрес, {self.rate_per_minute:.1f} адресов/мин",
+        ]
+        if self.worker_errors:
+            lines.append(f"⚠️ Потоков браузера остановлено ошибкой: {len(self.worker_errors)} "
+                         f"(первая: {self.worker_errors[0]})")
+        if self.timings:
+            lines += ["", "⏱️ Этапы поиска:", self.timings.format_table()]
+        return "\n".join(lines)
+
+
+def open_run_writer(prefix: str):
+    """Запись запуска в колоночное хранилище, если установлен pyarrow"""
+    import importlib.util
+    from utils.result_store import ResultStore, RunWriter
+
+    if importlib.util.find_spec('pyarrow') is None:
+        print("⚠️ pyarrow не установлен, результаты не попадут в хранилище")
+        return None
+    return RunWriter(ResultStore(), ResultStore.new_run_id(prefix))
+
+
+def metrics_options(args):
+    """Порт, файл и период записи метрик из аргументов или config"""
+    import config
+
+    port = config.METRICS_PORT if args.metrics_port is None else args.metrics_port
+    path = config.METRICS_FILE if args.metrics_file is None else args.metrics_file
+    return port, path, args.metrics_interval
+
+
+def open_metrics_exporter(port, path, interval):
+    """HTTP endpoint /metrics и (или) файл метрик; None, если оба выключены"""
+    from utils.metrics import MetricsExporter
+
+    if not port and not path:
+        return None
+    exporter = MetricsExporter(port=port or None, path=path or None, interval=interval)
+    if exporter.port:
+        print(f"📈 Метрики: http://localhost:{exporter.port}/metrics", flush=True)
+    if path:
+        print(f"📈 Метрики пишутся в {path}", flush=True)
+    return exporter
+
+
+def open_text_index():
+    """Полнотекстовый индекс результатов"""
+    from utils.text_index import TextIndex
+
+    return TextIndex()
+
+
+def write_results(output, results: List[Dict], stats: RunStats, writer=None,
+                  text_index=None, run_id=None):
+    for result in results:
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        if writer:
+            writer.add(result)
+        if text_index:
+            text_index.add_result(result, run_id)
+        stats.add(result)
+        status = "✅" if result.get('success') else "❌"
+        print(f"{status} [{stats.processed}] {result['address']} — "
+              f"{len(result.get('results', []))} результатов, {stats.rate_per_minute:.1f} адресов/мин", flush=True)
+    output.flush()
+
+
+def attach_verdicts(results: List[Dict], client, cache):
+    from utils.verdict import run_verdicts
+
+    verdicts = run_verdicts(client, results, cache=cache)
+    for result in results:
+        verdict = verdicts.get(result['address'])
+        if verdict:
+            result['verdict'] = verdict['verdict']
+            result['verdict_error'] = verdict['error']
+
+
+def command_run(args) -> int:
+    from utils.browser_agent import iter_local_browser_search, missing_browser_dependencies
+
+    missing = missing_browser_dependencies()
+    if missing:
+        print(f"❌ Не установлены зависимости: {', '.join(missing)}")
+        print("💡 Установите командой: pip install -r requirements.txt")
+        return 1
+
+    stats = RunStats()
+    done = load_done_addresses(args.output) if args.resume else set()
+    if done:
+        print(f"♻️ Уже обработано ранее: {len(done)} адресов, они будут пропущены")
+
+    def addresses():
+        count = 0
+        for address in iter_addresses_from_file(args.input):
+            if address in done:
+                stats.skipped += 1
+                continue
+            if args.limit and count >= args.limit:
+                return
+            count += 1
+            yield address
+
+    client = cache = None
+    if args.verdict:
+        from utils.llm_client import LLMClient
+        from utils.verdict_cache import VerdictCache
+        client = LLMClient(api_url=args.llm_url,
+                           concurrency=args.llm_concurrency)
+        cache = None if args.no_cache else VerdictCache()
+
+    writer = open_run_writer('cli') if args.store else None
+    text_index = None if args.no_index else open_text_index()
+    # Идентификатор запуска в индексе совпадает с тем, что даст дозагрузка файла
+    run_id = os.path.splitext(os.path.basename(args.output))[0]
+    buffer: List[Dict] = []
+    # Без --resume файл перезаписывается, с --resume дописывается
+    with open(args.output, 'a' if args.resume else 'w', encoding='utf-8') as output:
+        try:
+            for result in iter_local_browser_search(addresses(), headless=not args.show_browser,
+                                                    workers=args.workers,
+                                                    worker_errors=stats.worker_errors):
+                buffer.append(result)
+                # Вердикты запрашиваются пачками, чтобы использовать параллельность LLM API
+                if not args.verdict or len(buffer) >= args.verdict_batch:
+                    if args.verdict:
+                        attach_verdicts(buffer, client, cache)
+                    write_results(output, buffer, stats, writer, text_index, run_id)
+                    buffer = []
+        except KeyboardInterrupt:
+            print("\n⛔ Остановлено пользователем")
+        finally:
+            if buffer:
+                if args.verdict:
+                    attach_verdicts(buffer, client, cache)
+                write_results(output, buffer, stats, writer, text_index, run_id)
+            if writer:
+                writer.flush()
+            if client:
+                client.close()
+
+    print(stats.summary())
+    print(f"💾 Результаты: {args.output}")
+    if writer:
+        print(f"🗄️ Запуск в хранилище: {writer.run_id}")
+    return 0 if stats.errors == 0 and not stats.worker_errors else 2
+
+
+def run_job(queue, job: Dict):
+    """Выполнение одного задания очереди с записью результатов в его NDJSON файл"""
+    from utils.browser_agent import iter_local_browser_search
+
+    params = job['params']
+    done = successful = 0
+    writer = open_run_writer(f"job{job['id']}")
+    text_index = open_text_index()
+    run_id = os.path.splitext(os.path.basename(job['results_path']))[0]
+    worker_errors: List[BaseException] = []
+    print(f"▶️ Задание {job['id']}: {job['total']} адресов", flush=True)
+    try:
+        with open(job['results_path'], 'w', encoding='utf-8') as output:
+            results = iter_local_browser_search(job['addresses'],
+                                                headless=params.get('headless', True),
+                                                workers=params.get('workers', 1),
+                                                worker_errors=worker_errors)
+            try:
+                for result in results:
+                    output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    output.flush()
+                    if writer:
+                        writer.add(result)
+                    text_index.add_result(result, run_id)
+                    done += 1
+                    successful += 1 if result.get('success') else 0
+                    queue.update_progress(job['id'], done, successful)
+                    if queue.is_cancel_requested(job['id']):
+                        queue.mark_cancelled(job['id'])
+                        print(f"⛔ Задание {job['id']} отменено", flush=True)
+                        return
+            finally:
+                results.close()
+                if writer:
+                    writer.flush()
+                text_index.close()
+        queue.complete(job['id'])
+        print(f"✅ Задание {job['id']} завершено: {successful}/{done} успешных", flush=True)
+        if worker_errors:
+            print(f"⚠️ Задание {job['id']}: потоков браузера остановлено ошибкой: "
+                  f"{len(worker_errors)} (первая: {worker_errors[0]})", flush=True)
+    except Exception as e:
+        queue.fail(job['id'], str(e))
+        print(f"❌ Задание {job['id']} завершилось ошибкой: {e}", flush=True)
+
+
+def worker_loop(db_path: str, poll_interval: float, exit_when_idle: bool, metrics=None):
+    """Процесс-воркер: забирает задания из очереди, пока не будет остановлен.
+
+    metrics — (порт, файл, период) метрик этого процесса, если их отдает он сам.
+    """
+    import socket
+    from utils.job_queue import JobQueue
+
+    exporter = open_metrics_exporter(*metrics) if metrics else None
+
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    queue = JobQueue(db_path)
+    queue.heartbeat(worker_id)
+    stop = threading.Event()
+
+    def heartbeat():
+        # Отдельное соединение: основное занято долгими заданиями
+        heartbeat_queue = JobQueue(db_path)
+        while not stop.wait(poll_interval):
+            heartbeat_queue.heartbeat(worker_id)
+        heartbeat_queue.close()
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    print(f"👷 Воркер {worker_id} запущен", flush=True)
+    try:
+        while True:
+            queue.requeue_stale()
+            job = queue.claim(worker_id)
+            if job is None:
+                if exit_when_idle:
+                    break
+                time.sleep(poll_interval)
+                continue
+            run_job(queue, job)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        queue.remove_worker(worker_id)
+        queue.close()
+        if exporter:
+            exporter.close()
+        print(f"👋 Воркер {worker_id} остановлен", flush=True)
+
+
+def command_worker(args) -> int:
+    import multiprocessing
+    import config
+    from utils.browser_agent import missing_browser_dependencies
+
+    missing = missing_browser_dependencies()
+    if missing:
+        print(f"❌ Не установлены зависимости: {', '.join(missing)}")
+        print("💡 Установите командой: pip install -r requirements.txt")
+        return 1
+
+    db_path = args.db or config.JOBS_DB_PATH
+    poll_interval = config.JOBS_POLL_INTERVAL
+    if args.processes == 1:
+        worker_loop(db_path, poll_interval, args.exit_when_idle)
+        return 0
+
+    # Каждый процесс берет свое задание, так несколько заданий идут параллельно.
+    # Метрики у процессов свои: порт + номер процесса, файл с суффиксом номера
+    from utils.metrics import process_metrics_options
+
+    port, path, interval = metrics_options(args)
+    processes = [multiprocessing.Process(
+        target=worker_loop,
+        args=(db_path, poll_interval, args.exit_when_idle,
+              (*process_metrics_options(port, path, idx), interval)))
+        for idx in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+    return 0
+
+
+def command_coordinate(args) -> int:
+    from utils.work_queue import open_work_queue
+
+    queue = open_work_queue(args.queue_url)
+    if not args.collect_only:
+        batch: List[str] = []
+        enqueued = 0
+        for address in iter_addresses_from_file(args.input):
+            batch.append(address)
+            if len(batch) >= 500:
+                enqueued += queue.enqueue(args.queue, batch)
+                batch = []
+        enqueued += queue.enqueue(args.queue, batch)
+        print(f"📥 В очередь '{args.queue}' поставлено адресов: {enqueued}", flush=True)
+    if args.no_wait:
+        return 0
+
+    stats = RunStats()
+    writer = open_run_writer('dist') if args.store else None
+    text_index = None if args.no_index else open_text_index()
+    run_id = os.path.splitext(os.path.basename(args.output))[0]
+    seen: Set[str] = set()
+    cursor = 0
+    with open(args.output, 'a' if args.collect_only else 'w', encoding='utf-8') as output:
+        try:
+            while True:
+                # Аренда нуля адресов только обрабатывает истекшие аренды упавших воркеров
+                queue.lease(args.queue, 'coordinator', 0)
+                results, cursor = queue.fetch_results(args.queue, cursor)
+                fresh = []
+                for item_id, result in results:
+                    if item_id not in seen:
+                        seen.add(item_id)
+                        fresh.append(result)
+                write_results(output, fresh, stats, writer, text_index, run_id)
+                counts = queue.stats(args.queue)
+                if not counts['pending'] and not counts['leased']:
+                    break
+                time.sleep(args.poll_interval)
+        except KeyboardInterrupt:
+            print("\n⛔ Сбор результатов остановлен, адреса остаются в очереди")
+        finally:
+            if writer:
+                writer.flush()
+    queue.close()
+
+    print(stats.summary())
+    print(f"💾 Результаты: {args.output}")
+    if writer:
+        print(f"🗄️ Запуск в хранилище: {writer.run_id}")
+    return 0 if stats.errors == 0 else 2
+
+
+def command_work(args) -> int:
+    import socket
+    from utils.browser_agent import iter_local_browser_search, missing_browser_dependencies
+    from utils.work_queue import open_work_queue
+
+    missing = missing_browser_dependencies()
+    if missing:
+        print(f"❌ Не установлены зависимости: {', '.join(missing)}")
+        print("💡 Установите командой: pip install -r requirements.txt")
+        return 1
+
+    queue = open_work_queue(args.queue_url, visibility_timeout=args.visibility_timeout)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    # Результат содержит только адрес, поэтому id аренды ищем по адресу
+    leased: Dict[str, List[str]] = {}
+    leased_lock = threading.Lock()
+    # Остановка поиска (Ctrl+C, ошибка) прерывает ожидание адресов в пустой очереди
+    stop = threading.Event()
+
+    def addresses():
+        while not stop.is_set():
+            items = queue.lease(args.queue, worker_id, 1)
+            if not items:
+                if args.exit_when_idle:
+                    return
+                stop.wait(args.poll_interval)
+                continue
+            item_id, address = items[0]
+            with leased_lock:
+                leased.setdefault(address, []).append(item_id)
+            yield address
+
+    stats = RunStats()
+    print(f"👷 Воркер {worker_id} подключен к очереди '{args.queue}'", flush=True)
+    try:
+        for result in iter_local_browser_search(addresses(), headless=not args.show_browser,
+                                                workers=args.workers, stop_event=stop,
+                                                worker_errors=stats.worker_errors):
+            with leased_lock:
+                item_id = leased[result['address']].pop(0)
+            if not queue.complete(args.queue, item_id, worker_id, result):
+                print(f"⚠️ Аренда адреса истекла, результат отброшен: {result['address']}", flush=True)
+            stats.add(result)
+            status = "✅" if result.get('success') else "❌"
+            print(f"{status} [{stats.processed}] {result['address']}", flush=True)
+    except KeyboardInterrupt:
+        print("\n⛔ Воркер остановлен, невыполненные аренды вернутся в очередь по таймауту")
+    finally:
+        stop.set()
+        queue.close()
+
+    print(stats.summary())
+    return 0
+
+
+def command_index(args) -> int:
+    import glob
+    import config
+
+    text_index = open_text_index()
+    result_files = list(args.results) + sorted(
+        glob.glob(os.path.join(os.path.dirname(config.JOBS_DB_PATH) or '.', 'job_*.ndjson')))
+    counts = text_index.backfill(args.text_dir, result_files)
+    stats = text_index.stats()
+    text_index.close()
+    print(f"🗂️ Добавлено документов: {counts['documents']} из {counts['files']} файлов")
+    print(f"📚 Всего в индексе: {stats['documents']}")
+    return 0
+
+
+def command_search(args) -> int:
+    from utils.text_index import DOCUMENT_KINDS
+
+    text_index = open_text_index()
+    started = time.perf_counter()
+    try:
+        if args.documents:
+            rows = text_index.search(args.query, limit=args.limit, prefix=not args.exact)
+        else:
+            rows = text_index.search_addresses(args.query, limit=args.limit, prefix=not args.exact)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        text_index.close()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    for row in rows:
+        fragment = ' '.join(row['fragment'].split())
+        if args.documents:
+            print(f"📄 {row['address']} [{DOCUMENT_KINDS.get(row['kind'], row['kind'])}] {row['url']}")
+        else:
+            kinds = ', '.join(DOCUMENT_KINDS.get(kind, kind) for kind in row['kinds'])
+            print(f"📍 {row['address']} — совпадений: {row['documents']} ({kinds})")
+        print(f"   {fragment}")
+    print(f"🔎 Найдено: {len(rows)} за {elapsed_ms:.1f} мс")
+    return 0 if rows else 2
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Локальный ИИ Поиск Адресов — пакетный запуск без Streamlit")
+    parser.add_argument("--log-level", default="WARNING",
+                        help="Уровень логирования (INFO для подробного вывода)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Порт HTTP endpoint /metrics в формате Prometheus (по умолчанию METRICS_PORT)")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Файл, куда периодически пишутся метрики (по умолчанию METRICS_FILE)")
+    parser.add_argument("--metrics-interval", type=float, default=None,
+                        help="Период записи файла метрик, с (по умолчанию METRICS_FLUSH_INTERVAL)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser(
+        "run", help="Поиск по адресам из файла с записью результатов в NDJSON")
+    run.add_argument("input", help="Файл адресов: .json, .ndjson/.jsonl или .txt")
+    run.add_argument("-o", "--output", default="results.ndjson",
+                     help="Файл результатов (NDJSON, пишется по мере готовности)")
+    run.add_argument("--workers", type=int, default=1,
+                     help="Число параллельных браузеров")
+    run.add_argument("--limit", type=int, default=None,
+                     help="Обработать не больше N адресов")
+    run.add_argument("--resume", action="store_true",
+                     help="Пропустить адреса, уже успешно записанные в output")
+    run.add_argument("--show-browser", action="store_true",
+                     help="Показывать окно браузера (по умолчанию headless)")
+    run.add_argument("--verdict", action="store_true",
+                     help="Запросить вердикт LLM для каждого адреса")
+    run.add_argument("--llm-url", default=None,
+                     help="Адрес LLM API (по умолчанию LLM_API_URL)")
+    run.add_argument("--llm-concurrency", type=int, default=None,
+                     help="Параллельных запросов к LLM API")
+    run.add_argument("--verdict-batch", type=int, default=16,
+                     help="Сколько адресов копить перед пакетным запросом вердиктов")
+    run.add_argument("--no-cache", action="store_true",
+                     help="Не использовать кэш вердиктов")
+    run.add_argument("--store", action="store_true",
+                     help="Сохранить запуск в колоночное хранилище (Parquet)")
+    run.add_argument("--no-index", action="store_true",
+                     help="Не добавлять результаты в полнотекстовый индекс")
+    run.set_defaults(handler=command_run)
+
+    worker = subparsers.add_parser(
+        "worker", help="Фоновый воркер очереди заданий поиска")
+    worker.add_argument("--processes", type=int, default=1,
+                        help="Число процессов-воркеров (заданий, выполняемых параллельно)")
+    worker.add_argument("--db", default=None,
+                        help="Файл очереди заданий (по умолчанию JOBS_DB_PATH)")
+    worker.add_argument("--exit-when-idle", action="store_true",
+                        help="Завершиться, когда очередь опустеет")
+    worker.set_defaults(handler=command_worker)
+
+    coordinate = subparsers.add_parser(
+        "coordinate", help="Поставить адреса в общую очередь и собрать результаты воркеров")
+    coordinate.add_argument("input", nargs="?", help="Файл адресов: .json, .ndjson/.jsonl или .txt")
+    coordinate.add_argument("-o", "--output", default="results.ndjson",
+                            help="Файл результатов (NDJSON)")
+    coordinate.add_argument("--queue-url", default=None,
+                            help="Очередь: sqlite:///файл.db или redis://хост:6379/0 (по умолчанию WORK_QUEUE_URL)")
+    coordinate.add_argument("--queue", default="default", help="Имя очереди")
+    coordinate.add_argument("--no-wait", action="store_true",
+                            help="Только поставить адреса в очередь, не ждать результатов")
+    coordinate.add_argument("--collect-only", action="store_true",
+                            help="Не ставить адреса, только дописать результаты в output")
+    coordinate.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Период опроса очереди, с")
+    coordinate.add_argument("--store", action="store_true",
+                            help="Сохранить запуск в колоночное хранилище (Parquet)")
+    coordinate.add_argument("--no-index", action="store_true",
+                            help="Не добавлять результаты в полнотекстовый индекс")
+    coordinate.set_defaults(handler=command_coordinate)
+
+    work = subparsers.add_parser(
+        "work", help="Воркер общей очереди: брать адреса в аренду и сдавать результаты")
+    work.add_argument("--queue-url", default=None,
+                      help="Очередь: sqlite:///файл.db или redis://хост:6379/0 (по умолчанию WORK_QUEUE_URL)")
+    work.add_argument("--queue", default="default", help="Имя очереди")
+    work.add_argument("--workers", type=int, default=1,
+                      help="Число параллельных браузеров на этой машине")
+    work.add_argument("--visibility-timeout", type=float, default=None,
+                      help="Через сколько секунд невыполненный адрес выдается другому воркеру")
+    work.add_argument("--poll-interval", type=float, default=2.0,
+                      help="Период опроса пустой очереди, с")
+    work.add_argument("--exit-when-idle", action="store_true",
+                      help="Завершиться, когда очередь опустеет")
+    work.add_argument("--show-browser", action="store_true",
+                      help="Показывать окно браузера (по умолчанию headless)")
+    work.set_defaults(handler=command_work)
+
+    index = subparsers.add_parser(
+        "index", help="Дозагрузить в полнотекстовый индекс прошлые результаты и extracted_text")
+    index.add_argument("results", nargs="*",
+                       help="NDJSON файлы результатов (результаты заданий добавляются всегда)")
+    index.add_argument("--text-dir", default="extracted_text",
+                       help="Папка с текстом, распознанным со скриншотов")
+    index.set_defaults(handler=command_index)
+
+    search = subparsers.add_parser(
+        "search", help="Полнотекстовый поиск по собранным результатам")
+    search.add_argument("query", help='Запрос: слова, "фраза", OR/ИЛИ, NOT/НЕ')
+    search.add_argument("--documents", action="store_true",
+                        help="Показать документы, а не адреса")
+    search.add_argument("--limit", type=int, default=20, help="Сколько результатов показать")
+    search.add_argument("--exact", action="store_true",
+                        help="Искать слова целиком (по умолчанию — по началу слова)")
+    search.set_defaults(handler=command_search)
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.command == "coordinate" and not args.input and not args.collect_only:
+        parser.error("coordinate: укажите файл адресов или --collect-only")
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING),
+                        format='%(asctime)s %(levelname)s - %(message)s')
+    # Несколько процессов воркера поднимают метрики сами, каждый свои
+    exporter = None
+    if not (args.command == "worker" and args.processes > 1):
+        exporter = open_metrics_exporter(*metrics_options(args))
+    try:
+        code = args.handler(args)
+    finally:
+        if exporter:
+            exporter.close()
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,59 @@
 # Config package
+import os
+
+# Внешний LLM API для вкладки "Вердикт" (переопределяется переменными окружения)
+LLM_API_URL = os.environ.get("LLM_API_URL", "http://10.2.0.244:8000/chat")
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "60"))
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BACKOFF = float(os.environ.get("LLM_RETRY_BACKOFF", "1.0"))
+
+# Кэш вердиктов LLM
+VERDICT_CACHE_PATH = os.environ.get("VERDICT_CACHE_PATH", "cache/verdicts.db")
+VERDICT_CACHE_MAX_BYTES = int(os.environ.get(
+    "VERDICT_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Бюджет промпта вердикта (в приблизительных токенах)
+VERDICT_TOKEN_BUDGET = int(os.environ.get("VERDICT_TOKEN_BUDGET", "768"))
+LLM_CHARS_PER_TOKEN = float(os.environ.get("LLM_CHARS_PER_TOKEN", "3.0"))
+
+# Фоновые задания поиска (очередь SQLite и NDJSON результаты заданий)
+JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", "jobs/jobs.db")
+JOBS_POLL_INTERVAL = float(os.environ.get("JOBS_POLL_INTERVAL", "2"))
+JOBS_WORKER_TIMEOUT = float(os.environ.get("JOBS_WORKER_TIMEOUT", "60"))
+
+# Распределенный поиск: общая очередь адресов (sqlite:///файл.db или redis://хост:6379/0)
+WORK_QUEUE_URL = os.environ.get("WORK_QUEUE_URL", "sqlite:///jobs/work_queue.db")
+WORK_QUEUE_VISIBILITY_TIMEOUT = float(os.environ.get("WORK_QUEUE_VISIBILITY_TIMEOUT", "300"))
+WORK_QUEUE_MAX_ATTEMPTS = int(os.environ.get("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+
+# Колоночное хранилище результатов (Parquet, разбиение по дате и запуску)
+RESULT_STORE_PATH = os.environ.get("RESULT_STORE_PATH", "results_store")
+RESULT_STORE_BATCH = int(os.environ.get("RESULT_STORE_BATCH", "200"))
+
+# Кэш аналитики между перезапусками Streamlit (число пар данные+фильтры)
+ANALYTICS_CACHE_ENTRIES = int(os.environ.get("ANALYTICS_CACHE_ENTRIES", "16"))
+
+# Полнотекстовый индекс (SQLite FTS5) по выдаче, OCR и анализу страниц
+TEXT_INDEX_PATH = os.environ.get("TEXT_INDEX_PATH", "cache/text_index.db")
+
+# Размер страницы в списках результатов приложения
+RESULTS_PAGE_SIZE = int(os.environ.get("RESULTS_PAGE_SIZE", "25"))
+
+# Превью скриншотов (WebP в папке thumbs рядом со скриншотом)
+THUMBNAIL_WIDTH = int(os.environ.get("THUMBNAIL_WIDTH", "480"))
+THUMBNAIL_QUALITY = int(os.environ.get("THUMBNAIL_QUALITY", "70"))
+
+# Выгрузка результатов: размер блока и порог фоновой записи на диск (в строках)
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "exports")
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "50000"))
+EXPORT_BACKGROUND_ROWS = int(os.environ.get("EXPORT_BACKGROUND_ROWS", "200000"))
+
+# Метрики Prometheus: порт HTTP endpoint /metrics (0 — выключен) и файл с периодической записью
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "15"))
+
+# Поисковик браузерного агента и множитель пауз между загрузками (0 — без пауз, для бенчмарка)
+SEARCH_BASE_URL = os.environ.get("SEARCH_BASE_URL", "https://yandex.ru")
+SEARCH_DELAY_SCALE = float(os.environ.get("SEARCH_DELAY_SCALE", "1"))
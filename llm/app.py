@@ -1,5 +1,6 @@
 import streamlit as st
 from model import ChatLLM
+import os
 import time
 
 st.set_page_config(
@@ -16,7 +17,9 @@ def load_model():
     return ChatLLM(
         model_name="yandex/YandexGPT-5-Lite-8B-instruct",
         device="cuda",
-        dtype="float16"
+        dtype="float16",
+        load_mode=os.environ.get("LLM_LOAD_MODE", "auto"),
+        num_threads=int(os.environ.get("LLM_THREADS", "0")) or None
     )
 
 
@@ -50,16 +53,25 @@ if prompt := st.chat_input("Введите сообщение"):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # Генерация ответа
+    # Генерация ответа потоком
     with st.chat_message("assistant"):
-        with st.spinner("Генерация ответа..."):
-            response = st.session_state.model.generate(
+        timings = {}
+        started = time.perf_counter()
+
+        def stream():
+            for chunk in st.session_state.model.generate_stream(
                 prompt=prompt,
                 system_prompt=system_prompt,
                 max_tokens=512,
                 temperature=0.7
-            )
-            st.markdown(response)
+            ):
+                timings.setdefault("ttft", time.perf_counter() - started)
+                yield chunk
+
+        response = st.write_stream(stream())
+        latency = time.perf_counter() - started
+        st.caption(
+            f"⏱️ Первый токен: {timings.get('ttft', latency):.2f} с, всего: {latency:.2f} с")
 
     # Добавляем ответ ассистента в историю
     st.session_state.messages.append(
@@ -0,0 +1,125 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GenerationRequest:
+    prompt: str
+    system_prompt: str
+    max_tokens: int
+    temperature: float
+    top_p: float
+    prompt_prefix: Optional[str] = None
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class DynamicBatcher:
+    """Динамический микро-батчер перед ChatLLM.generate_batch.
+
+    Запросы из разных потоков копятся в очереди; фоновый поток забирает
+    до max_batch_size запросов, ожидая добор не дольше max_wait_ms после
+    первого, и выполняет их одним проходом модели. Запросы с разными
+    параметрами сэмплирования или разными общими префиксами
+    обрабатываются отдельными батчами.
+    """
+
+    def __init__(self, model, max_batch_size: int = 8, max_wait_ms: float = 20):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[GenerationRequest]" = queue.Queue()
+        self._stopped = threading.Event()
+        self.stats = {"batches": 0, "requests": 0}
+        self._thread = threading.Thread(
+            target=self._loop, name="llm-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        prompt: str,
+        system_prompt: str = "Ты — полезный ассистент, который всегда даёт точные и информативные ответы.",
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        top_p: float = 0.95,
+        prompt_prefix: Optional[str] = None
+    ) -> Future:
+        """Поставить запрос в очередь; результат — Future со строкой ответа"""
+        request = GenerationRequest(
+            prompt, system_prompt, max_tokens, temperature, top_p, prompt_prefix)
+        self._queue.put(request)
+        return request.future
+
+    def generate(self, *args, **kwargs) -> str:
+        """Блокирующая генерация через общий батч"""
+        return self.submit(*args, **kwargs).result()
+
+    def queue_size(self) -> int:
+        return self._queue.qsize()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join(timeout=5)
+
+    def _collect(self) -> List[GenerationRequest]:
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            groups: Dict[tuple, List[GenerationRequest]] = {}
+            for request in batch:
+                # Кэш префикса применим только к запросам с общим системным промптом
+                prefix_key = (request.prompt_prefix, request.system_prompt) \
+                    if request.prompt_prefix else (None, None)
+                groups.setdefault(
+                    (request.temperature, request.top_p) + prefix_key, []).append(request)
+            for (temperature, top_p, prompt_prefix, _), requests in groups.items():
+                self._run(requests, temperature, top_p, prompt_prefix)
+
+    def _run(self, requests: List[GenerationRequest], temperature: float, top_p: float,
+             prompt_prefix: Optional[str] = None):
+        started = time.perf_counter()
+        try:
+            responses = self.model.generate_batch(
+                [r.prompt for r in requests],
+                system_prompt=[r.system_prompt for r in requests],
+                max_tokens=[r.max_tokens for r in requests],
+                temperature=temperature,
+                top_p=top_p,
+                prompt_prefix=prompt_prefix
+            )
+        except Exception as e:
+            logger.error(f"❌ Ошибка генерации батча: {str(e)}")
+            for request in requests:
+                request.future.set_exception(e)
+            return
+        for request, response in zip(requests, responses):
+            request.future.set_result(response)
+        self.stats["batches"] += 1
+        self.stats["requests"] += len(requests)
+        logger.info(
+            f"🧠 Батч из {len(requests)} запросов за {time.perf_counter() - started:.2f} с")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк режимов загрузки ChatLLM: время загрузки, память и токены/с.
+
+Каждый режим запускается в отдельном процессе, чтобы замеры памяти
+не смешивались. Пик RSS загрузки (максимум до первой генерации)
+выводится отдельно от памяти после загрузки: у режимов с квантизацией
+на CPU он заметно выше установившейся памяти.
+
+Пример: python llm/benchmark.py --device cpu --modes bf16 int8 int4 --threads 8
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+PROMPT = "Вот фрагмент поисковой выдачи по адресу: «ООО Ромашка — магазин продуктов, Москва, улица Тверская, дом 1». Ведётся ли по этому адресу коммерческая деятельность? Ответь 'Да' или 'Нет' и кратко объясни почему."
+
+
+def current_rss_mb() -> float:
+    """Текущая резидентная память процесса (Linux), иначе пиковая"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В macOS значение в байтах, в Linux — в килобайтах
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def run_single(args) -> dict:
+    from model import ChatLLM
+
+    started = time.perf_counter()
+    model = ChatLLM(model_name=args.model, device=args.device,
+                    load_mode=args.single, num_threads=args.threads)
+    load_time = time.perf_counter() - started
+    rss_after_load = current_rss_mb()
+    # ru_maxrss до генерации — пик, достигнутый при загрузке весов
+    load_peak_rss = peak_rss_mb()
+
+    # Прогрев, затем замер генерации
+    model.generate(PROMPT, max_tokens=8, temperature=0)
+    started = time.perf_counter()
+    response = model.generate(PROMPT, max_tokens=args.max_tokens, temperature=0)
+    generation_time = time.perf_counter() - started
+    tokens = len(model.tokenizer.encode(response, add_special_tokens=False))
+
+    return {
+        "mode": args.single,
+        "device": model.device.type,
+        "dtype": str(model.dtype),
+        "threads": args.threads,
+        "load_time_s": round(load_time, 2),
+        "rss_after_load_mb": round(rss_after_load, 1),
+        "load_peak_rss_mb": round(load_peak_rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "generated_tokens": tokens,
+        "tokens_per_s": round(tokens / generation_time, 2) if generation_time else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Бенчмарк режимов загрузки ChatLLM")
+    parser.add_argument(
+        "--model", default="yandex/YandexGPT-5-Lite-8B-instruct")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--modes", nargs="+",
+                        default=["auto", "bf16", "int8", "int4"])
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Число потоков torch на CPU")
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--output", help="Сохранить результаты в JSON файл")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args), ensure_ascii=False))
+        return
+
+    results = []
+    for mode in args.modes:
+        print(f"⏳ Режим {mode}...", flush=True)
+        command = [sys.executable, os.path.abspath(__file__), "--single", mode,
+                   "--model", args.model, "--device", args.device,
+                   "--max-tokens", str(args.max_tokens)]
+        if args.threads:
+            command += ["--threads", str(args.threads)]
+        completed = subprocess.run(
+            command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()[-1:] or ["неизвестная ошибка"]
+            print(f"  ❌ {error[0]}")
+            results.append({"mode": mode, "error": error[0]})
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(f"  ✅ загрузка {result['load_time_s']} с (пик RSS {result['load_peak_rss_mb']} МБ), "
+              f"RSS после загрузки {result['rss_after_load_mb']} МБ, "
+              f"пик за запуск {result['peak_rss_mb']} МБ, {result['tokens_per_s']} токенов/с")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест LLM сервера /chat.
+
+Пример: python llm/loadtest.py --url http://localhost:8000 --requests 64 --concurrency 16
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PROMPT = "Вот фрагмент поисковой выдачи и анализа по адресу. Определи, ведётся ли по этому адресу коммерческая деятельность? Ответь только 'Да' или 'Нет' и кратко объясни почему.\n\nТекст:\nАдрес: Москва, улица Тверская, дом {n}\nООО Ромашка — магазин продуктов, часы работы 9:00–21:00\n\nВердикт:"
+SYSTEM_PROMPT = "Ты — эксперт по анализу коммерческой деятельности по адресу. Отвечай кратко, тезисно, только по фактам из текста."
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест /chat")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+    session.mount("http://", adapter)
+
+    def send(n: int):
+        started = time.perf_counter()
+        response = session.post(f"{args.url}/chat", json={
+            "prompt": PROMPT.format(n=n),
+            "system_prompt": SYSTEM_PROMPT,
+            "max_tokens": args.max_tokens,
+            "temperature": 0.1
+        }, timeout=600)
+        return response.status_code, time.perf_counter() - started
+
+    print(
+        f"🚀 {args.requests} запросов, параллельно {args.concurrency} → {args.url}/chat")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(send, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for status, latency in results if status == 200]
+    failed = len(results) - len(latencies)
+    print(f"✅ Успешно: {len(latencies)}, ❌ ошибок: {failed}")
+    print(f"⏱️ Время: {elapsed:.1f} с, {len(latencies) / elapsed:.2f} запросов/с")
+    print(f"📊 Задержка p50: {percentile(latencies, 0.5):.2f} с, "
+          f"p95: {percentile(latencies, 0.95):.2f} с, max: {max(latencies, default=0):.2f} с")
+
+    metrics = session.get(f"{args.url}/metrics", timeout=10).json()
+    print("📈 Метрики сервера:")
+    print(json.dumps(metrics, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,37 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Optional, Union
+import copy
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# torch и transformers импортируются при создании первой модели
+torch = None
+transformers = None
+
+
+def _load_backend():
+    global torch, transformers
+    if torch is None:
+        import torch as _torch
+        import transformers as _transformers
+        torch, transformers = _torch, _transformers
+
+LOAD_MODES = ("auto", "bf16", "int8", "int4")
+# Сколько разных префиксов держать в KV-кэше
+PREFIX_CACHE_SIZE = 8
+# Сколько ждать следующий фрагмент потоковой генерации (с ожиданием блокировки модели), секунд
+STREAM_TIMEOUT = 300.0
+
+
+@dataclass
+class PrefixEntry:
+    token_ids: List[int]
+    cache: Any
+    prefill_time: float
 
 
 class ChatLLM:
@@ -7,16 +39,228 @@ class ChatLLM:
         self,
         model_name: str = "yandex/YandexGPT-5-Lite-8B-instruct",
         device: str = "cuda",
-        dtype: torch.dtype = torch.float16
+        dtype: Union[str, "torch.dtype"] = "float16",
+        load_mode: str = "auto",
+        num_threads: Optional[int] = None
     ):
+        """
+        load_mode:
+            auto — веса в dtype (на CPU float16 заменяется на bfloat16)
+            bf16 — bfloat16, основной режим для CPU
+            int8 — 8-битные веса: bitsandbytes на GPU, динамическая
+                   квантизация Linear слоев torch на CPU. На CPU модель
+                   загружается в bfloat16 и квантуется по слою, поэтому пик
+                   памяти при загрузке — как у bf16 (~2 байта на параметр,
+                   ~16 ГБ для 8B), а после загрузки — около 1 байта на параметр
+            int4 — 4-битные веса: bitsandbytes NF4 на GPU, optimum-quanto на CPU
+        num_threads — число потоков torch на CPU
+        """
+        _load_backend()
+        if load_mode not in LOAD_MODES:
+            raise ValueError(
+                f"Неизвестный режим загрузки: {load_mode} (доступны: {', '.join(LOAD_MODES)})")
+        if num_threads:
+            torch.set_num_threads(num_threads)
         self.device = torch.device(
             device if torch.cuda.is_available() else "cpu")
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(
+        if isinstance(dtype, str):
+            dtype = getattr(torch, dtype)
+        on_cpu = self.device.type == "cpu"
+        if load_mode == "bf16" or (on_cpu and dtype == torch.float16):
+            # float16 на CPU медленный и поддерживается не всеми операциями
+            dtype = torch.bfloat16
+        if load_mode == "int8" and on_cpu:
+            # Загружаем компактно, в float32 переводится только квантуемый слой
+            dtype = torch.bfloat16
+        self.dtype = dtype
+        self.load_mode = load_mode
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+        # Для батчей дополняем слева, чтобы генерация продолжала реальный текст
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        # safetensors (если есть в чекпоинте) читаются через mmap без промежуточной
+        # копии весов; чекпоинты только с .bin загружаются обычным способом
+        self.model = transformers.AutoModelForCausalLM.from_pretrained(
             model_name,
-            device_map=device,
-            torch_dtype="auto"
+            device_map=self.device.type,
+            torch_dtype=dtype,
+            low_cpu_mem_usage=True,
+            quantization_config=self._quantization_config(load_mode, on_cpu)
         )
+        if load_mode == "int8" and on_cpu:
+            self._quantize_int8_by_layer(self.model)
+            self.dtype = torch.float32
+        self.model.eval()
+        # Один проход модели за раз: батчи и потоковая генерация не пересекаются
+        self._lock = threading.Lock()
+        self._prefix_cache: "OrderedDict[str, PrefixEntry]" = OrderedDict()
+        self.prefix_stats = {"prefixes": 0, "hits": 0,
+                             "misses": 0, "saved_prefill_s": 0.0}
+
+    @staticmethod
+    def _quantize_int8_by_layer(model):
+        """Динамическая int8 квантизация Linear слоев по одному.
+
+        quantize_dynamic требует float32 весов у всей модели сразу (для 8B —
+        ~32 ГБ); здесь в float32 переводится только текущий слой, а его
+        bfloat16 веса освобождаются после замены квантованным.
+        """
+        from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+
+        qconfig = torch.ao.quantization.default_dynamic_qconfig
+        for parent in list(model.modules()):
+            for name, child in list(parent.named_children()):
+                if type(child) is not torch.nn.Linear:
+                    continue
+                child.float()
+                child.qconfig = qconfig
+                setattr(parent, name, DynamicLinear.from_float(child))
+        # Квантованные Linear принимают float32: эмбеддинги и нормализация — тоже в float32
+        model.float()
+
+    @staticmethod
+    def _quantization_config(load_mode: str, on_cpu: bool):
+        """Конфигурация квантизации весов при загрузке"""
+        if load_mode not in ("int8", "int4"):
+            return None
+        if on_cpu:
+            if load_mode == "int8":
+                # Квантизуется после загрузки
+                return None
+            try:
+                from transformers import QuantoConfig
+                import optimum.quanto  # noqa: F401
+            except ImportError:
+                raise ImportError(
+                    "Для int4 на CPU установите optimum-quanto: pip install optimum-quanto")
+            return QuantoConfig(weights="int4")
+        try:
+            from transformers import BitsAndBytesConfig
+            import bitsandbytes  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                "Для int8/int4 на GPU установите bitsandbytes: pip install bitsandbytes")
+        if load_mode == "int8":
+            return BitsAndBytesConfig(load_in_8bit=True)
+        return BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.bfloat16
+        )
+
+    def _render_chat(self, prompt: str, system_prompt: str) -> str:
+        """Текст запроса по чат-шаблону модели"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return self.tokenizer.apply_chat_template(messages, tokenize=False)
+
+    @staticmethod
+    def _sampling(temperature: float, top_p: float) -> dict:
+        if temperature > 0:
+            return {"do_sample": True, "temperature": temperature, "top_p": top_p}
+        return {"do_sample": False}
+
+    def _prefix_entry(self, prompt: str, system_prompt: str, prompt_prefix: str) -> Optional[PrefixEntry]:
+        """KV-кэш общего префикса (системный промпт + начало запроса).
+
+        Считается один раз и переиспользуется для всех запросов с тем же
+        префиксом. Последний токен префикса отбрасывается: на границе
+        с продолжением токенизация может склеить его с текстом запроса.
+        """
+        rendered = self._render_chat(prompt, system_prompt)
+        position = rendered.find(prompt_prefix)
+        if position < 0:
+            return None
+        prefix_text = rendered[:position + len(prompt_prefix)]
+        entry = self._prefix_cache.get(prefix_text)
+        if entry is not None:
+            self._prefix_cache.move_to_end(prefix_text)
+            return entry
+
+        prefix_ids = self.tokenizer(
+            prefix_text, return_tensors="pt", add_special_tokens=False)["input_ids"][:, :-1]
+        if prefix_ids.size(1) == 0:
+            return None
+        started = time.perf_counter()
+        with torch.inference_mode():
+            outputs = self.model(prefix_ids.to(self.device), use_cache=True)
+        entry = PrefixEntry(
+            token_ids=prefix_ids[0].tolist(),
+            cache=outputs.past_key_values,
+            prefill_time=time.perf_counter() - started
+        )
+        self._prefix_cache[prefix_text] = entry
+        if len(self._prefix_cache) > PREFIX_CACHE_SIZE:
+            self._prefix_cache.popitem(last=False)
+        self.prefix_stats["prefixes"] += 1
+        logger.info(
+            f"🧩 Префикс закэширован: {len(entry.token_ids)} токенов, префилл {entry.prefill_time:.3f} с")
+        return entry
+
+    def _prepare_inputs(self, prompts: List[str], system_prompts: List[str],
+                        prompt_prefix: Optional[str] = None):
+        """Токены запросов и, если возможно, KV-кэш общего префикса.
+
+        Без префикса промпты дополняются слева. С префиксом раскладка
+        [префикс][паддинг][остаток запроса]: префикс берется из кэша,
+        паддинг закрыт маской внимания, позиции считаются по маске.
+        """
+        texts = [self._render_chat(prompt, system)
+                 for prompt, system in zip(prompts, system_prompts)]
+        entry = None
+        if prompt_prefix and len(set(system_prompts)) == 1 and all(
+                prompt.startswith(prompt_prefix) for prompt in prompts):
+            entry = self._prefix_entry(
+                prompts[0], system_prompts[0], prompt_prefix)
+        if entry is not None and len(prompts) > 1 and not hasattr(entry.cache, "batch_repeat_interleave"):
+            entry = None
+
+        if entry is not None:
+            prefix_length = len(entry.token_ids)
+            # Шаблон уже содержит служебные токены
+            token_ids = self.tokenizer(
+                texts, add_special_tokens=False)["input_ids"]
+            if all(ids[:prefix_length] == entry.token_ids for ids in token_ids):
+                suffixes = [ids[prefix_length:] for ids in token_ids]
+                width = max(len(suffix) for suffix in suffixes)
+                input_ids, attention_mask = [], []
+                for suffix in suffixes:
+                    padding = width - len(suffix)
+                    input_ids.append(entry.token_ids +
+                                     [self.tokenizer.pad_token_id] * padding + suffix)
+                    attention_mask.append(
+                        [1] * prefix_length + [0] * padding + [1] * len(suffix))
+                inputs = {
+                    "input_ids": torch.tensor(input_ids, device=self.device),
+                    "attention_mask": torch.tensor(attention_mask, device=self.device)
+                }
+                return inputs, entry
+
+        inputs = self.tokenizer(
+            texts,
+            return_tensors="pt",
+            padding=True,
+            add_special_tokens=False
+        ).to(self.device)
+        return inputs, None
+
+    def _prefix_kwargs(self, entry: Optional[PrefixEntry], batch_size: int) -> dict:
+        """Копия кэша префикса для одного вызова generate (сам кэш не меняется)"""
+        if entry is None:
+            self.prefix_stats["misses"] += batch_size
+            return {}
+        cache = copy.deepcopy(entry.cache)
+        if batch_size > 1:
+            cache.batch_repeat_interleave(batch_size)
+        self.prefix_stats["hits"] += batch_size
+        self.prefix_stats["saved_prefill_s"] += entry.prefill_time * batch_size
+        logger.info(
+            f"♻️ Префикс из кэша для {batch_size} запросов: {len(entry.token_ids)} токенов, "
+            f"сэкономлено ~{entry.prefill_time:.3f} с префилла на запрос")
+        return {"past_key_values": cache}
 
     def generate(
         self,
@@ -24,32 +268,111 @@ class ChatLLM:
         system_prompt: str = "Ты — полезный ассистент, который всегда даёт точные и информативные ответы.",
         max_tokens: int = 512,
         temperature: float = 0.7,
-        top_p: float = 0.95
+        top_p: float = 0.95,
+        prompt_prefix: Optional[str] = None
     ) -> str:
-        # Формируем сообщения согласно документации
-        messages = [{"role": "user", "content": prompt}]
-
-        # Применяем чат-шаблон как в официальном примере
-        input_ids = self.tokenizer.apply_chat_template(
-            messages,
-            tokenize=True,
-            return_tensors="pt"
-        ).to(self.device)
-
-        # Генерация
-        outputs = self.model.generate(
-            input_ids,
-            max_new_tokens=max_tokens,
+        return self.generate_batch(
+            [prompt],
+            system_prompt=system_prompt,
+            max_tokens=max_tokens,
             temperature=temperature,
             top_p=top_p,
-            do_sample=True,
-            pad_token_id=self.tokenizer.eos_token_id
-        )
+            prompt_prefix=prompt_prefix
+        )[0]
 
-        # Декодируем только новые токены как в документации
-        response = self.tokenizer.decode(
-            outputs[0][input_ids.size(1):],
-            skip_special_tokens=True
-        )
+    def generate_batch(
+        self,
+        prompts: List[str],
+        system_prompt: Union[str, List[str]] = "Ты — полезный ассистент, который всегда даёт точные и информативные ответы.",
+        max_tokens: Union[int, List[int]] = 512,
+        temperature: float = 0.7,
+        top_p: float = 0.95,
+        prompt_prefix: Optional[str] = None
+    ) -> List[str]:
+        """Генерация ответов на несколько промптов за один проход модели.
+
+        system_prompt и max_tokens задаются общими или по одному на промпт.
+        Промпты дополняются слева до общей длины; генерация идет до
+        наибольшего max_tokens, а ответы обрезаются до своего лимита.
+        Если все промпты начинаются с prompt_prefix, его KV-кэш
+        переиспользуется и префилл идет только по остатку запросов.
+        """
+        if isinstance(system_prompt, str):
+            system_prompt = [system_prompt] * len(prompts)
+        if isinstance(max_tokens, int):
+            max_tokens = [max_tokens] * len(prompts)
+
+        with self._lock, torch.inference_mode():
+            inputs, entry = self._prepare_inputs(
+                prompts, system_prompt, prompt_prefix)
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=max(max_tokens),
+                pad_token_id=self.tokenizer.pad_token_id,
+                **self._prefix_kwargs(entry, len(prompts)),
+                **self._sampling(temperature, top_p)
+            )
+
+        # Декодируем только новые токены
+        prompt_length = inputs["input_ids"].size(1)
+        responses = []
+        for output, limit in zip(outputs, max_tokens):
+            response = self.tokenizer.decode(
+                output[prompt_length:prompt_length + limit],
+                skip_special_tokens=True
+            )
+            responses.append(response.strip())
+        return responses
+
+    def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: str = "Ты — полезный ассистент, который всегда даёт точные и информативные ответы.",
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        top_p: float = 0.95,
+        prompt_prefix: Optional[str] = None,
+        timeout: float = STREAM_TIMEOUT
+    ) -> Iterator[str]:
+        """Потоковая генерация: фрагменты ответа по мере появления токенов.
+
+        Ошибка генерации в рабочем потоке пробрасывается потребителю;
+        если следующий фрагмент не пришел за timeout секунд — TimeoutError.
+        """
+        import queue
+
+        streamer = transformers.TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=timeout)
+        errors: List[BaseException] = []
+
+        def run():
+            try:
+                with self._lock, torch.inference_mode():
+                    inputs, entry = self._prepare_inputs(
+                        [prompt], [system_prompt], prompt_prefix)
+                    self.model.generate(
+                        **inputs,
+                        max_new_tokens=max_tokens,
+                        pad_token_id=self.tokenizer.pad_token_id,
+                        streamer=streamer,
+                        **self._prefix_kwargs(entry, 1),
+                        **self._sampling(temperature, top_p)
+                    )
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                # Без end() потребитель ждал бы фрагменты вечно
+                streamer.end()
 
-        return response.strip()
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            for chunk in streamer:
+                if chunk:
+                    yield chunk
+        except queue.Empty:
+            raise TimeoutError(f"Нет новых токенов дольше {timeout:.0f} с")
+        thread.join()
+        if errors:
+            logger.error(f"❌ Ошибка потоковой генерации: {errors[0]}")
+            raise errors[0]
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Локальный LLM сервер с API /chat, совместимым с вкладкой "Вердикт".
+
+POST /chat     {"prompt", "system_prompt", "max_tokens", "temperature"} -> {"response"}
+               необязательный "prompt_prefix" — общее начало промпта, KV-кэш
+               которого переиспользуется между запросами
+               с "stream": true ответ идет как text/event-stream:
+               data: {"token": "..."} ... data: {"done": true, "response": "...", "ttft": ...}
+GET  /metrics  задержки, пропускная способность, очередь
+GET  /health   проверка готовности
+
+Запуск: python llm/server.py --port 8000
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from batcher import DynamicBatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYSTEM_PROMPT = "Ты — полезный ассистент, который всегда даёт точные и информативные ответы."
+
+
+class ServerMetrics:
+    """Метрики сервера: счетчики, задержки и токены в секунду"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.generated_tokens = 0
+        self.latencies = deque(maxlen=window)
+        self.ttfts = deque(maxlen=window)
+
+    def start_request(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finish_request(self, latency: float, tokens: int = 0, error: bool = False,
+                       ttft: Optional[float] = None):
+        with self._lock:
+            self.in_flight -= 1
+            self.requests += 1
+            if error:
+                self.errors += 1
+            else:
+                self.latencies.append(latency)
+                self.generated_tokens += tokens
+                if ttft is not None:
+                    self.ttfts.append(ttft)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    @staticmethod
+    def _percentile(values, q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            uptime = time.time() - self.started_at
+            latencies = list(self.latencies)
+            ttfts = list(self.ttfts)
+            return {
+                'uptime_s': round(uptime, 1),
+                'requests': self.requests,
+                'errors': self.errors,
+                'rejected': self.rejected,
+                'in_flight': self.in_flight,
+                'latency_p50_s': round(self._percentile(latencies, 0.5), 3),
+                'latency_p95_s': round(self._percentile(latencies, 0.95), 3),
+                'latency_max_s': round(max(latencies, default=0.0), 3),
+                'ttft_p50_s': round(self._percentile(ttfts, 0.5), 3),
+                'ttft_p95_s': round(self._percentile(ttfts, 0.95), 3),
+                'requests_per_s': round(self.requests / uptime, 3) if uptime else 0.0,
+                'generated_tokens': self.generated_tokens,
+                'tokens_per_s': round(self.generated_tokens / uptime, 2) if uptime else 0.0
+            }
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    server_version = "LocalChatLLM/1.0"
+
+    def _send_json(self, status: int, data: Dict):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            metrics = self.server.metrics.snapshot()
+            batcher = self.server.batcher
+            metrics['queue_size'] = batcher.queue_size()
+            metrics['batches'] = batcher.stats['batches']
+            metrics['avg_batch_size'] = round(
+                batcher.stats['requests'] / batcher.stats['batches'], 2) if batcher.stats['batches'] else 0.0
+            prefix_stats = getattr(self.server.model, 'prefix_stats', None)
+            if prefix_stats:
+                hits = prefix_stats['hits']
+                metrics['prefix_cache'] = {
+                    'prefixes': prefix_stats['prefixes'],
+                    'hits': hits,
+                    'misses': prefix_stats['misses'],
+                    'saved_prefill_s': round(prefix_stats['saved_prefill_s'], 3),
+                    'saved_prefill_per_hit_s': round(prefix_stats['saved_prefill_s'] / hits, 4) if hits else 0.0
+                }
+            self._send_json(200, metrics)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/chat":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            prompt, params = self._parse_chat_request(request)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"bad request: {str(e)}"})
+            return
+
+        # Ограничение одновременных запросов: лишние получают 503 и повторяют позже
+        if not self.server.slots.acquire(timeout=self.server.queue_timeout):
+            self.server.metrics.reject()
+            self._send_json(503, {"error": "server busy"})
+            return
+
+        # Слот освобождается при любом исходе, включая обрыв соединения
+        try:
+            self.server.metrics.start_request()
+            if request.get("stream"):
+                self._stream_chat(prompt, params)
+                return
+
+            started = time.perf_counter()
+            try:
+                response = self.server.batcher.generate(prompt, **params)
+            except Exception as e:
+                self.server.metrics.finish_request(
+                    time.perf_counter() - started, error=True)
+                self._send_json(500, {"error": str(e)})
+                return
+        finally:
+            self.server.slots.release()
+
+        latency = time.perf_counter() - started
+        tokens = len(self.server.tokenizer.encode(
+            response, add_special_tokens=False))
+        self.server.metrics.finish_request(latency, tokens)
+        self._send_json(200, {"response": response,
+                              "latency": round(latency, 3),
+                              "completion_tokens": tokens})
+
+    @staticmethod
+    def _parse_chat_request(request) -> Tuple[str, Dict]:
+        """Проверка полей запроса /chat до занятия слота; ошибка — ValueError/KeyError/TypeError"""
+        if not isinstance(request, dict):
+            raise TypeError("ожидается JSON объект")
+        prompt = request["prompt"]
+        if not isinstance(prompt, str):
+            raise TypeError("prompt должен быть строкой")
+        system_prompt = request.get("system_prompt", DEFAULT_SYSTEM_PROMPT)
+        prompt_prefix = request.get("prompt_prefix")
+        if not isinstance(system_prompt, str) or not isinstance(prompt_prefix, (str, type(None))):
+            raise TypeError("system_prompt и prompt_prefix должны быть строками")
+        max_tokens = int(request.get("max_tokens", 512))
+        temperature = float(request.get("temperature", 0.7))
+        if max_tokens <= 0:
+            raise ValueError("max_tokens должен быть положительным")
+        if temperature < 0:
+            raise ValueError("temperature не может быть отрицательной")
+        return prompt, {
+            "system_prompt": system_prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "prompt_prefix": prompt_prefix
+        }
+
+    def _send_event(self, data: Dict):
+        self.wfile.write(
+            f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def _stream_chat(self, prompt: str, params: Dict):
+        """Потоковый ответ (SSE): токены отправляются по мере генерации"""
+        started = time.perf_counter()
+        ttft = None
+        chunks = []
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for chunk in self.server.model.generate_stream(prompt, **params):
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                chunks.append(chunk)
+                self._send_event({"token": chunk})
+        except Exception as e:
+            self.server.metrics.finish_request(
+                time.perf_counter() - started, error=True)
+            try:
+                self._send_event({"error": str(e)})
+            except OSError:
+                pass
+            return
+
+        response = "".join(chunks).strip()
+        latency = time.perf_counter() - started
+        tokens = len(self.server.tokenizer.encode(
+            response, add_special_tokens=False))
+        self.server.metrics.finish_request(latency, tokens, ttft=ttft)
+        self._send_event({"done": True,
+                          "response": response,
+                          "ttft": round(ttft or latency, 3),
+                          "latency": round(latency, 3),
+                          "completion_tokens": tokens})
+
+
+class ChatServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, model, max_batch_size: int = 8, max_wait_ms: float = 20,
+                 max_concurrency: int = 32, queue_timeout: float = 30):
+        super().__init__(address, ChatHandler)
+        self.model = model
+        self.tokenizer = model.tokenizer
+        self.batcher = DynamicBatcher(
+            model, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.metrics = ServerMetrics()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный LLM сервер /chat")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--model", default="yandex/YandexGPT-5-Lite-8B-instruct")
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--dtype", default="float16")
+    parser.add_argument("--load-mode", default="auto", choices=["auto", "bf16", "int8", "int4"],
+                        help="Режим загрузки весов: bf16 на CPU ~2 байта на параметр; int8 на CPU "
+                             "квантуется по слою — пик при загрузке как у bf16, после — ~1 байт")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Число потоков torch на CPU")
+    parser.add_argument("--max-batch-size", type=int, default=8,
+                        help="Максимум запросов в одном проходе модели")
+    parser.add_argument("--max-wait-ms", type=float, default=20,
+                        help="Сколько ждать добора батча после первого запроса")
+    parser.add_argument("--max-concurrency", type=int, default=32,
+                        help="Максимум одновременных запросов (остальные получают 503)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)s - %(message)s')
+
+    from model import ChatLLM
+
+    logger.info(f"🧠 Загружаем модель {args.model}...")
+    model = ChatLLM(model_name=args.model, device=args.device, dtype=args.dtype,
+                    load_mode=args.load_mode, num_threads=args.threads)
+    server = ChatServer(
+        (args.host, args.port),
+        model,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_concurrency=args.max_concurrency
+    )
+    logger.info(
+        f"🚀 Сервер запущен: http://{args.host}:{args.port}/chat (метрики: /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("⛔ Сервер остановлен")
+    finally:
+        server.batcher.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -153,7 +153,9 @@ def main():
 
     if all_good:
         print("\n✅ Все проверки пройдены!")
-        input("\nНажмите Enter для запуска приложения...")
+        # Без терминала (cron, systemd) не ждем подтверждения
+        if sys.stdin.isatty():
+            input("\nНажмите Enter для запуска приложения...")
         run_streamlit()
     else:
         print("\n⚠️ Есть проблемы с настройкой")
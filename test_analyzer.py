@@ -0,0 +1,47 @@
+"""
+Тесты ResultAnalyzer: единый проход groupby дает те же статистики, что
+прежний расчет по строкам (сверка из benchmarks/analyzer_benchmark.py)
+"""
+
+import pytest
+
+from benchmarks.analyzer_benchmark import engine_analysis, legacy_analysis, make_frame
+from utils.analyzer import MAPS_TYPES, ResultAnalyzer
+
+
+def assert_same_analysis(df):
+    legacy, engine = legacy_analysis(df), engine_analysis(df)
+    assert {key: value for key, value in engine.items() if key != 'top_domains'} == \
+        {key: value for key, value in legacy.items() if key != 'top_domains'}
+    # При равных частотах порядок доменов может отличаться: сверяются частоты
+    counts = df['domain'].value_counts()
+    assert [counts[d] for d in engine['top_domains']] == [counts[d] for d in legacy['top_domains']]
+
+
+@pytest.mark.parametrize("rows, addresses, domains, seed", [
+    (5_000, 500, 50, 1),
+    (2_000, 1_500, 10, 2),
+    (50, 5, 3, 3),
+])
+def test_matches_legacy_analysis(rows, addresses, domains, seed):
+    assert_same_analysis(make_frame(rows, addresses, domains, seed))
+
+
+def test_without_maps_results():
+    df = make_frame(500, 50, 5, seed=4)
+    df = df[~df['result_type'].isin(MAPS_TYPES)]
+    assert_same_analysis(df)
+    stats = ResultAnalyzer(df).calculate_relevance_stats()
+    assert stats['addresses_with_maps'] == 0 and stats['top_positions_maps'] == 0
+
+
+def test_repeated_calls_use_one_pass():
+    analyzer = ResultAnalyzer(make_frame(1_000, 100, 20))
+    stats = analyzer.calculate_relevance_stats()
+    aggregates = analyzer.aggregates
+    analyzer.get_domain_distribution()
+    analyzer.get_position_analysis()
+    assert analyzer.aggregates is aggregates
+    # Вызывающий получает копию: правка не портит кэш
+    stats['total_results'] = -1
+    assert analyzer.calculate_relevance_stats()['total_results'] == 1_000
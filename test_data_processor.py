@@ -0,0 +1,130 @@
+"""
+Тесты потокового чтения адресов: разбор JSON массива по блокам
+(границы блоков, вложенные объекты, многобайтовые символы, ошибки
+синтаксиса) и форматы json/ndjson/csv/txt
+"""
+
+import io
+import json
+
+import pytest
+
+from utils.data_processor import DataProcessor
+
+ITEMS = [
+    {"address": "Москва, улица Тверская, дом 1", "consumption": {"1": 150, "12": [1, 2.5, None]}},
+    {"address": "Санкт-Петербург, Невский проспект, дом 1", "tags": ["жилой", {"этажей": 5}]},
+    12345,
+    "строка с \"кавычками\" и запятой, ]",
+    [],
+    {},
+    True,
+    None,
+    -0.5e3,
+]
+
+
+def parse(data, chunk_size):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return list(DataProcessor.iter_json_array(io.BytesIO(data), chunk_size))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1024 * 1024])
+def test_json_array_any_chunk_boundary(chunk_size):
+    text = json.dumps(ITEMS, ensure_ascii=False, indent=2)
+    assert parse(text, chunk_size) == ITEMS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 13])
+def test_json_array_compact_and_bom(chunk_size):
+    data = b'\xef\xbb\xbf' + json.dumps(ITEMS, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    assert parse(data, chunk_size) == ITEMS
+
+
+def test_json_array_nested_object_split_across_chunks():
+    nested = [{"address": "Адрес", "level": {"inner": {"deep": list(range(200))}}}] * 3
+    text = json.dumps(nested, ensure_ascii=False)
+    # Блок меньше одного объекта: каждый объект собирается из нескольких блоков
+    assert parse(text, len(text) // 10) == nested
+
+
+def test_json_array_text_file_object():
+    assert list(DataProcessor.iter_json_array(io.StringIO('[1, 2]'), 1)) == [1, 2]
+
+
+@pytest.mark.parametrize("text", ['[]', ' [ ] ', '\n[\n]\n'])
+def test_json_array_empty(text):
+    assert parse(text, 1) == []
+
+
+@pytest.mark.parametrize("text", [
+    '[1 2]',
+    '[{"a": 1} {"a": 2}]',
+    '[1,, 2]',
+    '[, 1]',
+    '[1, 2,]',
+    '[1, 2',
+    '[{"a": 1}',
+    '',
+    '[1, nope]',
+])
+@pytest.mark.parametrize("chunk_size", [1, 4, 1024])
+def test_json_array_rejects_malformed(text, chunk_size):
+    with pytest.raises(ValueError):
+        json.loads(text)
+    with pytest.raises(ValueError):
+        parse(text, chunk_size)
+
+
+def test_json_array_rejects_non_array():
+    with pytest.raises(ValueError, match="массив"):
+        parse('{"address": "не массив"}', 1024)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+def test_json_array_numbers_split_at_block_end(chunk_size):
+    numbers = [12345, -0.5e3, 2.5, 1e-7, 0]
+    assert parse(json.dumps(numbers, separators=(',', ':')), chunk_size) == numbers
+
+
+def test_iter_addresses_json():
+    data = json.dumps(ITEMS, ensure_ascii=False).encode('utf-8')
+    addresses = list(DataProcessor.iter_addresses(io.BytesIO(data), 'json'))
+    assert addresses == [DataProcessor.normalize_address(ITEMS[0]['address']),
+                         DataProcessor.normalize_address(ITEMS[1]['address'])]
+
+
+def test_iter_addresses_ndjson():
+    lines = '\n'.join([
+        json.dumps({"address": "Москва,  ул. Тверская, д. 1"}, ensure_ascii=False),
+        '',
+        json.dumps("Казань, улица Баумана, дом 2", ensure_ascii=False),
+        json.dumps({"name": "без адреса"}, ensure_ascii=False),
+    ])
+    addresses = list(DataProcessor.iter_addresses(io.BytesIO(lines.encode('utf-8')), 'ndjson'))
+    assert addresses == [DataProcessor.normalize_address("Москва,  ул. Тверская, д. 1"),
+                         "Казань, улица Баумана, дом 2"]
+
+
+def test_iter_addresses_ndjson_malformed_line():
+    with pytest.raises(ValueError):
+        list(DataProcessor.iter_addresses(io.BytesIO(b'{"address": "a"}\n{"address": \n'), 'ndjson'))
+
+
+def test_iter_addresses_csv_with_header():
+    text = '﻿id,Address\n1,"Москва, улица Тверская, дом 1"\n2,\n3,Казань\n'
+    addresses = list(DataProcessor.iter_addresses(io.BytesIO(text.encode('utf-8')), 'csv'))
+    assert addresses == ["Москва, улица Тверская, дом 1", "Казань"]
+
+
+def test_iter_addresses_csv_without_header():
+    text = '"Москва, улица Тверская, дом 1",x\nКазань,y\n'
+    addresses = list(DataProcessor.iter_addresses(io.StringIO(text), 'csv'))
+    assert addresses == ["Москва, улица Тверская, дом 1", "Казань"]
+
+
+def test_iter_addresses_txt_and_path(tmp_path):
+    path = tmp_path / "addresses.txt"
+    path.write_text("  Москва,   улица Тверская, дом 1 \n\nКазань\n", encoding='utf-8')
+    assert list(DataProcessor.iter_addresses(str(path))) == ["Москва, улица Тверская, дом 1", "Казань"]
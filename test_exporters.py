@@ -0,0 +1,90 @@
+"""
+Тесты выгрузки таблицы результатов: Excel шире 26 колонок, управляющие
+символы, сборка CSV/JSON/NDJSON из блоков
+"""
+
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from utils.exporters import EXCEL_MAX_COLUMN_WIDTH, export_bytes, export_dataframe, write_excel
+
+
+def make_frame(rows: int = 5) -> pd.DataFrame:
+    return pd.DataFrame({
+        'address': [f"Москва, улица Тверская, дом {i}" for i in range(rows)],
+        'rank': pd.array([i if i % 2 else None for i in range(rows)], dtype='Int16'),
+        'domain': pd.Categorical(['avito.ru', 'cian.ru'] * (rows // 2) + ['avito.ru'] * (rows % 2)),
+        'snippet': [None if i == 1 else "текст \x07сниппета " * (i + 1) for i in range(rows)],
+    })
+
+
+def test_excel_more_than_26_columns():
+    from openpyxl import load_workbook
+    from openpyxl.utils import get_column_letter
+
+    df = pd.DataFrame({f"колонка_{i}": [i, i * 2] for i in range(30)})
+    df['колонка_29'] = ['x' * 200, None]
+    output = io.BytesIO()
+    assert write_excel(df, output, chunk_rows=1) == 2
+
+    sheet = load_workbook(io.BytesIO(output.getvalue())).active
+    assert sheet.max_column == 30
+    assert [cell.value for cell in sheet[1]] == list(df.columns)
+    assert sheet['AA2'].value == 26 and sheet['AD3'].value is None
+    # Ширина задается колонкам после Z, а не символам после 'Z' в ASCII
+    assert '[' not in sheet.column_dimensions
+    assert sheet.column_dimensions[get_column_letter(27)].width == len('колонка_26') + 2
+    assert sheet.column_dimensions['AD'].width == EXCEL_MAX_COLUMN_WIDTH + 2
+
+
+def test_excel_values_and_illegal_characters():
+    from openpyxl import load_workbook
+
+    df = make_frame()
+    sheet = load_workbook(io.BytesIO(export_bytes(df, 'xlsx'))).active
+    rows = list(sheet.iter_rows(min_row=2, values_only=True))
+    assert len(rows) == len(df)
+    assert rows[0] == ("Москва, улица Тверская, дом 0", None, 'avito.ru', "текст сниппета ")
+    assert rows[1][1] == 1 and rows[1][3] is None
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 100])
+def test_chunked_text_formats(chunk_rows):
+    df = make_frame()
+    expected = json.loads(df.to_json(orient='records', force_ascii=False))
+
+    output = io.BytesIO()
+    assert export_dataframe(df, 'json', output, chunk_rows) == len(df)
+    assert json.loads(output.getvalue()) == expected
+
+    output = io.BytesIO()
+    export_dataframe(df, 'ndjson', output, chunk_rows)
+    assert [json.loads(line) for line in output.getvalue().decode('utf-8').splitlines()] == expected
+
+    output = io.BytesIO()
+    export_dataframe(df, 'csv', output, chunk_rows)
+    data = output.getvalue()
+    assert data.startswith(b'\xef\xbb\xbf')
+    restored = pd.read_csv(io.BytesIO(data), encoding='utf-8-sig')
+    assert list(restored['address']) == list(df['address'])
+    assert data.count('address'.encode()) == 1
+
+
+@pytest.mark.parametrize("file_format", ['json', 'ndjson', 'csv'])
+def test_empty_frame(file_format):
+    df = make_frame(0)
+    data = export_bytes(df, file_format)
+    if file_format == 'json':
+        assert json.loads(data) == []
+    elif file_format == 'ndjson':
+        assert data == b''
+    else:
+        assert data.decode('utf-8-sig').strip() == ','.join(df.columns)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        export_bytes(make_frame(), 'xml')
@@ -0,0 +1,92 @@
+"""
+Тесты FilterIndex: маски фильтров совпадают с прямой фильтрацией pandas,
+в том числе при сужении текстового поиска по мере набора запроса
+"""
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.filter_index import NARROWING_MAX_FRACTION, FilterIndex
+
+DOMAINS = ['avito.ru', 'cian.ru', 'domclick.ru', '2gis.ru']
+TYPES = ['organic', 'map', 'ad']
+WORDS = ['аренда', 'продажа', 'квартира', 'офис', 'Тверская', 'посуточно', 'склад']
+
+
+def make_frame(rows: int = 400, seed: int = 1) -> pd.DataFrame:
+    rng = random.Random(seed)
+    df = pd.DataFrame({
+        'address': [f"Москва, улица {rng.choice(['Тверская', 'Арбат', 'Ленина'])}, дом {rng.randint(1, 5)}"
+                    for _ in range(rows)],
+        'domain': [rng.choice(DOMAINS) for _ in range(rows)],
+        'result_type': [rng.choice(TYPES) for _ in range(rows)],
+        'rank': [rng.choice([None, *range(1, 11)]) for _ in range(rows)],
+        'title': [' '.join(rng.sample(WORDS, 2)) + (' пентхаус на крыше' if rng.random() < 0.05 else '')
+                  for _ in range(rows)],
+        'snippet': [rng.choice([None, ' '.join(rng.sample(WORDS, 3))]) for _ in range(rows)],
+    })
+    df['rank'] = df['rank'].astype('Int16')
+    df['domain'] = df['domain'].astype('category')
+    return df
+
+
+def reference(df: pd.DataFrame, filters) -> pd.DataFrame:
+    """Прямая фильтрация pandas, как до FilterIndex"""
+    mask = pd.Series(True, index=df.index)
+    if 'domain' in filters:
+        mask &= df['domain'] == filters['domain']
+    if 'result_type' in filters:
+        mask &= df['result_type'] == filters['result_type']
+    if 'rank_min' in filters and 'rank_max' in filters:
+        rank = df['rank'].astype('float64')
+        mask &= (rank >= filters['rank_min']) & (rank <= filters['rank_max'])
+    if filters.get('search_text'):
+        query = filters['search_text'].lower()
+        text = pd.Series(False, index=df.index)
+        for col in ('title', 'snippet', 'address'):
+            text |= df[col].str.lower().str.contains(query, regex=False, na=False)
+        mask &= text
+    return df[mask.to_numpy(dtype=bool)]
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {'domain': 'cian.ru'},
+    {'domain': 'unknown.ru'},
+    {'result_type': 'map'},
+    {'rank_min': 2, 'rank_max': 5},
+    {'search_text': 'АРЕНДА'},
+    {'search_text': 'тверская'},
+    {'search_text': 'нет такого'},
+    {'domain': 'avito.ru', 'result_type': 'organic', 'rank_min': 1, 'rank_max': 3, 'search_text': 'офис'},
+])
+def test_mask_matches_pandas(filters):
+    df = make_frame()
+    result = FilterIndex(df).apply(filters)
+    pd.testing.assert_frame_equal(result, reference(df, filters))
+
+
+def test_no_filters_returns_same_frame():
+    df = make_frame(20)
+    assert FilterIndex(df).apply({}) is df
+
+
+def test_text_search_narrowing_while_typing():
+    df = make_frame(2000, seed=7)
+    index = FilterIndex(df)
+    # Набор запроса по буквам и стирание: суженные маски совпадают с полным поиском
+    queries = ['с', 'ск', 'скл', 'склад', 'скла', 'п', 'пентхаус', 'пентхаус на', 'пентхаус на крыше',
+               'пентхаус на', 'посуточно', 'тверская, дом 2']
+    # Редкий "пентхаус" меньше порога: следующие запросы ищутся только среди его строк
+    assert index.text_mask('пентхаус').mean() < NARROWING_MAX_FRACTION
+    for query in queries:
+        expected = reference(df, {'search_text': query}).index
+        assert np.array_equal(df.index[index.text_mask(query)], expected), query
+
+
+def test_empty_frame():
+    df = make_frame(0)
+    assert len(FilterIndex(df).apply({'search_text': 'аренда', 'domain': 'cian.ru'})) == 0
@@ -0,0 +1,112 @@
+"""
+Тесты полнотекстового индекса: перевод запроса в синтаксис FTS5,
+поиск по выдаче и OCR, дедупликация документов и счетчики
+"""
+
+import json
+
+import pytest
+
+from utils.text_index import TextIndex, to_fts_query
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('аренда', '"аренда"*'),
+    ('Аренда офиса', '"Аренда"* "офиса"*'),
+    ('"аренда офиса" Тверская', '"аренда офиса" "Тверская"*'),
+    ('аренда OR продажа', '"аренда"* OR "продажа"*'),
+    ('аренда ИЛИ продажа', '"аренда"* OR "продажа"*'),
+    ('аренда НЕ посуточно', '"аренда"* NOT "посуточно"*'),
+    ('аренда AND NOT посуточно', '"аренда"* NOT "посуточно"*'),
+    ('аренда И офис', '"аренда"* AND "офис"*'),
+    ('OR аренда OR', '"аренда"*'),
+    ('аренда OR AND продажа', '"аренда"* OR "продажа"*'),
+    ('дом-1, кв.5', '"дом"* "1"* "кв"* "5"*'),
+    ('"*" NEAR(', '"NEAR"*'),
+    ('', ''),
+    ('""', ''),
+])
+def test_to_fts_query(text, expected):
+    assert to_fts_query(text) == expected
+
+
+def test_to_fts_query_without_prefix():
+    assert to_fts_query('аренда OR офис', prefix=False) == '"аренда" OR "офис"'
+
+
+@pytest.mark.parametrize("text", ['NOT аренда', 'НЕ аренда', 'аренда OR NOT посуточно', 'not'])
+def test_to_fts_query_rejects_leading_not(text):
+    with pytest.raises(ValueError):
+        to_fts_query(text)
+
+
+def make_result(address, snippets, ocr=None):
+    return {
+        'address': address,
+        'success': True,
+        'results': [{'title': f"Объявление {i}", 'snippet': snippet, 'url': f"https://example.ru/{address}/{i}"}
+                    for i, snippet in enumerate(snippets)],
+        'ai_text_analysis': ocr,
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = TextIndex(str(tmp_path / "index.db"))
+    index.add_result(make_result("Москва, Тверская 1", ["Аренда офиса посуточно", "Продажа квартиры"]), 'run1')
+    index.add_result(make_result("Казань, Баумана 2", ["Аренда склада"], ocr="Сдается в аренду помещение"), 'run1')
+    yield index
+    index.close()
+
+
+def test_search_and_prefix(index):
+    found = index.search('аренд')
+    assert {row['address'] for row in found} == {"Москва, Тверская 1", "Казань, Баумана 2"}
+    assert all('«' in row['fragment'] for row in found)
+    assert index.search('аренд', prefix=False) == []
+    assert {row['kind'] for row in index.search('сдается', kinds=['ocr'])} == {'ocr'}
+    assert index.search('сдается', kinds=['serp']) == []
+
+
+def test_search_operators(index):
+    assert {row['address'] for row in index.search('аренда NOT посуточно')} == {"Казань, Баумана 2"}
+    assert len(index.search('посуточно OR склада')) == 2
+    with pytest.raises(ValueError):
+        index.search('NOT аренда')
+
+
+def test_search_addresses_groups_documents(index):
+    addresses = {row['address']: row for row in index.search_addresses('аренд')}
+    assert set(addresses) == {"Москва, Тверская 1", "Казань, Баумана 2"}
+    assert addresses["Казань, Баумана 2"]['documents'] == 2
+    assert sorted(addresses["Казань, Баумана 2"]['kinds']) == ['ocr', 'serp']
+    assert index.search_addresses('аренд', limit=1)[0]['address'] in addresses
+
+
+def test_duplicates_skipped_and_stats_refresh(index, tmp_path):
+    assert index.stats() == {'serp': 3, 'ocr': 1, 'documents': 4}
+    assert index.add_result(make_result("Москва, Тверская 1", ["Аренда офиса посуточно"]), 'run2') == 0
+
+    # Другой процесс пополнил индекс: счетчики пересчитываются по data_version
+    other = TextIndex(index.path)
+    assert other.add_result(make_result("Сочи, Морская 3", ["Продажа дачи"])) == 1
+    other.close()
+    assert index.stats()['documents'] == 5
+
+
+def test_backfill(tmp_path):
+    results = tmp_path / "results_old.ndjson"
+    results.write_text(json.dumps(make_result("Тула, Ленина 4", ["Аренда гаража"]), ensure_ascii=False)
+                       + "\nне json\n", encoding='utf-8')
+    text_dir = tmp_path / "text"
+    text_dir.mkdir()
+    (text_dir / "a.txt").write_text("Адрес: Тула, Ленина 4\n" + "=" * 50 + "\nТекст со скриншота",
+                                    encoding='utf-8')
+    index = TextIndex(str(tmp_path / "index.db"))
+    assert index.backfill(str(text_dir), [str(results), str(tmp_path / "missing.ndjson")]) == \
+        {'documents': 2, 'files': 2}
+    assert index.search('скриншота')[0]['address'] == "Тула, Ленина 4"
+    # Повторная дозагрузка ничего не дублирует
+    assert index.backfill(str(text_dir), [str(results)])['documents'] == 0
+    index.close()
+
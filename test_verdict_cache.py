@@ -0,0 +1,82 @@
+"""
+Тесты кэша вердиктов: ключ по содержимому промпта, вытеснение давно не
+использованных записей по размеру в байтах, сохранение между открытиями
+"""
+
+import time
+
+from utils.verdict_cache import VerdictCache
+
+
+def make_cache(tmp_path, max_bytes: int = 10_000) -> VerdictCache:
+    return VerdictCache(str(tmp_path / "verdicts.db"), max_bytes=max_bytes)
+
+
+def test_key_depends_on_everything_that_changes_answer():
+    base = ("system", "v1", "текст", 128, 0.1)
+    key = VerdictCache.make_key(*base)
+    assert key == VerdictCache.make_key(*base)
+    for position, value in enumerate(["system2", "v2", "текст!", 64, 0.2]):
+        changed = list(base)
+        changed[position] = value
+        assert VerdictCache.make_key(*changed) != key
+
+
+def test_put_get_and_persistence(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("k") is None
+    cache.put("k", "Вердикт: жилой дом")
+    cache.put("k", "Вердикт: офис")
+    assert cache.get("k") == "Вердикт: офис"
+    cache.close()
+
+    cache = make_cache(tmp_path)
+    assert cache.get("k") == "Вердикт: офис"
+    assert cache.stats()['entries'] == 1
+    cache.close()
+
+
+def test_size_counts_utf8_bytes(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("k", "ж" * 10)
+    # Кириллица — 2 байта на символ в utf-8
+    assert cache.stats()['size_bytes'] == len("k") + 20
+    cache.close()
+
+
+def test_evicts_least_recently_used_by_bytes(tmp_path):
+    # Запись: ключ 2 байта + 100 байт вердикта; лимит вмещает три записи
+    cache = make_cache(tmp_path, max_bytes=3 * 102)
+    for key in ("k1", "k2", "k3"):
+        cache.put(key, "x" * 100)
+        time.sleep(0.01)
+    # Чтение освежает k1: вытесняться должен k2, а не самый старый по записи
+    assert cache.get("k1") is not None
+    time.sleep(0.01)
+    cache.put("k4", "x" * 100)
+
+    assert cache.get("k2") is None
+    assert [cache.get(key) is not None for key in ("k1", "k3", "k4")] == [True, True, True]
+    stats = cache.stats()
+    assert stats['entries'] == 3 and stats['size_bytes'] <= stats['max_bytes']
+    cache.close()
+
+
+def test_large_entry_evicts_several(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=300)
+    for key in ("k1", "k2", "k3"):
+        cache.put(key, "x" * 90)
+        time.sleep(0.01)
+    cache.put("big", "я" * 100)
+    assert cache.get("big") is not None
+    assert cache.get("k1") is None and cache.get("k2") is None
+    assert cache.stats()['size_bytes'] <= 300
+    cache.close()
+
+
+def test_clear(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("k", "v")
+    cache.clear()
+    assert cache.get("k") is None and cache.stats()['entries'] == 0
+    cache.close()
@@ -0,0 +1,110 @@
+"""
+Тесты общей очереди адресов (SQLiteWorkQueue): аренда, истечение
+аренды, повторная выдача и отказ в сдаче результата чужой аренды
+"""
+
+import time
+
+import config
+from utils.work_queue import SQLiteWorkQueue, WorkQueue, open_work_queue, sqlite_path
+
+VISIBILITY = 0.2
+
+
+def make_queue(tmp_path, **kwargs) -> SQLiteWorkQueue:
+    kwargs.setdefault('visibility_timeout', VISIBILITY)
+    kwargs.setdefault('max_attempts', 3)
+    return SQLiteWorkQueue(str(tmp_path / "queue.db"), **kwargs)
+
+
+def test_lease_and_complete(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.enqueue('q', ['a', 'b']) == 2
+
+    items = queue.lease('q', 'w1', 5)
+    assert [address for _, address in items] == ['a', 'b']
+    assert queue.lease('q', 'w2', 5) == []
+    assert queue.stats('q') == {'pending': 0, 'leased': 2, 'done': 0}
+
+    item_id, _ = items[0]
+    assert queue.complete('q', item_id, 'w1', {'address': 'a', 'success': True})
+    # Повторная сдача того же адреса не дублирует результат
+    assert not queue.complete('q', item_id, 'w1', {'address': 'a', 'success': True})
+    results, cursor = queue.fetch_results('q')
+    assert results == [(item_id, {'address': 'a', 'success': True})]
+    assert queue.fetch_results('q', cursor) == ([], cursor)
+    queue.close()
+
+
+def test_complete_rejects_other_worker(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue('q', ['a'])
+    (item_id, _), = queue.lease('q', 'w1')
+    assert not queue.complete('q', item_id, 'w2', {'address': 'a'})
+    assert queue.complete('q', item_id, 'w1', {'address': 'a'})
+    queue.close()
+
+
+def test_expired_lease_is_released_to_another_worker(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue('q', ['a'])
+    (item_id, _), = queue.lease('q', 'w1')
+    time.sleep(VISIBILITY * 1.5)
+
+    # Аренда истекла: результат опоздавшего воркера не принимается
+    assert not queue.complete('q', item_id, 'w1', {'address': 'a', 'worker': 'w1'})
+
+    (released_id, address), = queue.lease('q', 'w2')
+    assert (released_id, address) == (item_id, 'a')
+    assert not queue.complete('q', item_id, 'w1', {'address': 'a', 'worker': 'w1'})
+    assert queue.complete('q', item_id, 'w2', {'address': 'a', 'worker': 'w2'})
+
+    results, _ = queue.fetch_results('q')
+    assert [result['worker'] for _, result in results] == ['w2']
+    queue.close()
+
+
+def test_exhausted_attempts_become_error_result(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    queue.enqueue('q', ['a'])
+    for worker_id in ('w1', 'w2'):
+        assert queue.lease('q', worker_id)
+        time.sleep(VISIBILITY * 1.5)
+
+    assert queue.lease('q', 'w3') == []
+    results, _ = queue.fetch_results('q')
+    assert len(results) == 1
+    _, result = results[0]
+    assert result['address'] == 'a' and result['success'] is False
+    assert queue.stats('q') == {'pending': 0, 'leased': 0, 'done': 1}
+    queue.close()
+
+
+def test_queues_are_isolated(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue('first', ['a'])
+    queue.enqueue('second', ['b'])
+    assert [address for _, address in queue.lease('second', 'w1', 5)] == ['b']
+    assert queue.stats('first')['pending'] == 1
+    queue.close()
+
+
+def test_default_path_from_config(tmp_path, monkeypatch):
+    path = tmp_path / "configured.db"
+    monkeypatch.setattr(config, 'WORK_QUEUE_URL', f"sqlite:///{path}")
+    queue = SQLiteWorkQueue()
+    assert queue.path == path
+    queue.close()
+
+    queue = open_work_queue()
+    assert isinstance(queue, SQLiteWorkQueue) and queue.path == path
+    queue.close()
+    assert sqlite_path("jobs/queue.db") == "jobs/queue.db"
+
+
+def test_base_class_is_abstract():
+    try:
+        WorkQueue()
+    except TypeError:
+        return
+    raise AssertionError("WorkQueue не должен создаваться без реализации методов")
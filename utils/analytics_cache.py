@@ -0,0 +1,86 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+import pandas as pd
+
+import config
+from utils.analyzer import ResultAnalyzer
+from utils.filter_index import FilterIndex
+
+
+def _column_buffers(series: pd.Series) -> Iterator:
+    """Байты колонки для отпечатка без построчного хеширования, где это возможно"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        yield series.cat.codes.to_numpy().tobytes()
+        yield pd.util.hash_pandas_object(series.cat.categories.to_series(), index=False).to_numpy().tobytes()
+    elif getattr(series.dtype, 'storage', None) == 'pyarrow':
+        # Строки Arrow: хешируются буферы смещений и данных
+        import pyarrow as pa
+
+        for chunk in pa.chunked_array(pa.array(series)).chunks:
+            for buffer in chunk.buffers():
+                if buffer is not None:
+                    yield buffer
+    else:
+        yield pd.util.hash_pandas_object(series, index=False).to_numpy().tobytes()
+
+
+def dataframe_fingerprint(df: pd.DataFrame) -> str:
+    """Отпечаток содержимого таблицы: считается один раз при загрузке результатов"""
+    if df.empty:
+        return 'empty'
+    digest = hashlib.sha1(f"{df.shape}".encode('utf-8'))
+    for col in df.columns:
+        digest.update(str(col).encode('utf-8'))
+        for buffer in _column_buffers(df[col]):
+            digest.update(buffer)
+    return digest.hexdigest()
+
+
+def filters_key(filters: Optional[Dict]) -> Tuple:
+    """Фильтры в виде ключа кэша"""
+    return tuple(sorted((filters or {}).items()))
+
+
+class AnalyticsCache:
+    """LRU кэш отфильтрованных таблиц и анализаторов между перезапусками скрипта.
+
+    Ключ — отпечаток результатов и активные фильтры, поэтому смена вкладки
+    или виджета, не меняющего данные, не пересчитывает статистики и
+    графики. Объекты хранятся как есть, без копирования.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or config.ANALYTICS_CACHE_ENTRIES
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        value = compute()
+        self._entries[key] = value
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def filtered(self, fingerprint: str, filters: Dict,
+                 compute: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        return self.get(('filtered', fingerprint, filters_key(filters)), compute)
+
+    def filter_index(self, fingerprint: str, df: pd.DataFrame) -> FilterIndex:
+        return self.get(('filter_index', fingerprint), lambda: FilterIndex(df))
+
+    def analyzer(self, fingerprint: str, filters: Optional[Dict],
+                 df: pd.DataFrame) -> ResultAnalyzer:
+        """Анализатор для данных и фильтров; его агрегаты и графики кэшируются внутри"""
+        return self.get(('analyzer', fingerprint, filters_key(filters)),
+                        lambda: ResultAnalyzer(df))
+
+    def clear(self):
+        self._entries.clear()
@@ -1,62 +1,157 @@
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from typing import List, Dict, Tuple
-from collections import Counter
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
+
+# Plotly импортируется только при построении графиков
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+
+MAPS_TYPES = ['maps', 'maps_2gis']
+TYPE_NAMES = {
+    'maps': 'Карты',
+    'maps_2gis': 'Карты 2GIS',
+    'realestate': 'Недвижимость',
+    'government': 'Госсайты',
+    'encyclopedia': 'Энциклопедии',
+    'website': 'Веб-сайты'
+}
+
+
+def _codes(series: pd.Series) -> Tuple[pd.Series, pd.Index]:
+    """Целочисленные коды и значения колонки: группировка по кодам быстрее, чем по category"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if not series.isna().any():
+            return series.cat.codes, series.cat.categories
+        series = series.astype(object)
+    codes, uniques = pd.factorize(series.fillna(''))
+    return pd.Series(codes, index=series.index), pd.Index(uniques)
 
 
 class ResultAnalyzer:
+    """Аналитика результатов поиска.
+
+    Строки таблицы просматриваются один раз при первом обращении: агрегаты
+    по (домен, тип) и по адресу кэшируются, а все распределения, статистики
+    и графики сворачиваются из них.
+    """
+
     def __init__(self, results_df: pd.DataFrame):
         self.df = results_df
+        self._aggregates: Optional[Dict[str, pd.DataFrame]] = None
+        self._cache: Dict[str, object] = {}
+
+    @property
+    def aggregates(self) -> Dict[str, pd.DataFrame]:
+        if self._aggregates is None:
+            self._aggregates = self._aggregate()
+        return self._aggregates
+
+    def _aggregate(self) -> Dict[str, pd.DataFrame]:
+        domain_codes, domains = _codes(self.df['domain'])
+        type_codes, types = _codes(self.df['result_type'])
+        address_codes, addresses = _codes(self.df['address'])
+        rank = pd.to_numeric(self.df['rank'], errors='coerce').astype('float64')
+        is_maps = pd.Series(types.isin(MAPS_TYPES), dtype=bool).to_numpy()[type_codes]
+
+        rows = pd.DataFrame({
+            'domain': domain_codes.to_numpy(),
+            'result_type': type_codes.to_numpy(),
+            'address': address_codes.to_numpy(),
+            'rank': rank.to_numpy(),
+            'top3_maps': ((rank <= 3).to_numpy() & is_maps).astype('int32'),
+            'is_maps': is_maps.astype('int32')
+        })
+
+        # Домены и типы: групп немного, сюда же позиции и топ-3 карт
+        by_domain_type = rows.groupby(['domain', 'result_type'], sort=False).agg(
+            count=('rank', 'size'),
+            rank_count=('rank', 'count'),
+            rank_sum=('rank', 'sum'),
+            rank_min=('rank', 'min'),
+            rank_max=('rank', 'max'),
+            top3_maps=('top3_maps', 'sum')
+        ).reset_index()
+        by_domain_type['domain'] = domains.take(by_domain_type['domain'])
+        by_domain_type['result_type'] = types.take(by_domain_type['result_type'])
+
+        by_address = rows.groupby('address', sort=False).agg(
+            count=('rank', 'size'),
+            maps=('is_maps', 'sum')
+        )
+        by_address.index = addresses.take(by_address.index)
+
+        return {'domain_type': by_domain_type, 'address': by_address}
+
+    def _cached(self, key: str, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def _domain_counts(self) -> pd.Series:
+        return self._cached('domain_counts', lambda: self.aggregates['domain_type'].groupby(
+            'domain', sort=False)['count'].sum().sort_values(ascending=False, kind='stable'))
+
+    def _type_stats(self) -> pd.DataFrame:
+        def compute():
+            stats = self.aggregates['domain_type'].groupby('result_type', sort=False).agg(
+                count=('count', 'sum'),
+                rank_count=('rank_count', 'sum'),
+                rank_sum=('rank_sum', 'sum'),
+                min_position=('rank_min', 'min'),
+                max_position=('rank_max', 'max'),
+                top3_maps=('top3_maps', 'sum')
+            )
+            stats['avg_position'] = stats['rank_sum'] / stats['rank_count'].where(stats['rank_count'] > 0)
+            return stats.sort_values('count', ascending=False, kind='stable')
+        return self._cached('type_stats', compute)
 
     def get_domain_distribution(self) -> pd.DataFrame:
         """Распределение результатов по доменам"""
-        domain_counts = self.df['domain'].value_counts()
+        domain_counts = self._domain_counts()
         return pd.DataFrame({
-            'domain': domain_counts.index,
+            'domain': domain_counts.index.astype(str),
             'count': domain_counts.values,
             'percentage': (domain_counts.values / len(self.df) * 100).round(2)
         })
 
     def get_result_type_distribution(self) -> pd.DataFrame:
         """Распределение по типам результатов"""
-        type_counts = self.df['result_type'].value_counts()
-        type_names = {
-            'maps': 'Карты',
-            'maps_2gis': 'Карты 2GIS',
-            'realestate': 'Недвижимость',
-            'government': 'Госсайты',
-            'encyclopedia': 'Энциклопедии',
-            'website': 'Веб-сайты'
-        }
-
+        type_counts = self._type_stats()['count']
         return pd.DataFrame({
-            'type': [type_names.get(t, t) for t in type_counts.index],
+            'type': [TYPE_NAMES.get(t, t) for t in type_counts.index],
             'count': type_counts.values,
             'percentage': (type_counts.values / len(self.df) * 100).round(2)
         })
 
     def calculate_relevance_stats(self) -> Dict:
         """Статистика релевантности результатов"""
-        stats = {
-            'total_results': len(self.df),
-            'unique_addresses': self.df['address'].nunique(),
-            'avg_results_per_address': len(self.df) / self.df['address'].nunique() if self.df['address'].nunique() > 0 else 0,
-            'top_positions_maps': len(self.df[(self.df['rank'] <= 3) & (self.df['result_type'].isin(['maps', 'maps_2gis']))]),
-            'addresses_with_maps': self.df[self.df['result_type'].isin(['maps', 'maps_2gis'])]['address'].nunique()
-        }
-
-        # Процент адресов с картами в топ-3
-        if stats['unique_addresses'] > 0:
-            stats['maps_coverage_percent'] = (
-                stats['addresses_with_maps'] / stats['unique_addresses'] * 100)
-        else:
-            stats['maps_coverage_percent'] = 0
+        def compute():
+            by_address = self.aggregates['address']
+            unique_addresses = len(by_address)
+            stats = {
+                'total_results': len(self.df),
+                'unique_addresses': unique_addresses,
+                'avg_results_per_address': len(self.df) / unique_addresses if unique_addresses > 0 else 0,
+                'top_positions_maps': int(self._type_stats()['top3_maps'].sum()),
+                'addresses_with_maps': int((by_address['maps'] > 0).sum())
+            }
 
-        return stats
+            # Процент адресов с картами в топ-3
+            if stats['unique_addresses'] > 0:
+                stats['maps_coverage_percent'] = (
+                    stats['addresses_with_maps'] / stats['unique_addresses'] * 100)
+            else:
+                stats['maps_coverage_percent'] = 0
+            return stats
+        return dict(self._cached('relevance_stats', compute))
 
-    def create_domain_pie_chart(self) -> go.Figure:
+    def create_domain_pie_chart(self) -> 'go.Figure':
         """Круговая диаграмма распределения по доменам"""
+        return self._cached('domain_pie_chart', self._build_domain_pie_chart)
+
+    def _build_domain_pie_chart(self) -> 'go.Figure':
+        import plotly.express as px
+
         domain_dist = self.get_domain_distribution()
 
         # Группируем малые домены
@@ -91,8 +186,13 @@ class ResultAnalyzer:
 
         return fig
 
-    def create_type_bar_chart(self) -> go.Figure:
+    def create_type_bar_chart(self) -> 'go.Figure':
         """Гистограмма типов результатов"""
+        return self._cached('type_bar_chart', self._build_type_bar_chart)
+
+    def _build_type_bar_chart(self) -> 'go.Figure':
+        import plotly.express as px
+
         type_dist = self.get_result_type_distribution()
 
         fig = px.bar(
@@ -119,13 +219,19 @@ class ResultAnalyzer:
 
         return fig
 
-    def create_top_domains_chart(self, top_n: int = 10) -> go.Figure:
+    def create_top_domains_chart(self, top_n: int = 10) -> 'go.Figure':
         """График топ доменов"""
-        domain_counts = self.df['domain'].value_counts().head(top_n)
+        return self._cached(f'top_domains_chart_{top_n}',
+                            lambda: self._build_top_domains_chart(top_n))
+
+    def _build_top_domains_chart(self, top_n: int) -> 'go.Figure':
+        import plotly.graph_objects as go
+
+        domain_counts = self._domain_counts().head(top_n)
 
         fig = go.Figure([go.Bar(
             x=domain_counts.values,
-            y=domain_counts.index,
+            y=domain_counts.index.astype(str),
             orientation='h',
             text=domain_counts.values,
             textposition='auto',
@@ -144,26 +250,19 @@ class ResultAnalyzer:
 
     def get_addresses_without_maps(self) -> List[str]:
         """Получить адреса без результатов на картах"""
-        addresses_with_maps = set(
-            self.df[self.df['result_type'].isin(
-                ['maps', 'maps_2gis'])]['address']
-        )
-        all_addresses = set(self.df['address'])
-        return list(all_addresses - addresses_with_maps)
+        by_address = self.aggregates['address']
+        return by_address.index[by_address['maps'] == 0].astype(str).tolist()
 
     def get_position_analysis(self) -> pd.DataFrame:
         """Анализ позиций результатов"""
-        position_stats = []
+        return self._cached('position_analysis', self._build_position_analysis).copy()
 
-        for result_type in self.df['result_type'].unique():
-            type_df = self.df[self.df['result_type'] == result_type]
-            stats = {
-                'type': result_type,
-                'avg_position': type_df['rank'].mean(),
-                'min_position': type_df['rank'].min(),
-                'max_position': type_df['rank'].max(),
-                'count': len(type_df)
-            }
-            position_stats.append(stats)
-
-        return pd.DataFrame(position_stats).sort_values('avg_position')
+    def _build_position_analysis(self) -> pd.DataFrame:
+        type_stats = self._type_stats()
+        return pd.DataFrame({
+            'type': type_stats.index.astype(str),
+            'avg_position': type_stats['avg_position'].values,
+            'min_position': type_stats['min_position'].astype('Int64').values,
+            'max_position': type_stats['max_position'].astype('Int64').values,
+            'count': type_stats['count'].values
+        }).sort_values('avg_position', ignore_index=True)
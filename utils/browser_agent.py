@@ -1,29 +1,38 @@
-import json
+import importlib.util
 import logging
 import time
 import re
-import os
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 
-import streamlit as st
-import numpy as np
-import cv2
-from PIL import Image
-from selenium.webdriver.common.by import By
-import undetected_chromedriver as uc
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import NoSuchElementException
+import config
+from utils import metrics
+from utils.thumbnails import make_thumbnail
+from utils.timing import StageTimer
+
+# Selenium, undetected-chromedriver, OpenCV и NumPy импортируются при первом
+# использовании: модуль подключается при каждом перезапуске Streamlit скрипта
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+BROWSER_DEPENDENCIES = ('selenium', 'undetected_chromedriver', 'cv2', 'numpy')
+
+
+def missing_browser_dependencies() -> List[str]:
+    """Список неустановленных зависимостей браузерного агента (без их импорта)"""
+    return [name for name in BROWSER_DEPENDENCIES if importlib.util.find_spec(name) is None]
+
 
 class LocalBrowserAgent:
     """Локальный браузерный агент на Selenium/undetected-chromedriver"""
 
-    def __init__(self, headless: bool = True):
+    def __init__(self, headless: bool = True, base_url: Optional[str] = None,
+                 delay_scale: Optional[float] = None):
         self.headless = headless
+        # Адрес поисковика и множитель пауз: бенчмарк подставляет локальный сервер и 0
+        self.base_url = (base_url or config.SEARCH_BASE_URL).rstrip('/')
+        self.delay_scale = config.SEARCH_DELAY_SCALE if delay_scale is None else delay_scale
         self.driver = None
         self.screenshots_dir = Path("screenshots")
         self.text_dir = Path("extracted_text")
@@ -31,6 +40,9 @@ class LocalBrowserAgent:
         self.text_dir.mkdir(exist_ok=True)
 
     def open(self):
+        import undetected_chromedriver as uc
+        from selenium.webdriver.chrome.options import Options
+
         logger.info("🚀 Запускаем локальный браузерный агент (Selenium)...")
         options = Options()
         if self.headless:
@@ -43,15 +55,22 @@ class LocalBrowserAgent:
         options.add_argument(
             '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
         self.driver = uc.Chrome(options=options)
+        metrics.BROWSER_STARTS.inc()
+        metrics.BROWSERS_ACTIVE.inc()
         logger.info("✅ Браузерный агент запущен")
 
     def close(self):
         if self.driver:
             self.driver.quit()
+            self.driver = None
+            metrics.BROWSERS_ACTIVE.dec()
         logger.info("⛔ Браузерный агент остановлен")
 
     def search_address_in_yandex(self, address: str) -> Dict:
+        from selenium.webdriver.common.by import By
+
         logger.info(f"🔍 Ищем адрес в браузере: {address}")
+        timer = StageTimer()
         timestamp = int(time.time())
         safe_address = re.sub(r'[^\w\s-]', '', address).replace(' ', '_')[:30]
         safe_address = self._transliterate_russian(safe_address)
@@ -61,31 +80,40 @@ class LocalBrowserAgent:
         text_path = self.text_dir / text_filename
         try:
             from urllib.parse import quote_plus
-            search_url = f"https://yandex.ru/search/?text={quote_plus(address)}"
+            search_url = f"{self.base_url}/search/?text={quote_plus(address)}"
             logger.info(f"🌐 Переходим по прямому поисковому URL: {search_url}")
             # Скриншот ДО поиска (главная)
             try:
-                self.driver.get("https://yandex.ru")
-                time.sleep(2)
-                self.driver.save_screenshot(str(screenshot_path))
+                with timer.stage('home_page'):
+                    self.driver.get(self.base_url)
+                timer.sleep(2 * self.delay_scale)
+                with timer.stage('screenshot'):
+                    self.driver.save_screenshot(str(screenshot_path))
                 logger.info(f"✅ Скриншот главной сохранен: {screenshot_path}")
             except Exception as e:
                 logger.warning(
                     f"⚠️ Не удалось сделать скриншот главной: {str(e)}")
             # Переходим на страницу поиска
-            self.driver.get(search_url)
-            time.sleep(3)
+            with timer.stage('navigation'):
+                self.driver.get(search_url)
+            timer.sleep(3 * self.delay_scale)
             final_screenshot_path = self.screenshots_dir / \
                 f"final_{screenshot_filename}"
-            self.driver.save_screenshot(str(final_screenshot_path))
+            with timer.stage('screenshot'):
+                self.driver.save_screenshot(str(final_screenshot_path))
             logger.info(f"✅ Финальный скриншот: {final_screenshot_path}")
-            # Извлекаем результаты из DOM
-            results = self._extract_search_results_from_dom()
+            # Превью для интерфейса, чтобы не передавать в браузер полный PNG
+            with timer.stage('thumbnail'):
+                thumbnail = make_thumbnail(final_screenshot_path)
+            # Извлекаем результаты из DOM (ожидание прорисовки — отдельно, в 'wait')
+            timer.sleep(2 * self.delay_scale)
+            with timer.stage('dom_extraction'):
+                results = self._extract_search_results_from_dom()
             # Анализируем скриншот с помощью ИИ
             ai_text_analysis = self._analyze_screenshot_with_ai(
-                final_screenshot_path, address)
+                final_screenshot_path, address, timer)
             # Сохраняем извлеченный текст в файл
-            with open(text_path, 'w', encoding='utf-8') as f:
+            with timer.stage('text_file'), open(text_path, 'w', encoding='utf-8') as f:
                 f.write(f"Адрес: {address}\n")
                 f.write(f"Время: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
                 f.write(f"Скриншот: {final_screenshot_path}\n")
@@ -94,21 +122,26 @@ class LocalBrowserAgent:
             logger.info(f"💾 Текст сохранен в: {text_path}")
             # Получаем текст страницы для дополнительного анализа
             try:
-                page_text = self.driver.find_element(By.TAG_NAME, 'body').text
-                text_analysis = self._analyze_page_text(page_text, address)
+                with timer.stage('page_text'):
+                    page_text = self.driver.find_element(By.TAG_NAME, 'body').text
+                    text_analysis = self._analyze_page_text(page_text, address)
             except Exception as e:
                 logger.error(f"❌ Ошибка получения текста страницы: {str(e)}")
                 text_analysis = "Ошибка получения текста страницы"
             return {
                 'address': address,
                 'screenshot_path': str(final_screenshot_path),
+                'thumbnail_path': thumbnail,
                 'text_file_path': str(text_path),
                 'results': results,
                 'ai_text_analysis': ai_text_analysis,
                 'text_analysis': text_analysis,
                 'page_title': self.driver.title,
                 'page_url': self.driver.current_url,
-                'success': True
+                'success': True,
+                # Анализ скриншота и текста страницы помечают капчу значком 🛡️
+                'captcha_detected': '🛡️' in ai_text_analysis or '🛡️' in text_analysis,
+                'timings': timer.as_dict()
             }
         except Exception as e:
             logger.error(f"❌ Ошибка поиска в браузере: {str(e)}")
@@ -125,13 +158,15 @@ class LocalBrowserAgent:
                 'results': [],
                 'ai_text_analysis': 'Ошибка при анализе',
                 'text_analysis': 'Ошибка при анализе текста',
-                'success': False
+                'success': False,
+                'timings': timer.as_dict()
             }
 
     def _extract_search_results_from_dom(self) -> List[Dict]:
+        from selenium.webdriver.common.by import By
+
         results = []
         try:
-            time.sleep(2)
             result_selectors = [
                 '.serp-item', '.organic', 'li[data-cid]', '[data-log-node="serp-item"]',
                 '.search-result', '.result', '.VanillaReact', '[data-bem*="serp-item"]'
@@ -183,6 +218,9 @@ class LocalBrowserAgent:
         return results
 
     def _extract_single_result(self, element, rank: int) -> Optional[Dict]:
+        from selenium.webdriver.common.by import By
+        from selenium.common.exceptions import NoSuchElementException
+
         try:
             title_selectors = [
                 'h2 a', 'h3 a', '.organic__title-wrapper a',
@@ -286,19 +324,30 @@ class LocalBrowserAgent:
 
         return 'website'
 
-    def _analyze_screenshot_with_ai(self, screenshot_path: Path, address: str) -> str:
-        """Анализ скриншота с помощью локальной ИИ модели"""
+    def _analyze_screenshot_with_ai(self, screenshot_path: Path, address: str,
+                                    timer: Optional[StageTimer] = None) -> str:
+        """Анализ скриншота с помощью локальной ИИ модели (этапы замеряются в timer)"""
+        import cv2
+        import numpy as np
+
+        timer = timer or StageTimer()
         try:
             logger.info(
                 f"🤖 Анализируем скриншот с помощью ИИ: {screenshot_path}")
 
             # Загружаем изображение
-            image = cv2.imread(str(screenshot_path))
+            with timer.stage('image_load'):
+                image = cv2.imread(str(screenshot_path))
             if image is None:
                 return "Ошибка загрузки изображения"
 
             # OCR извлечение текста
-            ocr_text = self._extract_text_with_ocr(image)
+            metrics.OCR_QUEUE.inc()
+            try:
+                with timer.stage('ocr'):
+                    ocr_text = self._extract_text_with_ocr(image)
+            finally:
+                metrics.OCR_QUEUE.dec()
 
             # Простой локальный анализ изображения
             height, width = image.shape[:2]
@@ -358,48 +407,51 @@ class LocalBrowserAgent:
             analysis_parts.append("")
             analysis_parts.append("=== АНАЛИЗ ИЗОБРАЖЕНИЯ ===")
 
-            # Конвертируем в HSV для анализа цветов
-            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            with timer.stage('image_analysis'):
+                # Конвертируем в HSV для анализа цветов
+                hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
 
-            # Ищем желтые элементы (характерные для Яндекса)
-            yellow_lower = np.array([15, 100, 100])
-            yellow_upper = np.array([35, 255, 255])
-            yellow_mask = cv2.inRange(hsv, yellow_lower, yellow_upper)
-            yellow_pixels = cv2.countNonZero(yellow_mask)
+                # Ищем желтые элементы (характерные для Яндекса)
+                yellow_lower = np.array([15, 100, 100])
+                yellow_upper = np.array([35, 255, 255])
+                yellow_mask = cv2.inRange(hsv, yellow_lower, yellow_upper)
+                yellow_pixels = cv2.countNonZero(yellow_mask)
 
-            if yellow_pixels > 1000:
-                analysis_parts.append(
-                    "🟡 Обнаружены элементы интерфейса Яндекса")
+                if yellow_pixels > 1000:
+                    analysis_parts.append(
+                        "🟡 Обнаружены элементы интерфейса Яндекса")
 
-            # Ищем синие ссылки
-            blue_lower = np.array([100, 50, 50])
-            blue_upper = np.array([130, 255, 255])
-            blue_mask = cv2.inRange(hsv, blue_lower, blue_upper)
-            blue_pixels = cv2.countNonZero(blue_mask)
+                # Ищем синие ссылки
+                blue_lower = np.array([100, 50, 50])
+                blue_upper = np.array([130, 255, 255])
+                blue_mask = cv2.inRange(hsv, blue_lower, blue_upper)
+                blue_pixels = cv2.countNonZero(blue_mask)
 
-            if blue_pixels > 500:
-                analysis_parts.append("🔗 Найдены элементы, похожие на ссылки")
+                if blue_pixels > 500:
+                    analysis_parts.append("🔗 Найдены элементы, похожие на ссылки")
 
-            # Анализ структуры
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            edges = cv2.Canny(gray, 50, 150)
-            contours, _ = cv2.findContours(
-                edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                # Анализ структуры
+                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                edges = cv2.Canny(gray, 50, 150)
+                contours, _ = cv2.findContours(
+                    edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-            large_rectangles = sum(
-                1 for contour in contours if cv2.contourArea(contour) > 5000)
+                large_rectangles = sum(
+                    1 for contour in contours if cv2.contourArea(contour) > 5000)
 
-            if large_rectangles > 5:
-                analysis_parts.append(
-                    f"📋 Обнаружено {large_rectangles} крупных блоков контента")
-            elif large_rectangles > 0:
-                analysis_parts.append(
-                    f"📋 Обнаружено {large_rectangles} блоков")
-            else:
-                analysis_parts.append("⚠️ Мало структурированного контента")
+                if large_rectangles > 5:
+                    analysis_parts.append(
+                        f"📋 Обнаружено {large_rectangles} крупных блоков контента")
+                elif large_rectangles > 0:
+                    analysis_parts.append(
+                        f"📋 Обнаружено {large_rectangles} блоков")
+                else:
+                    analysis_parts.append("⚠️ Мало структурированного контента")
 
             # Проверка на капчу
-            if self._detect_captcha_in_image(gray):
+            with timer.stage('captcha_check'):
+                captcha_detected = self._detect_captcha_in_image(gray)
+            if captcha_detected:
                 analysis_parts.append("🛡️ ВНИМАНИЕ: Возможна капча!")
 
             return "\n".join(analysis_parts)
@@ -410,6 +462,9 @@ class LocalBrowserAgent:
 
     def _detect_captcha_in_image(self, gray_image) -> bool:
         """Простое определение капчи в изображении"""
+        import cv2
+        import numpy as np
+
         try:
             # Ищем характерные для капчи паттерны
             edges = cv2.Canny(gray_image, 100, 200)
@@ -432,6 +487,8 @@ class LocalBrowserAgent:
         return False
 
     def _extract_text_with_ocr(self, image) -> str:
+        import cv2
+
         try:
             import easyocr
             try:
@@ -514,6 +571,106 @@ class LocalBrowserAgent:
         return ''.join(transliteration_dict.get(char, char) for char in text)
 
 
+def _search_worker(headless: bool, next_address, output: "queue.Queue", agent_options: Dict):
+    """Поток поиска со своим браузером: берет адреса из общего источника"""
+    import random
+    agent = LocalBrowserAgent(headless=headless, **agent_options)
+    try:
+        agent.open()
+        address = next_address()
+        while address is not None:
+            result = agent.search_address_in_yandex(address)
+            metrics.record_search(result)
+            output.put(('result', result))
+            address = next_address()
+            if address is not None:
+                time.sleep(random.randint(3, 6) * agent.delay_scale)
+    except Exception as e:
+        logger.error(f"❌ Ошибка потока поиска: {str(e)}")
+        metrics.BROWSER_FAILURES.inc()
+        output.put(('error', e))
+    finally:
+        agent.close()
+        output.put(('done', None))
+
+
+def iter_local_browser_search(
+    addresses: Iterable[str],
+    headless: bool = True,
+    workers: int = 1,
+    progress_callback=None,
+    base_url: Optional[str] = None,
+    delay_scale: Optional[float] = None,
+    stop_event: Optional["threading.Event"] = None,
+    worker_errors: Optional[List[BaseException]] = None
+) -> Iterator[Dict]:
+    """Потоковый браузерный поиск: результаты выдаются по мере готовности.
+
+    addresses может быть генератором — адреса читаются по одному.
+    При workers > 1 каждый поток запускает свой браузер, и порядок
+    результатов может отличаться от порядка адресов.
+    progress_callback(done, total, address) вызывается в потоке
+    потребителя; total равен None, если длина источника неизвестна.
+    base_url и delay_scale передаются LocalBrowserAgent (по умолчанию из config).
+    stop_event устанавливается при завершении: источник адресов, который
+    ждет новые адреса (опрос очереди), должен проверять его и завершаться.
+    Ошибки потоков, остановивших свой браузер, дописываются в worker_errors;
+    если результатов нет совсем, первая ошибка пробрасывается.
+    """
+    import queue
+    import threading
+
+    total = len(addresses) if hasattr(addresses, '__len__') else None
+    source = iter(addresses)
+    source_lock = threading.Lock()
+    stopped = stop_event or threading.Event()
+
+    def next_address() -> Optional[str]:
+        if stopped.is_set():
+            return None
+        with source_lock:
+            return next(source, None)
+
+    # Ограниченная очередь: потоки ждут, если потребитель не успевает
+    output: "queue.Queue" = queue.Queue(maxsize=max(1, workers) * 2)
+    agent_options = {'base_url': base_url, 'delay_scale': delay_scale}
+    threads = [threading.Thread(target=_search_worker, args=(headless, next_address, output, agent_options),
+                                name=f"browser-search-{idx}", daemon=True)
+               for idx in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+
+    done = 0
+    running = len(threads)
+    errors: List[BaseException] = []
+    try:
+        while running:
+            kind, payload = output.get()
+            if kind == 'done':
+                running -= 1
+            elif kind == 'error':
+                errors.append(payload)
+                if worker_errors is not None:
+                    worker_errors.append(payload)
+                logger.warning(f"⚠️ Поток браузера остановлен ({len(errors)}/{len(threads)}), "
+                               f"поиск продолжают остальные: {payload}")
+            else:
+                done += 1
+                logger.info(
+                    f"🔍 Готово {done}/{total or '?'}: {payload['address']}")
+                if progress_callback:
+                    progress_callback(done, total, payload['address'])
+                yield payload
+    finally:
+        # Потребитель остановился раньше: дожидаемся закрытия браузеров
+        stopped.set()
+        while running:
+            if output.get()[0] == 'done':
+                running -= 1
+    if errors and done == 0:
+        raise errors[0]
+
+
 def run_local_browser_search(addresses: List[str], headless: bool = True, progress_callback=None) -> List[Dict]:
     """Запуск локального браузерного поиска (Selenium)"""
     import random
@@ -528,7 +685,7 @@ def run_local_browser_search(addresses: List[str], headless: bool = True, progre
             result = agent.search_address_in_yandex(address)
             results.append(result)
             if idx < len(addresses) - 1:
-                time.sleep(random.randint(3, 6))
+                time.sleep(random.randint(3, 6) * agent.delay_scale)
         return results
     finally:
         agent.close()
@@ -1,8 +1,31 @@
+import codecs
+import csv
+import itertools
 import json
+import os
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import IO, Iterator, List, Dict, Optional, Union
 import re
 
+# Размер блока чтения при потоковом разборе файлов адресов
+STREAM_CHUNK_SIZE = 1024 * 1024
+# Символы, которыми может продолжаться JSON число
+NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+# Схема таблицы результатов: повторяющиеся значения — категории,
+# позиция — малое целое, тексты — строки в Arrow (без объекта Python на ячейку)
+RESULT_COLUMNS = ['address', 'rank', 'title', 'domain', 'result_type',
+                  'snippet', 'additional_info', 'url']
+CATEGORY_COLUMNS = ['address', 'domain', 'result_type']
+TEXT_COLUMNS = ['title', 'snippet', 'additional_info', 'url']
+
+
+def text_dtype() -> str:
+    """Строки в Arrow, если установлен pyarrow, иначе обычный string dtype"""
+    import importlib.util
+
+    return 'string[pyarrow]' if importlib.util.find_spec('pyarrow') else 'string'
+
 
 class DataProcessor:
     @staticmethod
@@ -48,6 +71,134 @@ class DataProcessor:
                     addresses.append(address)
         return addresses
 
+    @staticmethod
+    def iter_json_array(file: IO, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator:
+        """Потоковый разбор JSON массива: элементы по одному, в памяти только текущий блок.
+
+        Синтаксис массива проверяется как в json.load: пропущенная или лишняя
+        запятая — ValueError. Содержимое после закрывающей скобки не читается.
+        """
+        decoder = json.JSONDecoder()
+        # utf-8-sig: файлы из Excel и реестров часто начинаются с BOM
+        text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        buffer = ''
+        # Позиция разбора в buffer; разобранное начало отрезается только при чтении блока
+        pos = 0
+        eof = False
+        # Что ожидается дальше: '[', первый элемент или ']', ',' или ']', элемент
+        expect = 'open'
+
+        def read_more() -> bool:
+            nonlocal buffer, pos, eof
+            chunk = file.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            if isinstance(chunk, bytes):
+                # Незавершенный многобайтовый символ декодер оставит до следующего блока
+                chunk = text_decoder.decode(chunk)
+            buffer, pos = buffer[pos:] + chunk, 0
+            return True
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos >= len(buffer):
+                if not read_more():
+                    raise ValueError("Ошибка парсинга JSON: неожиданный конец файла")
+                continue
+
+            char = buffer[pos]
+            if expect == 'open':
+                if char != '[':
+                    raise ValueError("JSON должен содержать массив объектов")
+                pos += 1
+                expect = 'first'
+                continue
+            if char == ']' and expect in ('first', 'separator'):
+                return
+            if expect == 'separator':
+                if char != ',':
+                    raise ValueError(f"Ошибка парсинга JSON: ожидалась ',' или ']' между элементами, "
+                                     f"найдено {char!r}")
+                pos += 1
+                expect = 'item'
+                continue
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Элемент мог оборваться на границе блока — дочитываем
+                if not eof and read_more():
+                    continue
+                raise ValueError(f"Ошибка парсинга JSON: {str(e)}")
+            if (isinstance(item, (int, float)) and not isinstance(item, bool) and not eof
+                    and (end == len(buffer) or buffer[end] in NUMBER_CHARS) and read_more()):
+                # Число на границе блока могло оборваться ("2." + "5")
+                continue
+            yield item
+            pos = end
+            expect = 'separator'
+
+    @staticmethod
+    def iter_addresses(source: Union[str, IO], file_format: Optional[str] = None) -> Iterator[str]:
+        """Потоковое чтение нормализованных адресов.
+
+        source — путь или файловый объект (в т.ч. загруженный в Streamlit).
+        Форматы: json (массив объектов), ndjson/jsonl, csv (колонка address
+        или первая колонка), txt (адрес в строке). Формат определяется по
+        расширению, если не задан явно.
+        """
+        name = source if isinstance(source, str) else getattr(source, 'name', '')
+        file_format = (file_format or os.path.splitext(name)[1].lstrip('.') or 'json').lower()
+
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                yield from DataProcessor.iter_addresses(f, file_format)
+            return
+
+        if file_format == 'json':
+            for item in DataProcessor.iter_json_array(source):
+                if isinstance(item, dict):
+                    address = item.get('address')
+                    if address and isinstance(address, str):
+                        yield DataProcessor.normalize_address(address)
+            return
+
+        text = source
+        if isinstance(source.read(0), bytes):
+            # StreamReader, в отличие от TextIOWrapper, не закрывает исходный файл
+            text = codecs.getreader('utf-8-sig')(source)
+
+        if file_format == 'csv':
+            reader = csv.reader(text)
+            header = next(reader, None)
+            if not header:
+                return
+            lowered = [column.strip().lower() for column in header]
+            if 'address' in lowered:
+                column = lowered.index('address')
+            else:
+                # Без заголовка address первая колонка считается адресом
+                column = 0
+                reader = itertools.chain([header], reader)
+            for row in reader:
+                if len(row) > column and row[column].strip():
+                    yield DataProcessor.normalize_address(row[column])
+            return
+
+        for line in text:
+            line = line.strip()
+            if not line:
+                continue
+            if file_format in ('ndjson', 'jsonl'):
+                item = json.loads(line)
+                address = item.get('address') if isinstance(item, dict) else item
+            else:
+                address = line
+            if address and isinstance(address, str):
+                yield DataProcessor.normalize_address(address)
+
     @staticmethod
     def normalize_address(address: str) -> str:
         """Нормализация адреса для поиска"""
@@ -83,44 +234,72 @@ class DataProcessor:
 
         return address
 
+    @staticmethod
+    def flatten_browser_results(browser_results: List[Dict]) -> List[Dict]:
+        """Плоский список результатов выдачи с адресом в каждой строке"""
+        all_results = []
+        for browser_result in browser_results:
+            for result in browser_result.get('results') or []:
+                result['address'] = browser_result['address']
+                all_results.append(result)
+        return all_results
+
     @staticmethod
     def results_to_dataframe(results: List[Dict]) -> pd.DataFrame:
-        """Преобразование результатов в DataFrame"""
+        """Преобразование результатов в DataFrame с компактной схемой"""
         if not results:
             return pd.DataFrame()
 
-        df = pd.DataFrame(results)
+        # Колонки собираются сразу нужной длины, без промежуточной таблицы из словарей
+        columns = {col: [result.get(col) for result in results] for col in RESULT_COLUMNS}
+        return DataProcessor.apply_result_schema(pd.DataFrame(columns, columns=RESULT_COLUMNS))
 
-        # Упорядочиваем колонки
-        columns_order = ['address', 'rank', 'title', 'domain', 'result_type',
-                         'snippet', 'additional_info', 'url']
-
-        # Проверяем наличие всех колонок
-        for col in columns_order:
+    @staticmethod
+    def apply_result_schema(df: pd.DataFrame) -> pd.DataFrame:
+        """Приведение таблицы результатов к схеме: category, Int16, строки Arrow"""
+        df = df.copy()
+        for col in RESULT_COLUMNS:
             if col not in df.columns:
                 df[col] = ''
 
-        return df[columns_order]
+        for col in CATEGORY_COLUMNS:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].fillna('').astype(str).astype('category')
+        rank = pd.to_numeric(df['rank'], errors='coerce').round()
+        df['rank'] = rank.where(rank.between(-32768, 32767)).astype('Int16')
+        string_dtype = text_dtype()
+        for col in TEXT_COLUMNS:
+            df[col] = df[col].fillna('').astype(string_dtype)
+
+        return df[RESULT_COLUMNS]
+
+    @staticmethod
+    def memory_report(df: pd.DataFrame, compare_object: bool = False) -> pd.DataFrame:
+        """Память по колонкам (МБ); compare_object — сравнить с таблицей из object колонок"""
+        usage = df.memory_usage(deep=True, index=False)
+        report = pd.DataFrame({
+            'column': usage.index,
+            'dtype': [str(df[col].dtype) for col in usage.index],
+            'memory_mb': (usage.values / 1024 / 1024).round(3)
+        })
+        if compare_object:
+            object_usage = df.astype(object).memory_usage(deep=True, index=False)
+            report['object_mb'] = (object_usage.values / 1024 / 1024).round(3)
+        total = {'column': 'ИТОГО', 'dtype': '', 'memory_mb': report['memory_mb'].sum()}
+        if compare_object:
+            total['object_mb'] = report['object_mb'].sum()
+        return pd.concat([report, pd.DataFrame([total])], ignore_index=True)
 
     @staticmethod
     def save_to_csv(df: pd.DataFrame, filename: str = 'search_results.csv'):
-        """Сохранение DataFrame в CSV"""
-        df.to_csv(filename, index=False, encoding='utf-8-sig')
+        """Сохранение DataFrame в CSV (блоками)"""
+        from utils.exporters import export_dataframe
+
+        export_dataframe(df, 'csv', filename)
 
     @staticmethod
     def save_to_excel(df: pd.DataFrame, filename: str = 'search_results.xlsx'):
-        """Сохранение DataFrame в Excel"""
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Результаты поиска', index=False)
-
-            # Автоматическая настройка ширины колонок
-            worksheet = writer.sheets['Результаты поиска']
-            for idx, col in enumerate(df.columns):
-                max_length = max(
-                    df[col].astype(str).apply(len).max(),
-                    len(col)
-                )
-                # Ограничиваем максимальную ширину
-                max_length = min(max_length, 50)
-                worksheet.column_dimensions[chr(
-                    65 + idx)].width = max_length + 2
+        """Сохранение DataFrame в Excel (write_only, ширина колонок по длине значений)"""
+        from utils.exporters import export_dataframe
+
+        export_dataframe(df, 'xlsx', filename)
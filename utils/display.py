@@ -1,7 +1,13 @@
 import streamlit as st
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
-import json
+import config
+from utils.exporters import EXPORT_FORMATS, BackgroundExport, export_bytes
+from utils.filter_index import FilterIndex
+
+# Варианты размера страницы в списках результатов
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
 
 
 def display_search_result(result: Dict):
@@ -68,6 +74,51 @@ def display_search_results_grid(results: List[Dict], columns: int = 1):
                 display_search_result(result)
 
 
+def paginate(total: int, key: str, label: str = "адресов") -> Tuple[int, int]:
+    """Выбор страницы и ее размера; возвращает границы [start, end) текущей страницы.
+
+    Рисуется только текущая страница, поэтому время перезапуска скрипта
+    не зависит от числа результатов.
+    """
+    page_size_options = sorted(set(PAGE_SIZE_OPTIONS + [config.RESULTS_PAGE_SIZE]))
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        page_size = st.selectbox("На странице", page_size_options,
+                                 index=page_size_options.index(config.RESULTS_PAGE_SIZE),
+                                 key=f"{key}_page_size")
+    pages = max(1, -(-total // page_size))
+
+    # Номер страницы из прошлого перезапуска мог выйти за границы после смены фильтров
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    with col2:
+        page = st.number_input(f"Страница из {pages}", min_value=1, max_value=pages,
+                               step=1, key=page_key)
+
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+    with col3:
+        st.caption(f"Показаны {start + 1 if total else 0}–{end} из {total} {label}")
+    return start, end
+
+
+def group_by_address(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str], np.ndarray]:
+    """Таблица, отсортированная по адресу и позиции, список адресов и границы их строк.
+
+    Строки адреса i — ordered.iloc[bounds[i]:bounds[i + 1]], так что страница
+    адресов вырезается без повторной фильтрации всей таблицы.
+    """
+    ordered = df.sort_values(['address', 'rank'])
+    if isinstance(ordered['address'].dtype, pd.CategoricalDtype):
+        codes = ordered['address'].cat.codes.to_numpy()
+    else:
+        codes = pd.factorize(ordered['address'])[0]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=int)
+    addresses = ordered['address'].iloc[starts].astype(str).tolist()
+    return ordered, addresses, np.r_[starts, len(ordered)]
+
+
 def display_statistics_cards(stats: Dict):
     """Отображение карточек со статистикой"""
     col1, col2, col3, col4 = st.columns(4)
@@ -104,15 +155,17 @@ def create_filter_sidebar(df: pd.DataFrame) -> Dict:
     if selected_type != 'Все':
         filters['result_type'] = selected_type
 
-    # Фильтр по позиции
-    rank_range = st.sidebar.slider(
-        "Позиция в выдаче",
-        min_value=int(df['rank'].min()),
-        max_value=int(df['rank'].max()),
-        value=(int(df['rank'].min()), int(df['rank'].max()))
-    )
-    filters['rank_min'] = rank_range[0]
-    filters['rank_max'] = rank_range[1]
+    # Фильтр по позиции (позиция может отсутствовать — в Int16 это NA)
+    ranks = df['rank'].dropna()
+    if ranks.nunique() > 1:
+        rank_range = st.sidebar.slider(
+            "Позиция в выдаче",
+            min_value=int(ranks.min()),
+            max_value=int(ranks.max()),
+            value=(int(ranks.min()), int(ranks.max()))
+        )
+        filters['rank_min'] = rank_range[0]
+        filters['rank_max'] = rank_range[1]
 
     # Поиск по тексту
     search_text = st.sidebar.text_input("Поиск в результатах")
@@ -122,70 +175,73 @@ def create_filter_sidebar(df: pd.DataFrame) -> Dict:
     return filters
 
 
-def apply_filters(df: pd.DataFrame, filters: Dict) -> pd.DataFrame:
-    """Применение фильтров к DataFrame"""
-    filtered_df = df.copy()
+def apply_filters(df: pd.DataFrame, filters: Dict, index: Optional[FilterIndex] = None) -> pd.DataFrame:
+    """Применение фильтров к DataFrame (index — заранее построенный FilterIndex для df)"""
+    if index is None:
+        index = FilterIndex(df)
+    return index.apply(filters)
 
-    if 'domain' in filters:
-        filtered_df = filtered_df[filtered_df['domain'] == filters['domain']]
 
-    if 'result_type' in filters:
-        filtered_df = filtered_df[filtered_df['result_type']
-                                  == filters['result_type']]
+EXPORT_STATUS_LABELS = {
+    'running': '🔄 Выгружается',
+    'done': '✅ Готово',
+    'failed': '❌ Ошибка'
+}
 
-    if 'rank_min' in filters and 'rank_max' in filters:
-        filtered_df = filtered_df[
-            (filtered_df['rank'] >= filters['rank_min']) &
-            (filtered_df['rank'] <= filters['rank_max'])
-        ]
 
-    if 'search_text' in filters:
-        mask = (
-            filtered_df['title'].str.lower().str.contains(filters['search_text'], na=False) |
-            filtered_df['snippet'].str.lower().str.contains(filters['search_text'], na=False) |
-            filtered_df['address'].str.lower().str.contains(
-                filters['search_text'], na=False)
-        )
-        filtered_df = filtered_df[mask]
+@st.fragment(run_every=2)
+def render_background_exports():
+    """Фоновые выгрузки сессии; обновляется без перезапуска всей страницы"""
+    for export in reversed(st.session_state.get('background_exports', [])):
+        label = EXPORT_FORMATS[export.file_format][0]
+        status = EXPORT_STATUS_LABELS[export.status]
+        line = f"{status} {label}, {export.rows} строк, {export.elapsed:.1f} с"
+        if export.status == 'done':
+            st.success(f"{line}: `{export.path}`")
+        elif export.status == 'failed':
+            st.error(f"{line}: {export.error}")
+        else:
+            st.info(line)
 
-    return filtered_df
 
+def create_export_section(df: pd.DataFrame, data_key: str = ''):
+    """Секция экспорта: файл собирается только по кнопке, большие таблицы — в фоне на диск.
 
-def create_export_section(df: pd.DataFrame):
-    """Создание секции экспорта данных"""
+    data_key — ключ содержимого df (отпечаток и фильтры), по нему готовый
+    файл сбрасывается при смене данных.
+    """
     st.subheader("📥 Экспорт результатов")
 
-    col1, col2, col3 = st.columns(3)
-
+    col1, col2 = st.columns([1, 2])
     with col1:
-        csv = df.to_csv(index=False, encoding='utf-8-sig')
-        st.download_button(
-            label="Скачать CSV",
-            data=csv.encode('utf-8-sig'),
-            file_name="search_results.csv",
-            mime="text/csv"
-        )
+        file_format = st.selectbox("Формат", list(EXPORT_FORMATS),
+                                   format_func=lambda name: EXPORT_FORMATS[name][0],
+                                   key="export_format")
+    label, mime, extension = EXPORT_FORMATS[file_format]
 
     with col2:
-        # Excel экспорт через временный файл
-        import io
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Результаты', index=False)
-
-        st.download_button(
-            label="Скачать Excel",
-            data=buffer.getvalue(),
-            file_name="search_results.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-
-    with col3:
-        json_str = json.dumps(df.to_dict(orient='records'),
-                              ensure_ascii=False, indent=2)
-        st.download_button(
-            label="Скачать JSON",
-            data=json_str,
-            file_name="search_results.json",
-            mime="application/json"
-        )
+        if len(df) <= config.EXPORT_BACKGROUND_ROWS:
+            # В сессии хранится только последний подготовленный файл
+            export_key = (data_key, file_format, len(df))
+            prepared = st.session_state.get('export_prepared')
+            if prepared and prepared['key'] == export_key:
+                st.download_button(
+                    label=f"Скачать {label}",
+                    data=prepared['data'],
+                    file_name=f"search_results{extension}",
+                    mime=mime
+                )
+            elif st.button(f"📦 Подготовить {label}"):
+                with st.spinner("Формирование файла..."):
+                    st.session_state.export_prepared = {
+                        'key': export_key, 'data': export_bytes(df, file_format)}
+                st.rerun()
+        else:
+            st.caption(f"Больше {config.EXPORT_BACKGROUND_ROWS} строк: файл пишется в папку "
+                       f"{config.EXPORT_DIR}/ в фоне, блоками по {config.EXPORT_CHUNK_ROWS} строк")
+            if st.button(f"💾 Выгрузить {label} в фоне"):
+                st.session_state.setdefault('background_exports', []).append(
+                    BackgroundExport(df, file_format))
+
+    if st.session_state.get('background_exports'):
+        render_background_exports()
@@ -0,0 +1,189 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import IO, Dict, Iterator, Optional
+
+import pandas as pd
+
+import config
+from utils.data_processor import text_dtype
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Форматы выгрузки: название, MIME тип, расширение
+EXPORT_FORMATS = {
+    'csv': ('CSV', 'text/csv', '.csv'),
+    'xlsx': ('Excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+    'ndjson': ('NDJSON', 'application/x-ndjson', '.ndjson'),
+    'json': ('JSON', 'application/json', '.json'),
+}
+# Максимальная ширина колонки Excel (в символах)
+EXCEL_MAX_COLUMN_WIDTH = 50
+
+
+def iter_chunks(df: pd.DataFrame, chunk_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Таблица блоками по chunk_rows строк: в памяти одновременно только один блок в тексте"""
+    chunk_rows = chunk_rows or config.EXPORT_CHUNK_ROWS
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def write_csv(df: pd.DataFrame, output: IO[bytes], chunk_rows: Optional[int] = None) -> int:
+    """CSV в utf-8 с BOM (для Excel), блоками; возвращает число строк"""
+    output.write(b'\xef\xbb\xbf')
+    if df.empty:
+        output.write(df.to_csv(index=False).encode('utf-8'))
+        return 0
+    rows = 0
+    for number, chunk in enumerate(iter_chunks(df, chunk_rows)):
+        output.write(chunk.to_csv(index=False, header=number == 0).encode('utf-8'))
+        rows += len(chunk)
+    return rows
+
+
+def write_ndjson(df: pd.DataFrame, output: IO[bytes], chunk_rows: Optional[int] = None) -> int:
+    """Объект на строку, блоками; возвращает число строк"""
+    rows = 0
+    for chunk in iter_chunks(df, chunk_rows):
+        text = chunk.to_json(orient='records', lines=True, force_ascii=False)
+        output.write(text.encode('utf-8'))
+        if not text.endswith('\n'):
+            output.write(b'\n')
+        rows += len(chunk)
+    return rows
+
+
+def write_json(df: pd.DataFrame, output: IO[bytes], chunk_rows: Optional[int] = None) -> int:
+    """JSON массив объектов, собранный из блоков без общей строки в памяти"""
+    output.write(b'[')
+    rows = 0
+    for chunk in iter_chunks(df, chunk_rows):
+        # Блок — массив, без скобок он дописывается к общему
+        text = chunk.to_json(orient='records', force_ascii=False)[1:-1]
+        if text:
+            output.write((',\n' if rows else '\n').encode('utf-8') + text.encode('utf-8'))
+        rows += len(chunk)
+    output.write(b'\n]' if rows else b']')
+    return rows
+
+
+def column_widths(df: pd.DataFrame, max_width: int = EXCEL_MAX_COLUMN_WIDTH) -> Dict[str, int]:
+    """Ширина колонок по самому длинному значению без построчного apply(len)"""
+    widths = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Достаточно длин уникальных значений
+            series = series.cat.categories.to_series()
+        lengths = series.astype(text_dtype()).str.len()
+        longest = lengths.max() if len(lengths) else 0
+        longest = 0 if pd.isna(longest) else int(longest)
+        widths[col] = min(max(longest, len(str(col))), max_width) + 2
+    return widths
+
+
+def write_excel(df: pd.DataFrame, output, chunk_rows: Optional[int] = None,
+                sheet_name: str = 'Результаты поиска') -> int:
+    """Excel в режиме write_only: строки уходят во временный файл openpyxl, а не в память"""
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    # В write_only ширину нужно задать до первой строки
+    for idx, width in enumerate(column_widths(df).values(), start=1):
+        worksheet.column_dimensions[get_column_letter(idx)].width = width
+
+    worksheet.append([str(col) for col in df.columns])
+    rows = 0
+    for chunk in iter_chunks(df, chunk_rows):
+        chunk = chunk.astype(object)
+        for col in chunk.columns:
+            if df[col].dtype.kind not in 'biuf':
+                # Управляющие символы из выдачи openpyxl не записывает
+                chunk[col] = chunk[col].map(
+                    lambda value: ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value)
+        chunk = chunk.where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            worksheet.append(row)
+        rows += len(chunk)
+    workbook.save(output)
+    return rows
+
+
+WRITERS = {
+    'csv': write_csv,
+    'xlsx': write_excel,
+    'ndjson': write_ndjson,
+    'json': write_json,
+}
+
+
+def export_dataframe(df: pd.DataFrame, file_format: str, output,
+                     chunk_rows: Optional[int] = None) -> int:
+    """Записать таблицу в бинарный файл (или путь) в выбранном формате"""
+    if file_format not in WRITERS:
+        raise ValueError(f"Неизвестный формат выгрузки: {file_format}")
+    if isinstance(output, (str, Path)):
+        with open(output, 'wb') as f:
+            return WRITERS[file_format](df, f, chunk_rows)
+    return WRITERS[file_format](df, output, chunk_rows)
+
+
+def export_bytes(df: pd.DataFrame, file_format: str) -> bytes:
+    """Выгрузка в память — для таблиц до EXPORT_BACKGROUND_ROWS строк"""
+    import io
+
+    buffer = io.BytesIO()
+    export_dataframe(df, file_format, buffer)
+    return buffer.getvalue()
+
+
+class BackgroundExport:
+    """Выгрузка большой таблицы в файл в отдельном потоке.
+
+    Файл пишется под временным именем и переименовывается по завершении,
+    поэтому готовый путь никогда не указывает на недописанный файл.
+    """
+
+    def __init__(self, df: pd.DataFrame, file_format: str, directory: Optional[str] = None,
+                 name: str = 'search_results'):
+        directory = Path(directory or config.EXPORT_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        extension = EXPORT_FORMATS[file_format][2]
+        self.df = df
+        self.file_format = file_format
+        self.path = directory / f"{name}_{time.strftime('%Y%m%d-%H%M%S')}{extension}"
+        self.status = 'running'
+        self.rows = len(df)
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        temporary = self.path.with_name(self.path.name + '.part')
+        try:
+            export_dataframe(self.df, self.file_format, temporary)
+            os.replace(temporary, self.path)
+            self.status = 'done'
+            logger.info(f"💾 Выгрузка сохранена: {self.path}")
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+            logger.error(f"❌ Ошибка выгрузки {self.path}: {str(e)}")
+            if temporary.exists():
+                temporary.unlink()
+        finally:
+            # Таблица больше не нужна: не держим ее в памяти вместе с сессией
+            self.df = None
+            self.finished_at = time.time()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import text_dtype
+
+# Сколько последних масок текстового поиска хранить для сужения при наборе
+TEXT_MASK_CACHE_SIZE = 32
+# Доля строк-кандидатов, ниже которой поиск идет только по ним
+NARROWING_MAX_FRACTION = 0.25
+
+
+def _codes(series: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    codes, uniques = pd.factorize(series)
+    return codes, pd.Index(uniques)
+
+
+class FilterIndex:
+    """Индекс для фильтров таблицы результатов.
+
+    Строится один раз на таблицу: коды категорий домена и типа, позиции в
+    numpy, заголовок и сниппет в нижнем регистре одной строкой Arrow, адреса
+    в нижнем регистре на уровне категорий. Фильтры собираются в булеву
+    маску без копирования таблицы, а текстовый поиск при дописывании
+    запроса проверяет только строки, совпавшие с более коротким запросом.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.domain_codes, self.domains = _codes(df['domain'])
+        self.type_codes, self.types = _codes(df['result_type'])
+        self.rank = pd.to_numeric(df['rank'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+        address_codes, addresses = _codes(df['address'])
+        self.address_codes = address_codes
+        self.addresses_lower = pd.Series(addresses.astype(str), dtype=text_dtype()).str.lower()
+
+        title = df['title'].fillna('').astype(text_dtype())
+        snippet = df['snippet'].fillna('').astype(text_dtype())
+        self.text = (title + '\n' + snippet).str.lower()
+        self._text_masks: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def _category_mask(self, codes: np.ndarray, categories: pd.Index, value) -> np.ndarray:
+        position = categories.get_indexer([value])[0]
+        if position < 0:
+            return np.zeros(len(codes), dtype=bool)
+        return codes == position
+
+    def text_mask(self, query: str) -> np.ndarray:
+        """Строки, где запрос встречается в заголовке, сниппете или адресе"""
+        query = query.lower()
+        if query in self._text_masks:
+            self._text_masks.move_to_end(query)
+            return self._text_masks[query]
+
+        # Совпадения с запросом-подстрокой содержат все совпадения текущего;
+        # выборка строк окупается, только если кандидатов заметно меньше таблицы
+        candidates = None
+        candidates_count = len(self.df) * NARROWING_MAX_FRACTION
+        for previous, previous_mask in self._text_masks.items():
+            if previous in query:
+                count = previous_mask.sum()
+                if count < candidates_count:
+                    candidates, candidates_count = previous_mask, count
+
+        address_matches = self.addresses_lower.str.contains(query, regex=False).to_numpy(
+            dtype=bool, na_value=False)
+        mask = address_matches[self.address_codes] & (self.address_codes >= 0)
+
+        rows = np.flatnonzero(candidates) if candidates is not None else slice(None)
+        text_matches = self.text.iloc[rows].str.contains(query, regex=False).to_numpy(
+            dtype=bool, na_value=False)
+        if candidates is not None:
+            mask[rows] |= text_matches
+            mask &= candidates
+        else:
+            mask |= text_matches
+
+        self._text_masks[query] = mask
+        while len(self._text_masks) > TEXT_MASK_CACHE_SIZE:
+            self._text_masks.popitem(last=False)
+        return mask
+
+    def mask(self, filters: Dict) -> np.ndarray:
+        """Булева маска по фильтрам create_filter_sidebar"""
+        mask = np.ones(len(self.df), dtype=bool)
+        if 'domain' in filters:
+            mask &= self._category_mask(self.domain_codes, self.domains, filters['domain'])
+        if 'result_type' in filters:
+            mask &= self._category_mask(self.type_codes, self.types, filters['result_type'])
+        if 'rank_min' in filters and 'rank_max' in filters:
+            # Сравнение с NaN дает False, как и фильтр по Int16 с NA
+            mask &= (self.rank >= filters['rank_min']) & (self.rank <= filters['rank_max'])
+        if filters.get('search_text'):
+            mask &= self.text_mask(filters['search_text'])
+        return mask
+
+    def apply(self, filters: Dict) -> pd.DataFrame:
+        """Отфильтрованная таблица; без фильтров возвращается исходная, без копии"""
+        mask = self.mask(filters)
+        if mask.all():
+            return self.df
+        return self.df[mask]
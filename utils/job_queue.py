@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import config
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Очередь фоновых заданий поиска в SQLite.
+
+    Интерфейс ставит задания, воркеры (python cli.py worker) забирают их,
+    пишут результаты в NDJSON файл задания и обновляют прогресс. Каждый
+    процесс открывает свое соединение: SQLite сам сериализует запись.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or config.JOBS_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.results_dir = self.path.parent
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                addresses TEXT NOT NULL,
+                params TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                successful INTEGER NOT NULL DEFAULT 0,
+                results_path TEXT,
+                error TEXT,
+                worker_id TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id TEXT PRIMARY KEY,
+                pid INTEGER,
+                last_seen REAL NOT NULL
+            );
+        """)
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job['addresses'] = json.loads(job['addresses'])
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def submit(self, addresses: List[str], params: Optional[Dict] = None) -> int:
+        """Поставить задание в очередь, вернуть его id"""
+        cursor = self._conn.execute(
+            "INSERT INTO jobs (addresses, params, total, created_at) VALUES (?, ?, ?, ?)",
+            (json.dumps(addresses, ensure_ascii=False), json.dumps(params or {}),
+             len(addresses), time.time()))
+        job_id = cursor.lastrowid
+        logger.info(f"📥 Задание {job_id} поставлено в очередь: {len(addresses)} адресов")
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Атомарно забрать самое старое задание из очереди"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return None
+            job_id = row['id']
+            results_path = str(self.results_dir / f"job_{job_id}.ndjson")
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, started_at = ?, results_path = ? "
+                "WHERE id = ?",
+                (worker_id, time.time(), results_path, job_id))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return self.get(job_id)
+
+    def update_progress(self, job_id: int, done: int, successful: int):
+        self._conn.execute(
+            "UPDATE jobs SET done = ?, successful = ? WHERE id = ?", (done, successful, job_id))
+
+    def complete(self, job_id: int):
+        self._conn.execute(
+            "UPDATE jobs SET status = 'completed', finished_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def fail(self, job_id: int, error: str):
+        self._conn.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+            (error, time.time(), job_id))
+
+    def cancel(self, job_id: int):
+        """Отменить задание: из очереди — сразу, выполняемое — по флагу для воркера"""
+        self._conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id))
+        self._conn.execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+
+    def mark_cancelled(self, job_id: int):
+        self._conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def is_cancel_requested(self, job_id: int) -> bool:
+        row = self._conn.execute(
+            "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        row = self._conn.execute(
+            "SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, limit: int = 20) -> List[Dict]:
+        """Последние задания без списка адресов (для отображения)"""
+        rows = self._conn.execute(
+            "SELECT id, status, params, total, done, successful, results_path, error, worker_id, "
+            "created_at, started_at, finished_at FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job['params'] = json.loads(job['params'])
+            jobs.append(job)
+        return jobs
+
+    def load_results(self, job_id: int) -> List[Dict]:
+        """Результаты задания из его NDJSON файла"""
+        job = self.get(job_id)
+        if not job or not job['results_path'] or not os.path.exists(job['results_path']):
+            return []
+        results = []
+        with open(job['results_path'], encoding='utf-8') as f:
+            for line in f:
+                try:
+                    results.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return results
+
+    def heartbeat(self, worker_id: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO workers (worker_id, pid, last_seen) VALUES (?, ?, ?)",
+            (worker_id, os.getpid(), time.time()))
+
+    def remove_worker(self, worker_id: str):
+        self._conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def active_workers(self, timeout: Optional[float] = None) -> List[str]:
+        timeout = config.JOBS_WORKER_TIMEOUT if timeout is None else timeout
+        rows = self._conn.execute(
+            "SELECT worker_id FROM workers WHERE last_seen >= ?", (time.time() - timeout,)).fetchall()
+        return [row['worker_id'] for row in rows]
+
+    def requeue_stale(self, timeout: Optional[float] = None) -> int:
+        """Вернуть в очередь задания воркеров, переставших отвечать"""
+        timeout = config.JOBS_WORKER_TIMEOUT if timeout is None else timeout
+        cursor = self._conn.execute(
+            "UPDATE jobs SET status = 'queued', worker_id = NULL, done = 0, successful = 0 "
+            "WHERE status = 'running' AND worker_id NOT IN "
+            "(SELECT worker_id FROM workers WHERE last_seen >= ?)",
+            (time.time() - timeout,))
+        if cursor.rowcount:
+            logger.warning(f"♻️ Возвращено в очередь заданий: {cursor.rowcount}")
+        return cursor.rowcount
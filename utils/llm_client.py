@@ -0,0 +1,348 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from utils import metrics
+from utils.prompt_builder import estimate_tokens
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Коды ответа, при которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMClientError(Exception):
+    """Ошибка обращения к LLM API"""
+
+
+class LLMClient:
+    """Клиент LLM API (/chat) с пулом keep-alive соединений и повторами"""
+
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None
+    ):
+        self.api_url = api_url or config.LLM_API_URL
+        self.concurrency = max(1, concurrency or config.LLM_CONCURRENCY)
+        self.timeout = timeout or config.LLM_TIMEOUT
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = config.LLM_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+
+        # Синхронная сессия для одиночных запросов (переиспользует соединения)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=self.concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        # Пакетный режим: собственный цикл событий и сессия aiohttp живут
+        # вместе с клиентом, чтобы соединения переиспользовались между пачками
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._async_session: Optional['aiohttp.ClientSession'] = None
+
+    def close(self):
+        self._session.close()
+        with self._loop_lock:
+            if self._loop is None:
+                return
+            if self._async_session is not None:
+                self._loop.run_until_complete(self._async_session.close())
+                self._async_session = None
+            self._loop.close()
+            self._loop = None
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Экспоненциальная задержка перед повтором с небольшим джиттером"""
+        return self.retry_backoff * (2 ** attempt) + random.uniform(0, self.retry_backoff)
+
+    @staticmethod
+    def prompt_tokens(payload: Dict) -> int:
+        """Приблизительный размер промпта в токенах"""
+        return estimate_tokens(payload["system_prompt"]) + estimate_tokens(payload["prompt"])
+
+    def _log_request(self, payload: Dict, latency: float, mode: str = 'sync'):
+        metrics.LLM_SECONDS.observe(latency, mode=mode, outcome='ok')
+        logger.info(
+            f"🧑‍⚖️ LLM запрос: ~{self.prompt_tokens(payload)} токенов, {latency:.2f} с")
+
+    @staticmethod
+    def _response_text(data) -> str:
+        """Текст ответа из JSON тела; ValueError, если тело не объект"""
+        if not isinstance(data, dict):
+            raise ValueError(f"ожидался JSON объект, получено {type(data).__name__}")
+        return data.get("response", "[Нет ответа от LLM]")
+
+    @staticmethod
+    def _payload(prompt: str, system_prompt: str, max_tokens: int, temperature: float,
+                 prompt_prefix: Optional[str] = None) -> Dict:
+        payload = {
+            "prompt": prompt,
+            "system_prompt": system_prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        if prompt_prefix:
+            # Общее начало промпта: локальный сервер переиспользует его KV-кэш
+            payload["prompt_prefix"] = prompt_prefix
+        return payload
+
+    def chat(self, prompt: str, system_prompt: str, max_tokens: int = 128, temperature: float = 0.1,
+             prompt_prefix: Optional[str] = None) -> str:
+        """Одиночный блокирующий запрос к LLM API"""
+        payload = self._payload(prompt, system_prompt,
+                                max_tokens, temperature, prompt_prefix)
+        started = time.perf_counter()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._session.post(
+                    self.api_url, json=payload, timeout=self.timeout)
+                if response.status_code == 200:
+                    text = self._response_text(response.json())
+                    self._log_request(payload, time.perf_counter() - started)
+                    return text
+                last_error = LLMClientError(
+                    f"Ошибка API: {response.status_code} {response.text}")
+                if response.status_code not in RETRY_STATUSES:
+                    metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode='sync', outcome='error')
+                    raise last_error
+            except ValueError as e:
+                # 200 с телом не JSON (прокси, обрыв ответа) — повторяем как сбой
+                last_error = LLMClientError(
+                    f"Некорректный ответ LLM API: {str(e)}")
+            except requests.RequestException as e:
+                last_error = LLMClientError(
+                    f"Ошибка запроса к LLM API: {str(e)}")
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt)
+                logger.warning(
+                    f"⚠️ {last_error}. Повтор {attempt + 1}/{self.max_retries} через {delay:.1f} с")
+                metrics.LLM_RETRIES.inc()
+                time.sleep(delay)
+        metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode='sync', outcome='error')
+        raise last_error
+
+    def chat_stream(
+        self,
+        prompt: str,
+        system_prompt: str,
+        max_tokens: int = 128,
+        temperature: float = 0.1,
+        prompt_prefix: Optional[str] = None,
+        stats: Optional[Dict] = None
+    ) -> Iterator[str]:
+        """Потоковый запрос к LLM API: фрагменты ответа по мере генерации.
+
+        Сервер без поддержки потока (обычный JSON ответ) отдается одним
+        фрагментом. Если передан stats, в него записываются ttft
+        (время до первого фрагмента) и latency (полное время).
+        """
+        payload = self._payload(prompt, system_prompt,
+                                max_tokens, temperature, prompt_prefix)
+        payload["stream"] = True
+        started = time.perf_counter()
+        last_error = None
+        # Ответ без потока (обычный JSON) разбирается до выхода из цикла повторов
+        text = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._session.post(
+                    self.api_url, json=payload, timeout=self.timeout, stream=True)
+                if response.status_code == 200:
+                    if response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                        break
+                    with response:
+                        text = self._response_text(response.json())
+                    break
+                last_error = LLMClientError(
+                    f"Ошибка API: {response.status_code} {response.text}")
+                # Потоковый ответ держит соединение пула, пока его не закрыть
+                response.close()
+                if response.status_code not in RETRY_STATUSES:
+                    metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode='stream', outcome='error')
+                    raise last_error
+            except ValueError as e:
+                last_error = LLMClientError(
+                    f"Некорректный ответ LLM API: {str(e)}")
+            except requests.RequestException as e:
+                last_error = LLMClientError(
+                    f"Ошибка запроса к LLM API: {str(e)}")
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt)
+                logger.warning(
+                    f"⚠️ {last_error}. Повтор {attempt + 1}/{self.max_retries} через {delay:.1f} с")
+                metrics.LLM_RETRIES.inc()
+                time.sleep(delay)
+        else:
+            metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode='stream', outcome='error')
+            raise last_error
+
+        ttft = None
+        if text is not None:
+            ttft = time.perf_counter() - started
+            yield text
+        else:
+            try:
+                with response:
+                    try:
+                        for line in response.iter_lines(decode_unicode=True):
+                            if not line or not line.startswith("data:"):
+                                continue
+                            try:
+                                event = json.loads(line[len("data:"):])
+                            except ValueError as e:
+                                raise LLMClientError(
+                                    f"Некорректное событие потока LLM API: {str(e)}")
+                            if event.get("error"):
+                                raise LLMClientError(
+                                    f"Ошибка генерации: {event['error']}")
+                            if event.get("token"):
+                                if ttft is None:
+                                    ttft = time.perf_counter() - started
+                                yield event["token"]
+                    except requests.RequestException as e:
+                        raise LLMClientError(
+                            f"Обрыв потока LLM API: {str(e)}")
+            except LLMClientError:
+                # Фрагменты уже отданы, повторять поток нельзя: только учет ошибки
+                metrics.LLM_SECONDS.observe(time.perf_counter() - started, mode='stream', outcome='error')
+                raise
+
+        latency = time.perf_counter() - started
+        ttft = latency if ttft is None else ttft
+        metrics.LLM_SECONDS.observe(latency, mode='stream', outcome='ok')
+        if stats is not None:
+            stats["ttft"] = ttft
+            stats["latency"] = latency
+        logger.info(
+            f"🧑‍⚖️ LLM поток: ~{self.prompt_tokens(payload)} токенов, первый фрагмент {ttft:.2f} с, всего {latency:.2f} с")
+
+    async def _chat_async(self, session: 'aiohttp.ClientSession', payload: Dict) -> str:
+        import aiohttp
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with session.post(self.api_url, json=payload) as response:
+                    if response.status == 200:
+                        return self._response_text(await response.json(content_type=None))
+                    text = await response.text()
+                    last_error = LLMClientError(
+                        f"Ошибка API: {response.status} {text}")
+                    if response.status not in RETRY_STATUSES:
+                        raise last_error
+            except ValueError as e:
+                last_error = LLMClientError(
+                    f"Некорректный ответ LLM API: {str(e)}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = LLMClientError(
+                    f"Ошибка запроса к LLM API: {str(e) or type(e).__name__}")
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt)
+                logger.warning(
+                    f"⚠️ {last_error}. Повтор {attempt + 1}/{self.max_retries} через {delay:.1f} с")
+                metrics.LLM_RETRIES.inc()
+                await asyncio.sleep(delay)
+        raise last_error
+
+    async def _get_async_session(self) -> 'aiohttp.ClientSession':
+        """Общая сессия aiohttp клиента (создается в его цикле событий)"""
+        import aiohttp
+
+        if self._async_session is None or self._async_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency, keepalive_timeout=60)
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            self._async_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._async_session
+
+    async def chat_many_async(
+        self,
+        requests_data: List[Dict],
+        progress_callback: Optional[Callable] = None
+    ) -> List[Dict]:
+        """Параллельные запросы к LLM API с ограничением конкурентности.
+
+        Каждый элемент requests_data содержит prompt, system_prompt,
+        max_tokens и temperature. Возвращает список словарей с ключами
+        response/error/latency/prompt_tokens в том же порядке.
+
+        Из chat_many используется общая сессия клиента; в чужом цикле
+        событий сессия создается на время вызова (aiohttp привязан к циклу).
+        """
+        if self._loop is not None and asyncio.get_running_loop() is self._loop:
+            return await self._chat_many(await self._get_async_session(), requests_data, progress_callback)
+
+        # aiohttp нужен только пакетному режиму
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            return await self._chat_many(session, requests_data, progress_callback)
+
+    async def _chat_many(
+        self,
+        session: 'aiohttp.ClientSession',
+        requests_data: List[Dict],
+        progress_callback: Optional[Callable] = None
+    ) -> List[Dict]:
+        results: List[Dict] = [None] * len(requests_data)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        done = 0
+
+        async def worker(idx: int, item: Dict):
+            nonlocal done
+            async with semaphore:
+                started = time.perf_counter()
+                payload = self._payload(
+                    item["prompt"], item["system_prompt"],
+                    item.get("max_tokens", 128), item.get("temperature", 0.1),
+                    item.get("prompt_prefix"))
+                try:
+                    response = await self._chat_async(session, payload)
+                    results[idx] = {"response": response, "error": None}
+                except LLMClientError as e:
+                    results[idx] = {"response": None, "error": str(e)}
+                latency = time.perf_counter() - started
+                results[idx]["latency"] = latency
+                results[idx]["prompt_tokens"] = self.prompt_tokens(payload)
+                if results[idx]["error"] is None:
+                    self._log_request(payload, latency, mode='batch')
+                else:
+                    metrics.LLM_SECONDS.observe(latency, mode='batch', outcome='error')
+            done += 1
+            if progress_callback:
+                progress_callback(done, len(requests_data), item)
+
+        await asyncio.gather(*(worker(idx, item)
+                               for idx, item in enumerate(requests_data)))
+        return results
+
+    def chat_many(self, requests_data: List[Dict], progress_callback: Optional[Callable] = None) -> List[Dict]:
+        """Синхронная обертка над chat_many_async.
+
+        Пачки выполняются в собственном цикле событий клиента, поэтому
+        соединения aiohttp переиспользуются между вызовами. Вызовы из разных
+        потоков (сессии Streamlit с общим клиентом) идут по очереди, а
+        progress_callback вызывается в потоке вызывающего.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+            return self._loop.run_until_complete(self.chat_many_async(requests_data, progress_callback))
@@ -0,0 +1,297 @@
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import config
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Границы гистограмм по умолчанию, секунды: от быстрых этапов до OCR и LLM
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Metric:
+    """Метрика с метками; значения по сочетаниям меток хранятся в словаре"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получено {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels_text(self, key: Tuple[str, ...], extra: Sequence[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def samples(self) -> Iterator[Tuple[str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{sample} {_format_value(value)}" for sample, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    """Монотонный счетчик"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            # Метрика без меток видна в выводе сразу, с нулем
+            self._values[()] = 0.0
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[Tuple[str, float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name + self._labels_text(key), value
+
+
+class Gauge(Counter):
+    """Текущее значение: может расти и убывать"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам (le), сумма и число наблюдений"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # Корзина — первая граница, не меньшая значения; последняя — +Inf
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> Iterator[Tuple[str, float]]:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield self.name + '_bucket' + self._labels_text(key, [('le', _format_value(bound))]), cumulative
+            yield self.name + '_sum' + self._labels_text(key), total
+            yield self.name + '_count' + self._labels_text(key), cumulative
+
+
+class MetricsRegistry:
+    """Набор метрик процесса и их вывод в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Метрики поиска и LLM (имена — по соглашениям Prometheus)
+ADDRESSES = REGISTRY.counter(
+    'analyzegeo_addresses_total', 'Обработано адресов по статусу поиска', ['status'])
+CAPTCHAS = REGISTRY.counter(
+    'analyzegeo_captcha_total', 'Адреса, на скриншоте которых обнаружена капча')
+SERP_RESULTS = REGISTRY.counter(
+    'analyzegeo_serp_results_total', 'Результатов выдачи извлечено из DOM')
+STAGE_SECONDS = REGISTRY.histogram(
+    'analyzegeo_stage_seconds', 'Длительность этапов поиска по адресу', ['stage'])
+OCR_QUEUE = REGISTRY.gauge(
+    'analyzegeo_ocr_queue_depth', 'Скриншотов в OCR (ожидают или распознаются)')
+BROWSERS_ACTIVE = REGISTRY.gauge(
+    'analyzegeo_browsers_active', 'Открытых браузеров')
+BROWSER_STARTS = REGISTRY.counter(
+    'analyzegeo_browser_starts_total', 'Запусков браузера (больше числа потоков — перезапуски)')
+BROWSER_FAILURES = REGISTRY.counter(
+    'analyzegeo_browser_failures_total', 'Потоков поиска, остановленных ошибкой браузера')
+LAST_RESULT = REGISTRY.gauge(
+    'analyzegeo_last_result_timestamp_seconds', 'Время последнего результата (unix)')
+LLM_SECONDS = REGISTRY.histogram(
+    'analyzegeo_llm_request_seconds', 'Длительность запросов к LLM API', ['mode', 'outcome'])
+LLM_RETRIES = REGISTRY.counter(
+    'analyzegeo_llm_retries_total', 'Повторов запросов к LLM API')
+
+
+def record_search(result: Dict):
+    """Учесть результат search_address_in_yandex"""
+    ADDRESSES.inc(status='success' if result.get('success') else 'error')
+    if result.get('captcha_detected'):
+        CAPTCHAS.inc()
+    SERP_RESULTS.inc(len(result.get('results') or []))
+    for stage, seconds in (result.get('timings') or {}).items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    LAST_RESULT.set(time.time())
+
+
+def _handler_class(registry: MetricsRegistry):
+    """Обработчик GET /metrics (http.server импортируется только при запуске endpoint)"""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Опросы Prometheus не засоряют вывод воркера
+            pass
+
+    return MetricsHandler
+
+
+class MetricsExporter:
+    """HTTP endpoint /metrics и (или) периодическая запись метрик в файл.
+
+    Файл пишется атомарно (временный файл + замена), его можно отдавать
+    textfile collector node_exporter. close() делает последнюю запись.
+    """
+
+    def __init__(self, port: Optional[int] = None, path: Optional[str] = None,
+                 interval: Optional[float] = None, host: str = '0.0.0.0',
+                 registry: MetricsRegistry = REGISTRY):
+        self.registry = registry
+        self.path = path
+        self.interval = interval or config.METRICS_FLUSH_INTERVAL
+        self._server = None
+        self._stop = threading.Event()
+        self._flusher = None
+
+        if port:
+            from http.server import ThreadingHTTPServer
+
+            self._server = ThreadingHTTPServer((host, port), _handler_class(registry))
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+            logger.info(f"📈 Метрики: http://{host}:{self.port}/metrics")
+        if path:
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-file', daemon=True)
+            self._flusher.start()
+
+    @property
+    def port(self) -> Optional[int]:
+        return self._server.server_address[1] if self._server else None
+
+    def flush(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(self.registry.render())
+        os.replace(temporary, self.path)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning(f"⚠️ Не удалось записать метрики в {self.path}: {str(e)}")
+
+    def close(self):
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._flusher:
+            self._flusher.join()
+            self.flush()
+
+
+def process_metrics_options(port: Optional[int], path: Optional[str],
+                            index: int) -> Tuple[Optional[int], Optional[str]]:
+    """Порт и файл метрик для index-го процесса: port + index, файл с суффиксом .index"""
+    if port:
+        port += index
+    if path:
+        root, extension = os.path.splitext(path)
+        path = f"{root}.{index}{extension}"
+    return port, path
@@ -0,0 +1,128 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+# Организационно-правовые формы: сильный признак коммерческой деятельности
+ORG_FORMS_PATTERN = re.compile(r'\b(ООО|ОАО|ЗАО|ПАО|АО|ИП|НКО|ТСЖ)\b')
+
+BUSINESS_KEYWORDS = [
+    'магазин', 'офис', 'аренд', 'услуг', 'кафе', 'ресторан', 'салон', 'склад',
+    'производств', 'торгов', 'компани', 'организац', 'отель', 'гостиниц',
+    'гостев', 'клиник', 'аптек', 'автосервис', 'мастерск', 'студи', 'фирм',
+    'продаж', 'купить', 'цена', 'часы работы', 'телефон', 'отзыв'
+]
+
+# Служебные строки файла анализа, бесполезные для вердикта
+SERVICE_PREFIXES = ('Адрес:', 'Время:', 'Скриншот:', 'Размер изображения:')
+IMAGE_SECTION_HEADER = '=== АНАЛИЗ ИЗОБРАЖЕНИЯ ==='
+TEXT_ANALYSIS_HEADER = '=== АНАЛИЗ ТЕКСТА ==='
+
+
+def estimate_tokens(text: str) -> int:
+    """Приблизительное число токенов (без загрузки токенизатора модели)"""
+    if not text:
+        return 0
+    return max(1, round(len(text) / config.LLM_CHARS_PER_TOKEN))
+
+
+def _normalize_line(line: str) -> str:
+    return ' '.join(line.lower().split())
+
+
+def _is_status_line(line: str) -> bool:
+    """Строки статуса анализа начинаются с эмодзи, а не с буквы или цифры"""
+    first = line[0]
+    return not (first.isalnum() or first in '«"(\'')
+
+
+def _is_noise(line: str) -> bool:
+    """Мусор OCR: слишком короткие строки или строки почти без букв"""
+    letters = sum(1 for char in line if char.isalpha())
+    return letters < 4 or letters / len(line) < 0.5
+
+
+def _address_words(address: str) -> List[str]:
+    return [word.strip(',.') for word in address.lower().split() if len(word.strip(',.')) > 3]
+
+
+def _score_line(line: str, address_words: List[str]) -> int:
+    """Релевантность строки для вердикта о коммерческой деятельности"""
+    line_lower = line.lower()
+    score = 0
+    if ORG_FORMS_PATTERN.search(line):
+        score += 3
+    score += 2 * sum(1 for keyword in BUSINESS_KEYWORDS if keyword in line_lower)
+    if any(word in line_lower for word in address_words):
+        score += 2
+    return score
+
+
+def _ocr_lines(text: str) -> List[str]:
+    """Полезные строки файла анализа: OCR текст без заголовков и статистики"""
+    lines = []
+    for raw_line in text.split('\n'):
+        line = raw_line.strip()
+        if line == IMAGE_SECTION_HEADER:
+            # Дальше только статистика изображения
+            break
+        if not line or line.startswith('===') or line.startswith(SERVICE_PREFIXES):
+            continue
+        if line == TEXT_ANALYSIS_HEADER or _is_status_line(line) or _is_noise(line):
+            continue
+        lines.append(line)
+    return lines
+
+
+def _serp_lines(results: List[Dict]) -> List[str]:
+    """Заголовки и сниппеты из поисковой выдачи"""
+    lines = []
+    for result in results:
+        title = (result.get('title') or '').strip()
+        snippet = ' '.join((result.get('snippet') or '').split())
+        domain = result.get('domain') or ''
+        if title:
+            lines.append(f"{title} ({domain})" if domain else title)
+        if snippet:
+            lines.append(snippet)
+    return lines
+
+
+def compact_verdict_text(
+    address: str,
+    extracted_text: str,
+    serp_results: Optional[List[Dict]] = None,
+    token_budget: Optional[int] = None
+) -> str:
+    """Сжатие текста для вердикта под бюджет токенов.
+
+    Берет заголовки/сниппеты выдачи и строки OCR, убирает служебные
+    строки и повторы, затем оставляет самые релевантные строки
+    (организации, ключевые слова бизнеса, упоминания адреса),
+    пока укладывается в бюджет. Порядок строк сохраняется.
+    """
+    token_budget = config.VERDICT_TOKEN_BUDGET if token_budget is None else token_budget
+    address_words = _address_words(address)
+
+    candidates: List[Tuple[int, int, str]] = []
+    seen = set()
+    for source_bonus, lines in ((1, _serp_lines(serp_results or [])), (0, _ocr_lines(extracted_text))):
+        for line in lines:
+            key = _normalize_line(line)
+            if key in seen:
+                continue
+            seen.add(key)
+            score = _score_line(line, address_words) + source_bonus
+            candidates.append((score, len(candidates), line))
+
+    selected = []
+    used_tokens = estimate_tokens(f"Адрес: {address}")
+    for score, position, line in sorted(candidates, key=lambda c: (-c[0], c[1])):
+        line_tokens = estimate_tokens(line) + 1
+        if used_tokens + line_tokens > token_budget:
+            continue
+        selected.append((position, line))
+        used_tokens += line_tokens
+
+    body = '\n'.join(line for _, line in sorted(selected))
+    return f"Адрес: {address}\n{body}" if body else f"Адрес: {address}"
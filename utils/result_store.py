@@ -0,0 +1,231 @@
+import logging
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import config
+from utils.data_processor import CATEGORY_COLUMNS, RESULT_COLUMNS, DataProcessor
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+SEARCH_COLUMNS = ['address', 'success', 'error', 'results_count', 'screenshot_path',
+                  'text_file_path', 'page_title', 'page_url']
+# Колонки с малым числом различных значений хранятся как словари (category в pandas)
+DICTIONARY_COLUMNS = CATEGORY_COLUMNS
+
+
+def _schemas():
+    import pyarrow as pa
+
+    text = pa.string()
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    results = pa.schema([
+        ('address', dictionary),
+        ('rank', pa.int16()),
+        ('title', text),
+        ('domain', dictionary),
+        ('result_type', dictionary),
+        ('snippet', text),
+        ('additional_info', text),
+        ('url', text),
+    ])
+    searches = pa.schema([
+        ('address', text),
+        ('success', pa.bool_()),
+        ('error', text),
+        ('results_count', pa.int32()),
+        ('screenshot_path', text),
+        ('text_file_path', text),
+        ('page_title', text),
+        ('page_url', text),
+    ])
+    partitioning = pa.schema([('run_date', pa.string()), ('run_id', pa.string())])
+    return results, searches, partitioning
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_text(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+class ResultStore:
+    """Колоночное хранилище результатов поиска в Parquet.
+
+    Каждый запуск (задание, пакет CLI) пишется отдельными файлами в
+    <root>/results и <root>/searches с разбиением run_date=.../run_id=...,
+    поэтому чтение истории по дате или запуску открывает только нужные
+    каталоги, а фильтры по колонкам проталкиваются в pyarrow.dataset.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or config.RESULT_STORE_PATH)
+
+    @staticmethod
+    def new_run_id(prefix: str = "run") -> str:
+        return f"{prefix}-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+    def write(self, browser_results: List[Dict], run_id: str, run_date: Optional[str] = None) -> int:
+        """Дописать результаты браузерного поиска в запуск run_id, вернуть число строк выдачи"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not browser_results:
+            return 0
+        results_schema, searches_schema, _ = _schemas()
+        run_date = run_date or date.today().isoformat()
+        part_name = f"part-{uuid.uuid4().hex}.parquet"
+
+        rows = []
+        for browser_result in browser_results:
+            for result in browser_result.get('results') or []:
+                rows.append((browser_result['address'], result))
+        if rows:
+            columns = {
+                'address': [address for address, _ in rows],
+                'rank': [_to_int(result.get('rank')) for _, result in rows],
+            }
+            for name in RESULT_COLUMNS:
+                if name not in columns:
+                    columns[name] = [_to_text(result.get(name)) for _, result in rows]
+            table = pa.table({name: pa.array(columns[name], type=results_schema.field(name).type)
+                              for name in RESULT_COLUMNS}, schema=results_schema)
+            self._write_table(pq, table, 'results', run_date, run_id, part_name)
+
+        searches = {
+            'address': [r['address'] for r in browser_results],
+            'success': [bool(r.get('success')) for r in browser_results],
+            'results_count': [len(r.get('results') or []) for r in browser_results],
+        }
+        for name in ('error', 'screenshot_path', 'text_file_path', 'page_title', 'page_url'):
+            searches[name] = [_to_text(r.get(name)) for r in browser_results]
+        table = pa.table({name: pa.array(searches[name], type=searches_schema.field(name).type)
+                          for name in SEARCH_COLUMNS}, schema=searches_schema)
+        self._write_table(pq, table, 'searches', run_date, run_id, part_name)
+
+        logger.info(f"🗄️ Запуск {run_id}: записано {len(rows)} результатов, {len(browser_results)} адресов")
+        return len(rows)
+
+    def _write_table(self, pq, table, kind: str, run_date: str, run_id: str, part_name: str):
+        directory = self.root / kind / f"run_date={run_date}" / f"run_id={run_id}"
+        directory.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, str(directory / part_name),
+                       compression='zstd', use_dictionary=True)
+
+    def _dataset(self, kind: str):
+        import pyarrow.dataset as ds
+
+        path = self.root / kind
+        if not path.exists():
+            return None
+        _, _, partitioning = _schemas()
+        return ds.dataset(str(path), format='parquet',
+                          partitioning=ds.partitioning(partitioning, flavor='hive'))
+
+    @staticmethod
+    def _filter(run_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                date_to: Optional[str] = None, domains: Optional[List[str]] = None,
+                result_types: Optional[List[str]] = None):
+        import pyarrow.dataset as ds
+
+        conditions = []
+        if run_ids:
+            conditions.append(ds.field('run_id').isin(run_ids))
+        # Даты в ISO формате сравниваются как строки
+        if date_from:
+            conditions.append(ds.field('run_date') >= str(date_from))
+        if date_to:
+            conditions.append(ds.field('run_date') <= str(date_to))
+        if domains:
+            conditions.append(ds.field('domain').isin(domains))
+        if result_types:
+            conditions.append(ds.field('result_type').isin(result_types))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def read_results(self, run_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                     date_to: Optional[str] = None, domains: Optional[List[str]] = None,
+                     result_types: Optional[List[str]] = None,
+                     columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Результаты выдачи по фильтрам; читаются только нужные запуски и колонки"""
+        dataset = self._dataset('results')
+        if dataset is None:
+            return pd.DataFrame(columns=columns or RESULT_COLUMNS)
+        table = dataset.to_table(
+            columns=columns or RESULT_COLUMNS,
+            filter=self._filter(run_ids, date_from, date_to, domains, result_types))
+        df = table.to_pandas()
+        for name in DICTIONARY_COLUMNS:
+            if name in df.columns:
+                # Словари файлов Parquet могут содержать значения, отсеянные фильтром
+                df[name] = df[name].astype('category').cat.remove_unused_categories()
+        if columns is None:
+            # Полная таблица приводится к той же схеме, что и результаты текущего поиска
+            df = DataProcessor.apply_result_schema(df)
+        return df
+
+    def read_searches(self, run_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None) -> pd.DataFrame:
+        """Записи о поиске по каждому адресу (успех, ошибки, пути к файлам)"""
+        dataset = self._dataset('searches')
+        if dataset is None:
+            return pd.DataFrame(columns=SEARCH_COLUMNS)
+        return dataset.to_table(
+            columns=SEARCH_COLUMNS,
+            filter=self._filter(run_ids, date_from, date_to)).to_pandas()
+
+    def list_runs(self) -> pd.DataFrame:
+        """Сводка по запускам: дата, число адресов, успешных поисков и результатов"""
+        dataset = self._dataset('searches')
+        if dataset is None:
+            return pd.DataFrame(columns=['run_id', 'run_date', 'addresses', 'successful', 'results'])
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        table = dataset.to_table(columns=['run_date', 'run_id', 'success', 'results_count'])
+        table = table.set_column(table.schema.get_field_index('success'), 'success',
+                                 pc.cast(table['success'], pa.int32()))
+        runs = table.group_by(['run_id', 'run_date']).aggregate([
+            ('success', 'count'),
+            ('success', 'sum'),
+            ('results_count', 'sum'),
+        ]).to_pandas().rename(columns={
+            'success_count': 'addresses',
+            'success_sum': 'successful',
+            'results_count_sum': 'results'
+        })
+        runs = runs[['run_id', 'run_date', 'addresses', 'successful', 'results']]
+        return runs.sort_values(['run_date', 'run_id'], ascending=False, ignore_index=True)
+
+
+class RunWriter:
+    """Буферизованная запись результатов одного запуска: файл Parquet на пачку адресов"""
+
+    def __init__(self, store: ResultStore, run_id: str, batch_size: Optional[int] = None):
+        self.store = store
+        self.run_id = run_id
+        self.run_date = date.today().isoformat()
+        self.batch_size = batch_size or config.RESULT_STORE_BATCH
+        self._buffer: List[Dict] = []
+
+    def add(self, browser_result: Dict):
+        self._buffer.append(browser_result)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.store.write(self._buffer, self.run_id, self.run_date)
+            self._buffer = []
@@ -0,0 +1,264 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import config
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Виды документов индекса
+DOCUMENT_KINDS = {
+    'serp': 'Выдача',
+    'ocr': 'OCR скриншота',
+    'page': 'Анализ страницы'
+}
+# Веса bm25 по колонкам: address, kind, title, body, url, run_id, doc_key
+BM25_WEIGHTS = (2.0, 0.0, 3.0, 1.0, 0.0, 0.0, 0.0)
+QUERY_OPERATORS = {'OR': 'OR', 'ИЛИ': 'OR', 'AND': 'AND', 'И': 'AND', 'NOT': 'NOT', 'НЕ': 'NOT'}
+
+
+def to_fts_query(text: str, prefix: bool = True) -> str:
+    """Запрос пользователя в синтаксис FTS5.
+
+    Слова экранируются кавычками, "фразы в кавычках" сохраняются,
+    OR/ИЛИ, AND/И, NOT/НЕ становятся операторами. С prefix=True слова
+    ищутся по началу ("аренд" найдет "аренда", "аренды").
+    Исключение без искомых слов (NOT в начале, OR NOT) FTS5 не выражает —
+    такой запрос отклоняется ValueError, а не превращается в поиск слова.
+    """
+    parts: List[str] = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', text):
+        if phrase:
+            tokens = re.findall(r'\w+', phrase)
+            if tokens:
+                parts.append('"' + ' '.join(tokens) + '"')
+            continue
+        operator = QUERY_OPERATORS.get(word.upper())
+        if operator:
+            previous = parts[-1] if parts else None
+            if operator == 'NOT' and (previous is None or previous == 'OR'):
+                raise ValueError(
+                    f"Нельзя начинать запрос или часть после OR с {word}: "
+                    f"укажите, что искать, например: аренда {word} посуточно")
+            if operator == 'NOT' and previous == 'AND':
+                # "a AND NOT b" — то же, что "a NOT b"
+                parts[-1] = 'NOT'
+            elif previous is not None and previous not in QUERY_OPERATORS.values():
+                # Оператор допустим только между термами
+                parts.append(operator)
+            continue
+        for token in re.findall(r'\w+', word):
+            parts.append(f'"{token}"' + ('*' if prefix else ''))
+    while parts and parts[-1] in QUERY_OPERATORS.values():
+        parts.pop()
+    return ' '.join(parts)
+
+
+def _key(*values) -> str:
+    return hashlib.sha1('\x1f'.join(str(value) for value in values).encode('utf-8')).hexdigest()
+
+
+class TextIndex:
+    """Полнотекстовый индекс (SQLite FTS5) по выдаче, OCR и анализу страниц.
+
+    Документы добавляются по мере поиска и при дозагрузке старых запусков;
+    повторное добавление того же документа пропускается по ключу.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or config.TEXT_INDEX_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Счетчики документов пересчитываются только после изменения индекса
+        self._stats: Optional[Dict[str, int]] = None
+        self._stats_version: Optional[int] = None
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # В WAL достаточно синхронизации на чекпоинтах: индекс пополняется часто
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+                address, kind UNINDEXED, title, body, url UNINDEXED,
+                run_id UNINDEXED, doc_key UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS document_keys (key TEXT PRIMARY KEY);
+        """)
+        # Веса колонок сохраняются в индексе: ORDER BY rank сортирует без вызова bm25().
+        # Запись настройки сбрасывает ее в чужих соединениях, поэтому только при изменении
+        rank = f"bm25({', '.join(map(str, BM25_WEIGHTS))})"
+        stored = self._conn.execute("SELECT v FROM documents_config WHERE k = 'rank'").fetchone()
+        if not stored or stored[0] != rank:
+            with self._conn:
+                self._conn.execute("INSERT INTO documents (documents, rank) VALUES ('rank', ?)", (rank,))
+
+    def close(self):
+        self._conn.close()
+
+    def _insert(self, documents: List[Dict]) -> int:
+        added = 0
+        with self._lock, self._conn:
+            for document in documents:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO document_keys (key) VALUES (?)", (document['doc_key'],))
+                if not cursor.rowcount:
+                    continue
+                self._conn.execute(
+                    "INSERT INTO documents (address, kind, title, body, url, run_id, doc_key) "
+                    "VALUES (:address, :kind, :title, :body, :url, :run_id, :doc_key)", document)
+                added += 1
+            if added:
+                self._stats = None
+        return added
+
+    def add_result(self, browser_result: Dict, run_id: Optional[str] = None) -> int:
+        """Проиндексировать результат search_address_in_yandex, вернуть число новых документов"""
+        address = browser_result.get('address')
+        if not address:
+            return 0
+        documents = []
+        for result in browser_result.get('results') or []:
+            title = result.get('title') or ''
+            body = ' '.join(filter(None, [result.get('snippet'), result.get('additional_info')]))
+            url = result.get('url') or ''
+            documents.append({
+                'address': address, 'kind': 'serp', 'title': title, 'body': body,
+                'url': url, 'run_id': run_id, 'doc_key': _key('serp', address, url, title, body)
+            })
+
+        ocr_text = browser_result.get('ai_text_analysis')
+        if browser_result.get('success') and ocr_text:
+            text_file_path = browser_result.get('text_file_path')
+            # Ключ по файлу: дозагрузка extracted_text не создаст дубль
+            doc_key = _key('file', os.path.abspath(text_file_path)) if text_file_path else \
+                _key('ocr', address, ocr_text)
+            documents.append({
+                'address': address, 'kind': 'ocr', 'title': browser_result.get('page_title') or '',
+                'body': ocr_text, 'url': text_file_path or '', 'run_id': run_id, 'doc_key': doc_key
+            })
+
+        page_text = browser_result.get('text_analysis')
+        if browser_result.get('success') and page_text:
+            documents.append({
+                'address': address, 'kind': 'page', 'title': browser_result.get('page_title') or '',
+                'body': page_text, 'url': browser_result.get('page_url') or '', 'run_id': run_id,
+                'doc_key': _key('page', address, page_text)
+            })
+        return self._insert(documents)
+
+    def add_text_file(self, path: str) -> int:
+        """Проиндексировать файл extracted_text (адрес берется из первой строки)"""
+        with open(path, encoding='utf-8', errors='replace') as f:
+            content = f.read()
+        match = re.match(r'Адрес: (.*)', content)
+        if not match:
+            return 0
+        body = content.split('=' * 50 + '\n', 1)[-1]
+        return self._insert([{
+            'address': match.group(1).strip(), 'kind': 'ocr', 'title': '', 'body': body,
+            'url': path, 'run_id': None, 'doc_key': _key('file', os.path.abspath(path))
+        }])
+
+    def backfill(self, text_dir: Optional[str] = None, result_files: Iterable[str] = ()) -> Dict[str, int]:
+        """Дозагрузить старые данные: NDJSON результаты запусков и файлы extracted_text"""
+        counts = {'documents': 0, 'files': 0}
+        for path in result_files:
+            if not os.path.exists(path):
+                continue
+            counts['files'] += 1
+            run_id = os.path.splitext(os.path.basename(path))[0]
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        counts['documents'] += self.add_result(json.loads(line), run_id)
+                    except json.JSONDecodeError:
+                        continue
+        # Файлы текста, которых не было в результатах, добавляются отдельно
+        for path in sorted(glob.glob(os.path.join(text_dir or 'extracted_text', '*.txt'))):
+            counts['files'] += 1
+            counts['documents'] += self.add_text_file(path)
+        logger.info(f"🗂️ Дозагружено документов: {counts['documents']} из {counts['files']} файлов")
+        return counts
+
+    def search(self, query: str, limit: int = 50, prefix: bool = True,
+               kinds: Optional[List[str]] = None) -> List[Dict]:
+        """Документы по убыванию релевантности (bm25) с фрагментом совпадения"""
+        fts_query = to_fts_query(query, prefix)
+        if not fts_query:
+            return []
+        kind_filter = ''
+        params: List = [fts_query]
+        if kinds:
+            kind_filter = f" AND kind IN ({', '.join('?' for _ in kinds)})"
+            params.extend(kinds)
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT address, kind, title, url, run_id, "
+                f"snippet(documents, -1, '«', '»', '…', 16) AS fragment, rank AS score "
+                f"FROM documents WHERE documents MATCH ?{kind_filter} ORDER BY rank LIMIT ?",
+                params).fetchall()
+        return [dict(row) for row in rows]
+
+    def search_addresses(self, query: str, limit: int = 50, prefix: bool = True) -> List[Dict]:
+        """Адреса, в чьих документах есть запрос: лучший документ, число совпадений, виды"""
+        fts_query = to_fts_query(query, prefix)
+        if not fts_query:
+            return []
+        with self._lock:
+            # bm25 нельзя агрегировать в SQL: лучшие адреса набираются по порядку
+            # rank до limit, затем для них одним запросом считаются совпадения
+            addresses: Dict[str, Dict] = {}
+            cursor = self._conn.execute(
+                "SELECT rowid, address, rank FROM documents WHERE documents MATCH ? ORDER BY rank",
+                (fts_query,))
+            for rowid, address, score in cursor:
+                if address not in addresses:
+                    addresses[address] = {'address': address, 'score': score, 'rowid': rowid}
+                    if len(addresses) >= limit:
+                        break
+            cursor.close()
+            if not addresses:
+                return []
+
+            placeholders = ', '.join('?' for _ in addresses)
+            counts = {}
+            for address, kind, count in self._conn.execute(
+                    f"SELECT address, kind, COUNT(*) FROM documents "
+                    f"WHERE documents MATCH ? AND address IN ({placeholders}) GROUP BY address, kind",
+                    [fts_query, *addresses]):
+                counts.setdefault(address, {})[kind] = count
+            best_rows = [entry['rowid'] for entry in addresses.values()]
+            fragments = dict(self._conn.execute(
+                f"SELECT rowid, snippet(documents, -1, '«', '»', '…', 16) FROM documents "
+                f"WHERE documents MATCH ? AND rowid IN ({placeholders})",
+                [fts_query, *best_rows]).fetchall())
+
+        for entry in addresses.values():
+            kinds = counts.get(entry['address'], {})
+            entry['documents'] = sum(kinds.values())
+            entry['kinds'] = list(kinds)
+            entry['fragment'] = fragments.get(entry.pop('rowid'), '')
+        return list(addresses.values())
+
+    def stats(self) -> Dict[str, int]:
+        """Число документов по видам; полный подсчет — только если индекс изменился"""
+        with self._lock:
+            # data_version меняется, когда индекс пополнил другой процесс (CLI, воркер)
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._stats is None or version != self._stats_version:
+                rows = self._conn.execute(
+                    "SELECT kind, COUNT(*) FROM documents GROUP BY kind").fetchall()
+                stats = {kind: count for kind, count in rows}
+                stats['documents'] = sum(stats.values())
+                self._stats, self._stats_version = stats, version
+            return dict(self._stats)
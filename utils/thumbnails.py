@@ -0,0 +1,58 @@
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+import config
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Папка превью внутри папки скриншотов: screenshots/thumbs/
+THUMBNAILS_DIRNAME = "thumbs"
+
+
+def thumbnail_path(screenshot_path: Union[str, Path]) -> Path:
+    """Путь превью для скриншота: screenshots/thumbs/<имя>.webp"""
+    screenshot_path = Path(screenshot_path)
+    return screenshot_path.parent / THUMBNAILS_DIRNAME / f"{screenshot_path.stem}.webp"
+
+
+def make_thumbnail(screenshot_path: Union[str, Path], width: Optional[int] = None,
+                   quality: Optional[int] = None) -> Optional[str]:
+    """Создать WebP превью скриншота; None, если это не удалось.
+
+    Ошибка превью не должна ломать поиск, поэтому исключения только логируются.
+    """
+    width = width or config.THUMBNAIL_WIDTH
+    quality = quality or config.THUMBNAIL_QUALITY
+    target = thumbnail_path(screenshot_path)
+    try:
+        from PIL import Image
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with Image.open(screenshot_path) as image:
+            # Высота не ограничивается: длинная страница выдачи сохраняет пропорции
+            image.thumbnail((width, image.height), Image.LANCZOS)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            # Запись во временный файл: читатель не увидит недописанное превью
+            temporary = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+            image.save(temporary, 'WEBP', quality=quality, method=4)
+        os.replace(temporary, target)
+        return str(target)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось создать превью {screenshot_path}: {str(e)}")
+        return None
+
+
+def get_thumbnail(screenshot_path: Union[str, Path]) -> Optional[str]:
+    """Превью скриншота; создается при первом обращении, если его нет или оно устарело"""
+    target = thumbnail_path(screenshot_path)
+    try:
+        if target.stat().st_mtime >= os.stat(screenshot_path).st_mtime:
+            return str(target)
+    except FileNotFoundError:
+        if not os.path.exists(screenshot_path):
+            return None
+    return make_thumbnail(screenshot_path)
@@ -0,0 +1,114 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Этапы поиска по адресу в порядке выполнения (ключи result['timings'])
+STAGE_NAMES = {
+    'home_page': 'Главная Яндекса',
+    'navigation': 'Переход к выдаче',
+    'wait': 'Ожидание загрузки (sleep)',
+    'screenshot': 'Скриншоты',
+    'thumbnail': 'Превью',
+    'dom_extraction': 'Разбор DOM',
+    'image_load': 'Загрузка изображения',
+    'ocr': 'OCR',
+    'image_analysis': 'Анализ изображения',
+    'captcha_check': 'Проверка капчи',
+    'text_file': 'Запись текста',
+    'page_text': 'Текст страницы',
+    'total': 'Всего на адрес'
+}
+
+
+class StageTimer:
+    """Длительности этапов одного поиска в секундах.
+
+    Повторный вход в этап суммируется (например, два ожидания загрузки).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def sleep(self, seconds: float):
+        """time.sleep, учтенный в этапе 'wait'"""
+        with self.stage('wait'):
+            time.sleep(seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Длительности с итогом 'total' — для ключа 'timings' результата"""
+        timings = {name: round(seconds, 4) for name, seconds in self.durations.items()}
+        timings['total'] = round(time.perf_counter() - self.started, 4)
+        return timings
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Перцентиль с линейной интерполяцией по отсортированному списку"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class TimingStats:
+    """Сводка длительностей этапов за запуск: p50, p95, максимум и сумма"""
+
+    def __init__(self):
+        self._values: Dict[str, List[float]] = {}
+
+    def add(self, timings: Optional[Dict[str, float]]):
+        for name, seconds in (timings or {}).items():
+            self._values.setdefault(name, []).append(seconds)
+
+    def __bool__(self) -> bool:
+        return bool(self._values)
+
+    def summary(self) -> List[Dict]:
+        """Строки по этапам в порядке STAGE_NAMES, неизвестные этапы — в конце"""
+        order = list(STAGE_NAMES)
+        names = sorted(self._values, key=lambda name: (
+            order.index(name) if name in order else len(order), name))
+        rows = []
+        for name in names:
+            values = sorted(self._values[name])
+            rows.append({
+                'stage': name,
+                'name': STAGE_NAMES.get(name, name),
+                'count': len(values),
+                'p50': percentile(values, 0.5),
+                'p95': percentile(values, 0.95),
+                'max': values[-1],
+                'total': sum(values)
+            })
+        return rows
+
+    def format_table(self) -> str:
+        """Сводка текстом для CLI"""
+        lines = [f"{'Этап':<28}{'p50, с':>9}{'p95, с':>9}{'макс, с':>9}{'доля':>7}"]
+        rows = self.summary()
+        total = next((row['total'] for row in rows if row['stage'] == 'total'), 0.0)
+        for row in rows:
+            share = f"{row['total'] / total * 100:.0f}%" if total and row['stage'] != 'total' else ''
+            lines.append(f"{row['name']:<28}{row['p50']:>9.2f}{row['p95']:>9.2f}{row['max']:>9.2f}{share:>7}")
+        return "\n".join(lines)
+
+
+def summarize_timings(results: Iterable[Dict]) -> List[Dict]:
+    """Сводка по этапам для списка результатов search_address_in_yandex"""
+    stats = TimingStats()
+    for result in results:
+        stats.add(result.get('timings'))
+    return stats.summary()
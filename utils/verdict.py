@@ -0,0 +1,156 @@
+import logging
+import os
+from typing import Callable, Dict, Iterator, List, Optional
+
+from utils.llm_client import LLMClient
+from utils.prompt_builder import compact_verdict_text
+from utils.verdict_cache import VerdictCache
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Меняйте версию при любом изменении шаблона промпта: она входит в ключ кэша
+VERDICT_PROMPT_VERSION = "1"
+VERDICT_SYSTEM_PROMPT = "Ты — эксперт по анализу коммерческой деятельности по адресу. Отвечай кратко, тезисно, только по фактам из текста."
+VERDICT_PROMPT_TEMPLATE = "Вот фрагмент поисковой выдачи и анализа по адресу. Определи, ведётся ли по этому адресу коммерческая деятельность (магазин, офис, услуги, аренда, производство и т.п.)? Ответь только 'Да' или 'Нет' и кратко объясни почему, ссылаясь на факты из текста.\n\nТекст:\n{text}\n\nВердикт:"
+# Неизменная часть промпта до текста адреса: сервер кэширует ее KV
+VERDICT_PROMPT_PREFIX = VERDICT_PROMPT_TEMPLATE.split("{text}")[0]
+VERDICT_MAX_TOKENS = 128
+VERDICT_TEMPERATURE = 0.1
+
+
+def load_verdict_text(browser_result: Dict) -> str:
+    """Текст для LLM: файл с извлеченным текстом или ИИ анализ из результата"""
+    text_file_path = browser_result.get('text_file_path')
+    if text_file_path and os.path.exists(text_file_path):
+        try:
+            with open(text_file_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except Exception:
+            pass
+    return browser_result.get('ai_text_analysis', '')
+
+
+def build_verdict_text(browser_result: Dict, token_budget: Optional[int] = None) -> str:
+    """Сжатый текст для вердикта: самое релевантное в пределах бюджета токенов"""
+    return compact_verdict_text(
+        browser_result['address'],
+        load_verdict_text(browser_result),
+        serp_results=browser_result.get('results'),
+        token_budget=token_budget
+    )
+
+
+def build_verdict_request(text: str) -> Dict:
+    """Запрос к /chat для вердикта по тексту"""
+    return {
+        "prompt": VERDICT_PROMPT_TEMPLATE.format(text=text),
+        "system_prompt": VERDICT_SYSTEM_PROMPT,
+        "max_tokens": VERDICT_MAX_TOKENS,
+        "temperature": VERDICT_TEMPERATURE,
+        "prompt_prefix": VERDICT_PROMPT_PREFIX
+    }
+
+
+def verdict_cache_key(text: str) -> str:
+    """Ключ кэша вердикта для текста"""
+    return VerdictCache.make_key(VERDICT_SYSTEM_PROMPT, VERDICT_PROMPT_VERSION, text,
+                                 VERDICT_MAX_TOKENS, VERDICT_TEMPERATURE)
+
+
+def get_cached_verdict(cache: Optional[VerdictCache], text: str) -> Optional[str]:
+    """Вердикт из кэша без обращения к LLM"""
+    if cache is None:
+        return None
+    return cache.get(verdict_cache_key(text))
+
+
+def get_verdict(client: LLMClient, text: str, cache: Optional[VerdictCache] = None) -> str:
+    """Вердикт по одному адресу"""
+    cached = get_cached_verdict(cache, text)
+    if cached is not None:
+        return cached
+    request = build_verdict_request(text)
+    verdict = client.chat(**request)
+    if cache is not None:
+        cache.put(verdict_cache_key(text), verdict)
+    return verdict
+
+
+def stream_verdict(
+    client: LLMClient,
+    text: str,
+    cache: Optional[VerdictCache] = None,
+    stats: Optional[Dict] = None
+) -> Iterator[str]:
+    """Вердикт по одному адресу потоком; готовый ответ попадает в кэш"""
+    cached = get_cached_verdict(cache, text)
+    if cached is not None:
+        if stats is not None:
+            stats.update({"ttft": 0.0, "latency": 0.0, "cached": True})
+        yield cached
+        return
+    chunks = []
+    for chunk in client.chat_stream(**build_verdict_request(text), stats=stats):
+        chunks.append(chunk)
+        yield chunk
+    if cache is not None:
+        cache.put(verdict_cache_key(text), "".join(chunks).strip())
+
+
+def run_verdicts(
+    client: LLMClient,
+    browser_results: List[Dict],
+    progress_callback: Optional[Callable] = None,
+    cache: Optional[VerdictCache] = None
+) -> Dict[str, Dict]:
+    """Вердикты по всем адресам пачкой.
+
+    Возвращает словарь address -> {'verdict', 'error', 'latency', 'cached'}.
+    Адреса с вердиктом в кэше к LLM не отправляются.
+    progress_callback(done, total, address) вызывается по мере готовности.
+    """
+    verdicts = {}
+    requests_data = []
+    for browser_result in browser_results:
+        address = browser_result['address']
+        text = build_verdict_text(browser_result)
+        cached = get_cached_verdict(cache, text)
+        if cached is not None:
+            verdicts[address] = {
+                'verdict': cached,
+                'error': None,
+                'latency': 0.0,
+                'cached': True
+            }
+            continue
+        request = build_verdict_request(text)
+        request["address"] = address
+        request["cache_key"] = verdict_cache_key(text)
+        requests_data.append(request)
+
+    total = len(browser_results)
+    cached_count = len(verdicts)
+
+    def on_progress(done, _, item):
+        if progress_callback:
+            progress_callback(cached_count + done, total, item["address"])
+
+    logger.info(
+        f"🧑‍⚖️ Вердиктов из кэша: {cached_count}, запрашиваем у LLM: {len(requests_data)} (параллельно: {client.concurrency})")
+    if progress_callback and cached_count:
+        progress_callback(cached_count, total, "кэш")
+    responses = client.chat_many(
+        requests_data, on_progress) if requests_data else []
+
+    for request, response in zip(requests_data, responses):
+        if cache is not None and response["error"] is None:
+            cache.put(request["cache_key"], response["response"])
+        verdicts[request["address"]] = {
+            'verdict': response["response"],
+            'error': response["error"],
+            'latency': response["latency"],
+            'prompt_tokens': response["prompt_tokens"],
+            'cached': False
+        }
+    return verdicts
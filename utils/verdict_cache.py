@@ -0,0 +1,97 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import config
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class VerdictCache:
+    """Локальный кэш вердиктов LLM в SQLite с вытеснением по размеру"""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = Path(path or config.VERDICT_CACHE_PATH)
+        self.max_bytes = config.VERDICT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                key TEXT PRIMARY KEY,
+                verdict TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_verdicts_accessed ON verdicts (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(system_prompt: str, template_version: str, text: str,
+                 max_tokens: int, temperature: float) -> str:
+        """Ключ кэша: хэш всего, что влияет на ответ модели"""
+        raw = json.dumps([system_prompt, template_version, text, max_tokens, temperature],
+                         ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT verdict FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE verdicts SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, verdict: str):
+        now = time.time()
+        size = len(key) + len(verdict.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, verdict, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, verdict, size, now, now))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Удаление давно не использованных записей сверх лимита размера"""
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM verdicts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        rows = self._conn.execute(
+            "SELECT key, size FROM verdicts ORDER BY accessed_at ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"🧹 Кэш вердиктов: вытеснено {evicted} записей")
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM verdicts").fetchone()
+        return {'entries': count, 'size_bytes': total, 'max_bytes': self.max_bytes}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM verdicts")
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
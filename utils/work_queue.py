@@ -0,0 +1,318 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class WorkQueue(ABC):
+    """Общая очередь адресов для распределенного поиска.
+
+    Координатор ставит адреса в именованную очередь и забирает результаты,
+    воркеры на разных машинах берут адреса в аренду (lease). Адрес, аренда
+    которого истекла без результата (воркер упал), снова выдается другим
+    воркерам, пока не исчерпаны попытки — тогда он записывается как ошибка.
+    Доставка "как минимум один раз": координатор отбрасывает повторы по id.
+    """
+
+    def __init__(self, visibility_timeout: Optional[float] = None, max_attempts: Optional[int] = None):
+        self.visibility_timeout = (config.WORK_QUEUE_VISIBILITY_TIMEOUT
+                                   if visibility_timeout is None else visibility_timeout)
+        self.max_attempts = config.WORK_QUEUE_MAX_ATTEMPTS if max_attempts is None else max_attempts
+
+    @abstractmethod
+    def enqueue(self, queue: str, addresses: Iterable[str]) -> int:
+        """Поставить адреса в очередь, вернуть их количество"""
+
+    @abstractmethod
+    def lease(self, queue: str, worker_id: str, count: int = 1) -> List[Tuple[str, str]]:
+        """Взять в аренду до count адресов: список пар (id, address)"""
+
+    @abstractmethod
+    def complete(self, queue: str, item_id: str, worker_id: str, result: Dict) -> bool:
+        """Сдать результат; принимается только от текущего арендатора с действующей арендой.
+
+        False, если аренда истекла (адрес мог быть выдан другому воркеру).
+        """
+
+    @abstractmethod
+    def fetch_results(self, queue: str, cursor: int = 0) -> Tuple[List[Tuple[str, Dict]], int]:
+        """Результаты после позиции cursor: список (id, result) и новая позиция"""
+
+    @abstractmethod
+    def stats(self, queue: str) -> Dict[str, int]:
+        """Счетчики очереди: pending, leased, done"""
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def failed_result(address: str, attempts: int) -> Dict:
+        return {
+            'address': address,
+            'error': f"Воркеры не вернули результат за {attempts} попыток",
+            'success': False
+        }
+
+
+def sqlite_path(url: str) -> str:
+    """Путь к файлу из sqlite:///путь/к/файлу.db (без схемы — путь как есть)"""
+    return url[len("sqlite:///"):] if url.startswith("sqlite:///") else url
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Очередь в файле SQLite: для одной машины или общего сетевого диска"""
+
+    def __init__(self, path: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path or sqlite_path(config.WORK_QUEUE_URL))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS work_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                address TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                lease_until REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_work_items_queue ON work_items (queue, status, id);
+            CREATE TABLE IF NOT EXISTS work_results (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                result TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_work_results_queue ON work_results (queue, seq);
+        """)
+
+    def close(self):
+        self._conn.close()
+
+    def enqueue(self, queue: str, addresses: Iterable[str]) -> int:
+        rows = [(queue, address) for address in addresses]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO work_items (queue, address) VALUES (?, ?)", rows)
+            self._conn.execute("COMMIT")
+        return len(rows)
+
+    def lease(self, queue: str, worker_id: str, count: int = 1) -> List[Tuple[str, str]]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Истекшие аренды: исчерпавшие попытки записываются как ошибка
+                expired = self._conn.execute(
+                    "SELECT id, address, attempts FROM work_items "
+                    "WHERE queue = ? AND status = 'leased' AND lease_until < ? AND attempts >= ?",
+                    (queue, now, self.max_attempts)).fetchall()
+                for item_id, address, attempts in expired:
+                    self._conn.execute(
+                        "UPDATE work_items SET status = 'done' WHERE id = ?", (item_id,))
+                    self._conn.execute(
+                        "INSERT INTO work_results (queue, item_id, result) VALUES (?, ?, ?)",
+                        (queue, item_id, json.dumps(self.failed_result(address, attempts), ensure_ascii=False)))
+
+                rows = self._conn.execute(
+                    "SELECT id, address FROM work_items WHERE queue = ? AND "
+                    "(status = 'pending' OR (status = 'leased' AND lease_until < ?)) "
+                    "ORDER BY id LIMIT ?",
+                    (queue, now, count)).fetchall()
+                self._conn.executemany(
+                    "UPDATE work_items SET status = 'leased', worker_id = ?, lease_until = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    [(worker_id, now + self.visibility_timeout, item_id) for item_id, _ in rows])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(str(item_id), address) for item_id, address in rows]
+
+    def complete(self, queue: str, item_id: str, worker_id: str, result: Dict) -> bool:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    "UPDATE work_items SET status = 'done' WHERE id = ? AND status = 'leased' "
+                    "AND worker_id = ? AND lease_until >= ?",
+                    (int(item_id), worker_id, time.time()))
+                if cursor.rowcount:
+                    self._conn.execute(
+                        "INSERT INTO work_results (queue, item_id, result) VALUES (?, ?, ?)",
+                        (queue, int(item_id), json.dumps(result, ensure_ascii=False)))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return bool(cursor.rowcount)
+
+    def fetch_results(self, queue: str, cursor: int = 0) -> Tuple[List[Tuple[str, Dict]], int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, item_id, result FROM work_results WHERE queue = ? AND seq > ? ORDER BY seq",
+                (queue, cursor)).fetchall()
+        if rows:
+            cursor = rows[-1][0]
+        return [(str(item_id), json.loads(result)) for _, item_id, result in rows], cursor
+
+    def stats(self, queue: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM work_items WHERE queue = ? GROUP BY status",
+                (queue,)).fetchall()
+        stats = {'pending': 0, 'leased': 0, 'done': 0}
+        stats.update(dict(rows))
+        return stats
+
+
+# Аренда атомарно на стороне сервера: истекшие аренды возвращаются в очередь
+# (или в результаты как ошибка), затем выдаются новые адреса
+REDIS_LEASE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local deadline = tonumber(ARGV[2])
+local count = tonumber(ARGV[3])
+local max_attempts = tonumber(ARGV[4])
+local worker_id = ARGV[5]
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('HDEL', KEYS[6], id)
+    if tonumber(redis.call('HGET', KEYS[4], id) or '0') >= max_attempts then
+        redis.call('RPUSH', KEYS[5], id)
+    else
+        redis.call('LPUSH', KEYS[1], id)
+    end
+end
+local leased = {}
+for i = 1, count do
+    local id = redis.call('RPOP', KEYS[1])
+    if not id then break end
+    redis.call('ZADD', KEYS[2], deadline, id)
+    redis.call('HINCRBY', KEYS[4], id, 1)
+    redis.call('HSET', KEYS[6], id, worker_id)
+    table.insert(leased, id)
+    table.insert(leased, redis.call('HGET', KEYS[3], id))
+end
+return leased
+"""
+
+# Результат принимается только от текущего арендатора, пока аренда не истекла
+REDIS_COMPLETE_SCRIPT = """
+local deadline = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not deadline or tonumber(deadline) < tonumber(ARGV[4]) then
+    return 0
+end
+if redis.call('HGET', KEYS[3], ARGV[1]) ~= ARGV[3] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('RPUSH', KEYS[2], cjson.encode({ARGV[1], ARGV[2]}))
+return 1
+"""
+
+
+class RedisWorkQueue(WorkQueue):
+    """Очередь в Redis (или совместимом сервере) для воркеров на нескольких машинах"""
+
+    def __init__(self, url: str, prefix: str = "analyzegeo", **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("Для очереди в Redis установите пакет: pip install redis")
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._lease = self._redis.register_script(REDIS_LEASE_SCRIPT)
+        self._complete = self._redis.register_script(REDIS_COMPLETE_SCRIPT)
+
+    def _keys(self, queue: str) -> Dict[str, str]:
+        base = f"{self.prefix}:{queue}"
+        return {name: f"{base}:{name}" for name in
+                ('pending', 'leased', 'addresses', 'attempts', 'results', 'expired', 'next_id', 'workers')}
+
+    def close(self):
+        self._redis.close()
+
+    def enqueue(self, queue: str, addresses: Iterable[str]) -> int:
+        keys = self._keys(queue)
+        addresses = list(addresses)
+        if not addresses:
+            return 0
+        last_id = self._redis.incrby(keys['next_id'], len(addresses))
+        ids = range(last_id - len(addresses) + 1, last_id + 1)
+        pipeline = self._redis.pipeline()
+        pipeline.hset(keys['addresses'], mapping={str(item_id): address
+                                                  for item_id, address in zip(ids, addresses)})
+        # Очередь FIFO: добавление слева, выдача справа
+        pipeline.lpush(keys['pending'], *[str(item_id) for item_id in ids])
+        pipeline.execute()
+        return len(addresses)
+
+    def lease(self, queue: str, worker_id: str, count: int = 1) -> List[Tuple[str, str]]:
+        keys = self._keys(queue)
+        now = time.time()
+        leased = self._lease(
+            keys=[keys['pending'], keys['leased'], keys['addresses'], keys['attempts'],
+                  keys['expired'], keys['workers']],
+            args=[now, now + self.visibility_timeout, count, self.max_attempts, worker_id])
+        self._flush_expired(queue)
+        return list(zip(leased[::2], leased[1::2]))
+
+    def _flush_expired(self, queue: str):
+        """Адреса, исчерпавшие попытки, записываются в результаты как ошибка"""
+        keys = self._keys(queue)
+        while True:
+            item_id = self._redis.lpop(keys['expired'])
+            if item_id is None:
+                return
+            address = self._redis.hget(keys['addresses'], item_id)
+            attempts = int(self._redis.hget(keys['attempts'], item_id) or 0)
+            self._redis.rpush(keys['results'], json.dumps(
+                [item_id, json.dumps(self.failed_result(address, attempts), ensure_ascii=False)]))
+
+    def complete(self, queue: str, item_id: str, worker_id: str, result: Dict) -> bool:
+        keys = self._keys(queue)
+        return bool(self._complete(keys=[keys['leased'], keys['results'], keys['workers']],
+                                   args=[item_id, json.dumps(result, ensure_ascii=False),
+                                         worker_id, time.time()]))
+
+    def fetch_results(self, queue: str, cursor: int = 0) -> Tuple[List[Tuple[str, Dict]], int]:
+        keys = self._keys(queue)
+        rows = self._redis.lrange(keys['results'], cursor, -1)
+        results = []
+        for row in rows:
+            item_id, result = json.loads(row)
+            results.append((str(item_id), json.loads(result)))
+        return results, cursor + len(rows)
+
+    def stats(self, queue: str) -> Dict[str, int]:
+        keys = self._keys(queue)
+        return {
+            'pending': self._redis.llen(keys['pending']),
+            'leased': self._redis.zcard(keys['leased']),
+            'done': self._redis.llen(keys['results'])
+        }
+
+
+def open_work_queue(url: Optional[str] = None, **kwargs) -> WorkQueue:
+    """Очередь по адресу: redis://host:6379/0 или sqlite:///путь/к/файлу.db"""
+    url = url or config.WORK_QUEUE_URL
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisWorkQueue(url, **kwargs)
+    return SQLiteWorkQueue(sqlite_path(url), **kwargs)